@@ -0,0 +1,7 @@
+"""
+Suite de benchmarks da ferramenta de varredura
+
+Sobe uma rede simulada local (listeners em aliases 127.0.0.0/8) e mede
+throughput, latência, memória e precisão de cada configuração do scanner.
+Uso: python -m benchmarks.run --help
+"""
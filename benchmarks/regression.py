@@ -0,0 +1,122 @@
+"""
+Detecção de regressões de performance
+
+Cada caso (alvos x portas x protocolo x engine) tem um baseline em JSON
+com as amostras de várias execuções. Novas execuções são comparadas pela
+mediana, com tolerância proporcional ao desvio absoluto mediano (MAD) do
+baseline, de forma que o ruído normal da máquina não dispare o gate.
+"""
+
+import json
+import os
+import statistics
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Métricas verificadas: nome -> True se maior é melhor
+GATED_METRICS = {
+    'probes_per_s': True,
+    'peak_rss_mb': False,
+}
+
+# Queda relativa mínima considerada regressão, independente do ruído
+DEFAULT_TOLERANCE = 0.10
+
+# Quantos MADs (escalados para desvio padrão) o baseline admite de ruído
+DEFAULT_MAD_FACTOR = 3.0
+
+# Fator que torna o MAD um estimador consistente do desvio padrão
+MAD_SCALE = 1.4826
+
+
+def median(values: List[float]) -> float:
+    return statistics.median(values) if values else 0.0
+
+
+def mad(values: List[float]) -> float:
+    """Desvio absoluto mediano"""
+    if not values:
+        return 0.0
+    center = statistics.median(values)
+    return statistics.median(abs(value - center) for value in values)
+
+
+def case_key(case: Dict) -> str:
+    """Identificador estável do caso, usado como nome do baseline"""
+    network = case['network']
+    protocols = '+'.join(p.lower() for p in network['protocols'])
+    return f"{case['scenario']}__{network['hosts']}x{network['ports']}-{protocols}__{case['engine']}"
+
+
+def summarize(samples: List[Dict]) -> Dict:
+    """Mediana e MAD de cada métrica sobre as execuções repetidas"""
+    summary = {}
+    for metric in GATED_METRICS:
+        values = [sample[metric] for sample in samples]
+        summary[metric] = {'median': median(values), 'mad': mad(values), 'samples': values}
+    return summary
+
+
+@dataclass
+class Regression:
+    """Métrica que piorou além da tolerância"""
+    case: str
+    metric: str
+    baseline: float
+    current: float
+    limit: float
+
+    def __str__(self):
+        change = (self.current - self.baseline) / self.baseline if self.baseline else 0.0
+        return (f"{self.case}: {self.metric} {self.baseline:.2f} -> {self.current:.2f} "
+                f"({change:+.1%}, limite {self.limit:.2f})")
+
+
+def compare(case: str, baseline: Dict, current: Dict,
+            tolerance: float = DEFAULT_TOLERANCE,
+            mad_factor: float = DEFAULT_MAD_FACTOR) -> List[Regression]:
+    """Compara os resumos de baseline e execução atual de um caso"""
+    regressions = []
+    for metric, higher_is_better in GATED_METRICS.items():
+        if metric not in baseline or metric not in current:
+            continue
+        reference = baseline[metric]['median']
+        noise = mad_factor * MAD_SCALE * baseline[metric]['mad']
+        margin = max(tolerance * reference, noise)
+        value = current[metric]['median']
+        if higher_is_better:
+            limit = reference - margin
+            worse = value < limit
+        else:
+            limit = reference + margin
+            worse = value > limit
+        if worse:
+            regressions.append(Regression(case, metric, reference, value, limit))
+    return regressions
+
+
+def baseline_path(directory: str, key: str) -> str:
+    return os.path.join(directory, f"{key}.json")
+
+
+def load_baseline(directory: str, key: str) -> Optional[Dict]:
+    path = baseline_path(directory, key)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(directory: str, key: str, case: Dict, summary: Dict, revision: str) -> str:
+    """Grava o baseline de um caso e retorna o caminho do arquivo"""
+    os.makedirs(directory, exist_ok=True)
+    path = baseline_path(directory, key)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': revision,
+            'scenario': case['scenario'],
+            'engine': case['engine'],
+            'network': case['network'],
+            'metrics': summary,
+        }, f, indent=2)
+    return path
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Executor da suite de benchmarks
+
+Para cada cenário (rede simulada) e cada engine (configuração do
+PortScanner) executa a varredura em um processo filho isolado e mede:
+probes/s, latência p50/p99 das sondas, pico de RSS e precisão em relação
+ao estado conhecido da rede. Os resultados são gravados em JSON para
+comparação entre commits.
+
+Com --save-baseline as medições (repetidas --repeat vezes) viram o
+baseline de cada caso; com --check a execução é comparada ao baseline e o
+processo sai com código 1 se houver regressão de throughput ou memória.
+
+Exemplos:
+  python -m benchmarks.run
+  python -m benchmarks.run --scenario small-tcp --engine threads-100 -o bench.json
+  python -m benchmarks.run --repeat 5 --save-baseline
+  python -m benchmarks.run --repeat 5 --check
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from queue import Empty
+from typing import Dict, List
+
+# Permite executar a partir da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import regression
+from benchmarks.simnet import NetworkSpec, SimulatedNetwork
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+@dataclass
+class Scenario:
+    """Rede simulada + parâmetros da varredura"""
+    name: str
+    network: NetworkSpec
+    timeout: float = 0.5
+
+
+@dataclass
+class Engine:
+    """Configuração do PortScanner avaliada"""
+    name: str
+    options: Dict = field(default_factory=dict)
+
+
+SCENARIOS = {
+    'small-tcp': Scenario('small-tcp', NetworkSpec(hosts=4, ports=100, open_ratio=0.1, filtered_ratio=0.0)),
+    'wide-tcp': Scenario('wide-tcp', NetworkSpec(hosts=32, ports=200, open_ratio=0.05, filtered_ratio=0.0,
+                                                 base_address='127.11.0.1')),
+    'blackhole-tcp': Scenario('blackhole-tcp', NetworkSpec(hosts=8, ports=50, open_ratio=0.1, filtered_ratio=0.1,
+                                                           base_address='127.12.0.1'), timeout=0.3),
+    'lossy-udp': Scenario('lossy-udp', NetworkSpec(hosts=4, ports=25, protocols=('UDP',), open_ratio=0.4,
+                                                   filtered_ratio=0.0, udp_latency_ms=20, udp_drop_ratio=0.1,
+                                                   base_address='127.13.0.1'), timeout=0.3),
+}
+
+ENGINES = {
+    'threads-10': Engine('threads-10', {'max_threads': 10}),
+    'threads-100': Engine('threads-100', {'max_threads': 100}),
+    'threads-auto': Engine('threads-auto', {'max_threads': 'auto'}),
+    'threads-100-per-host-8': Engine('threads-100-per-host-8', {'max_threads': 100, 'per_host_limit': 8}),
+}
+
+DEFAULT_BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Tempo máximo de um caso (processo filho) antes de ser considerado falho (s)
+DEFAULT_CASE_TIMEOUT = 300
+
+
+class CaseFailed(Exception):
+    """O processo filho do caso falhou, terminou sem medições ou excedeu o tempo"""
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _peak_rss_mb() -> float:
+    """Pico de memória residente do processo atual em MB"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _worker(scenario: Scenario, engine: Engine, hosts: List[str], ports: List[int], queue) -> None:
+    """Executa uma varredura no processo filho e devolve as medições (ou o erro)"""
+    try:
+        from port_scanner import PortScanner
+
+        scanner = PortScanner(timeout=scenario.timeout, **engine.options)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = scanner.scan_range(hosts, ports, list(scenario.network.protocols))
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+        raise
+
+    latencies = [r.response_time for r in results if r.response_time is not None]
+    queue.put({
+        'results': [(r.host, r.port, r.protocol, r.status) for r in results],
+        'elapsed_s': elapsed,
+        'probes': len(results),
+        'probes_per_s': len(results) / elapsed if elapsed else 0.0,
+        'latency_p50_ms': _percentile(latencies, 0.50),
+        'latency_p99_ms': _percentile(latencies, 0.99),
+        'peak_rss_mb': _peak_rss_mb(),
+    })
+
+
+class _Result:
+    __slots__ = ('host', 'port', 'protocol', 'status')
+
+    def __init__(self, host, port, protocol, status):
+        self.host, self.port, self.protocol, self.status = host, port, protocol, status
+
+
+def _receive(queue, process, timeout: float) -> Dict:
+    """Aguarda as medições do filho; falha se ele terminar sem enviá-las ou exceder o tempo"""
+    deadline = time.monotonic() + timeout
+    while True:
+        exited = process.exitcode is not None
+        try:
+            # Após a saída do filho, uma última leitura: os dados podem já estar na fila
+            return queue.get(timeout=1)
+        except Empty:
+            if exited:
+                raise CaseFailed(f"processo terminou com código {process.exitcode} sem medições")
+            if time.monotonic() >= deadline:
+                raise CaseFailed(f"tempo esgotado ({timeout:.0f}s)")
+
+
+def run_case(scenario: Scenario, engine: Engine, timeout: float = DEFAULT_CASE_TIMEOUT) -> Dict:
+    """Sobe a rede do cenário e mede uma engine em processo isolado (CaseFailed se o filho falhar)"""
+    context = multiprocessing.get_context('spawn')
+    with SimulatedNetwork(scenario.network) as network:
+        queue = context.Queue()
+        process = context.Process(target=_worker,
+                                  args=(scenario, engine, network.hosts, network.ports, queue))
+        process.start()
+        try:
+            measurement = _receive(queue, process, timeout)
+        finally:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if 'error' in measurement:
+            raise CaseFailed(measurement['error'])
+        results = [_Result(*row) for row in measurement.pop('results')]
+        measurement['accuracy'] = network.accuracy(results)
+    return measurement
+
+
+def git_revision() -> str:
+    """Commit atual, para comparar resultados entre versões"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_suite(scenarios: List[str], engines: List[str], repeat: int = 1,
+              case_timeout: float = DEFAULT_CASE_TIMEOUT) -> Dict:
+    """Executa o produto cartesiano cenários x engines, repetindo cada caso"""
+    cases = []
+    failures = []
+    for scenario_name in scenarios:
+        scenario = SCENARIOS[scenario_name]
+        for engine_name in engines:
+            engine = ENGINES[engine_name]
+            print(f"[+] {scenario_name} / {engine_name} ...", end=" ", flush=True)
+            try:
+                runs = [run_case(scenario, engine, case_timeout) for _ in range(repeat)]
+            except CaseFailed as e:
+                print(f"FALHOU: {e}")
+                failures.append({'scenario': scenario_name, 'engine': engine_name, 'error': str(e)})
+                continue
+            measurement = {
+                metric: regression.median([run[metric] for run in runs])
+                for metric in runs[0]
+            }
+            print(f"{measurement['probes_per_s']:.0f} probes/s | "
+                  f"p50 {measurement['latency_p50_ms']:.2f}ms | p99 {measurement['latency_p99_ms']:.2f}ms | "
+                  f"RSS {measurement['peak_rss_mb']:.1f}MB | precisão {measurement['accuracy']:.1%}")
+            cases.append({
+                'scenario': scenario_name,
+                'engine': engine_name,
+                'network': asdict(scenario.network),
+                'timeout': scenario.timeout,
+                'engine_options': engine.options,
+                **measurement,
+                'runs': runs,
+            })
+
+    return {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'cases': cases,
+        'failures': failures,
+    }
+
+
+def save_baselines(report: Dict, directory: str) -> None:
+    """Grava um baseline por caso a partir do relatório"""
+    for case in report['cases']:
+        key = regression.case_key(case)
+        path = regression.save_baseline(directory, key, case, regression.summarize(case['runs']),
+                                        report['revision'])
+        print(f"[+] Baseline salvo: {path}")
+
+
+def check_baselines(report: Dict, directory: str, tolerance: float) -> List[regression.Regression]:
+    """Compara cada caso ao seu baseline; casos sem baseline são apenas avisados"""
+    regressions = []
+    for case in report['cases']:
+        key = regression.case_key(case)
+        baseline = regression.load_baseline(directory, key)
+        if baseline is None:
+            print(f"[!] Sem baseline para {key}")
+            continue
+        found = regression.compare(key, baseline['metrics'], regression.summarize(case['runs']),
+                                   tolerance=tolerance)
+        case['regressions'] = [str(item) for item in found]
+        regressions.extend(found)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do Port Scanner em rede simulada local")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Cenário a executar (repetível; padrão: todos)')
+    parser.add_argument('--engine', action='append', choices=sorted(ENGINES),
+                        help='Engine a avaliar (repetível; padrão: todas)')
+    parser.add_argument('-o', '--output', default='bench_results.json',
+                        help='Arquivo JSON de saída (padrão: bench_results.json)')
+    parser.add_argument('--list', action='store_true', help='Lista cenários e engines')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Execuções por caso; o relatório usa a mediana (padrão: 1)')
+    parser.add_argument('--baseline-dir', default=DEFAULT_BASELINE_DIR,
+                        help='Diretório dos baselines (padrão: benchmarks/baselines)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save-baseline', action='store_true',
+                      help='Grava as medições como novo baseline de cada caso')
+    mode.add_argument('--check', action='store_true',
+                      help='Compara com os baselines e sai com código 1 se houver regressão')
+    parser.add_argument('--tolerance', type=float, default=regression.DEFAULT_TOLERANCE,
+                        help='Piora relativa mínima considerada regressão (padrão: 0.10)')
+    parser.add_argument('--case-timeout', type=float, default=DEFAULT_CASE_TIMEOUT,
+                        help=f'Tempo máximo de cada execução de um caso em segundos (padrão: {DEFAULT_CASE_TIMEOUT})')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"cenário {name}: {scenario.network}")
+        for name, engine in ENGINES.items():
+            print(f"engine  {name}: {engine.options}")
+        return 0
+
+    if args.repeat < 1:
+        parser.error("--repeat deve ser pelo menos 1")
+
+    report = run_suite(args.scenario or list(SCENARIOS), args.engine or list(ENGINES), args.repeat,
+                       args.case_timeout)
+
+    status = 0
+    if report['failures']:
+        print(f"\n[!] {len(report['failures'])} caso(s) falharam:")
+        for failure in report['failures']:
+            print(f"    {failure['scenario']} / {failure['engine']}: {failure['error']}")
+        status = 1
+    if args.save_baseline:
+        save_baselines(report, args.baseline_dir)
+    elif args.check:
+        regressions = check_baselines(report, args.baseline_dir, args.tolerance)
+        if regressions:
+            print(f"\n[!] {len(regressions)} regressão(ões) de performance:")
+            for item in regressions:
+                print(f"    {item}")
+            status = 1
+        else:
+            print("\n[+] Nenhuma regressão em relação aos baselines")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"[+] Resultados salvos em: {args.output}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
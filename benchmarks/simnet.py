@@ -0,0 +1,188 @@
+"""
+Rede simulada local para benchmarks
+
+Cada host simulado é um alias de loopback (127.x.y.z; no Linux todo o
+127.0.0.0/8 já responde em lo, no macOS é preciso criar os aliases).
+Para cada (host, porta, protocolo) o estado desejado é materializado:
+
+- TCP open:       socket em listen que aceita e fecha conexões
+- TCP closed:     nada escutando (o kernel responde RST)
+- TCP filtered:   listen(0) com a fila de accept cheia; o kernel descarta
+                  os SYNs seguintes e o cliente expira (blackhole)
+- UDP open:       respondedor em espaço de usuário com latência e perda
+                  injetadas antes de responder
+- UDP closed:     nada escutando (ICMP port unreachable)
+
+A latência e a perda só podem ser injetadas no UDP: no connect scan TCP o
+handshake é concluído pelo kernel, antes de qualquer código de usuário.
+"""
+
+import ipaddress
+import random
+import selectors
+import socket
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+Endpoint = Tuple[str, int, str]
+
+
+@dataclass
+class NetworkSpec:
+    """Parâmetros da rede simulada"""
+    hosts: int = 4
+    ports: int = 50
+    protocols: Tuple[str, ...] = ('TCP',)
+    open_ratio: float = 0.1
+    filtered_ratio: float = 0.05
+    udp_latency_ms: float = 0.0
+    udp_drop_ratio: float = 0.0
+    base_address: str = '127.10.0.1'
+    base_port: int = 20000
+    seed: int = 1234
+
+
+@dataclass
+class SimulatedNetwork:
+    """Rede de teste com estado conhecido (ground truth) por endpoint"""
+    spec: NetworkSpec
+    expected: Dict[Endpoint, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._sockets: List[socket.socket] = []
+        self._fillers: List[socket.socket] = []
+        self._selector = selectors.DefaultSelector()
+        self._running = False
+        self._thread = None
+        self._rng = random.Random(self.spec.seed)
+
+    @property
+    def hosts(self) -> List[str]:
+        start = ipaddress.ip_address(self.spec.base_address)
+        return [str(start + offset) for offset in range(self.spec.hosts)]
+
+    @property
+    def ports(self) -> List[int]:
+        return list(range(self.spec.base_port, self.spec.base_port + self.spec.ports))
+
+    def _choose_state(self) -> str:
+        roll = self._rng.random()
+        if roll < self.spec.open_ratio:
+            return 'open'
+        if roll < self.spec.open_ratio + self.spec.filtered_ratio:
+            return 'filtered'
+        return 'closed'
+
+    def start(self) -> 'SimulatedNetwork':
+        """Cria os listeners e inicia o laço de atendimento"""
+        for host in self.hosts:
+            for port in self.ports:
+                for protocol in self.spec.protocols:
+                    state = self._choose_state()
+                    if protocol == 'UDP' and state == 'filtered':
+                        # UDP sem resposta é indistinguível de open|filtered
+                        state = 'closed'
+                    self._materialize(host, port, protocol, state)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name='simnet', daemon=True)
+        self._thread.start()
+        return self
+
+    def _materialize(self, host: str, port: int, protocol: str, state: str) -> None:
+        if protocol == 'TCP':
+            if state == 'open':
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                sock.bind((host, port))
+                sock.listen(1024)
+                sock.setblocking(False)
+                self._selector.register(sock, selectors.EVENT_READ, 'tcp')
+                self._sockets.append(sock)
+            elif state == 'filtered':
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                sock.bind((host, port))
+                sock.listen(0)
+                # Uma conexão nunca aceita ocupa a fila; novos SYNs são descartados
+                filler = socket.create_connection((host, port), timeout=1)
+                self._sockets.append(sock)
+                self._fillers.append(filler)
+            self.expected[(host, port, 'TCP')] = state
+        else:
+            if state == 'open':
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.bind((host, port))
+                sock.setblocking(False)
+                self._selector.register(sock, selectors.EVENT_READ, 'udp')
+                self._sockets.append(sock)
+            self.expected[(host, port, 'UDP')] = state
+
+    def _serve(self) -> None:
+        while self._running:
+            for key, _ in self._selector.select(timeout=0.1):
+                sock = key.fileobj
+                try:
+                    if key.data == 'tcp':
+                        conn, _ = sock.accept()
+                        conn.close()
+                    else:
+                        data, addr = sock.recvfrom(2048)
+                        self._reply_udp(sock, addr)
+                except (BlockingIOError, OSError):
+                    continue
+
+    def _reply_udp(self, sock: socket.socket, addr) -> None:
+        """Proxy UDP: descarta ou atrasa a resposta conforme a especificação"""
+        if self._rng.random() < self.spec.udp_drop_ratio:
+            return
+        delay = self.spec.udp_latency_ms / 1000
+        if delay <= 0:
+            sock.sendto(b"OK", addr)
+            return
+        timer = threading.Timer(delay, self._safe_send, args=(sock, addr))
+        timer.daemon = True
+        timer.start()
+
+    @staticmethod
+    def _safe_send(sock: socket.socket, addr) -> None:
+        try:
+            sock.sendto(b"OK", addr)
+        except OSError:
+            pass
+
+    def stop(self) -> None:
+        """Fecha todos os sockets da rede simulada"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1)
+        for sock in self._sockets + self._fillers:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._selector.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def accuracy(self, results) -> float:
+        """Fração dos endpoints cujo status obtido bate com o esperado"""
+        if not self.expected:
+            return 1.0
+        observed = {(r.host, r.port, r.protocol): r.status for r in results}
+        correct = 0
+        for endpoint, state in self.expected.items():
+            status = observed.get(endpoint)
+            if endpoint[2] == 'UDP' and state == 'open':
+                # Resposta perdida/atrasada aparece como open|filtered
+                correct += status in ('open', 'open|filtered')
+            else:
+                correct += status == state
+        return correct / len(self.expected)
+
@@ -2,12 +2,16 @@
 
 # Este arquivo contém configurações padrão e perfis de varredura
 
+from port_db import top_n
+
 # Configurações Gerais
 DEFAULT_TIMEOUT = 3
 DEFAULT_THREADS = 100
 DEFAULT_PROTOCOL = "TCP"
 
 # Perfis de Varredura
+# Chaves opcionais de parada antecipada: "max_open_per_host", "max_open"
+# e "time_budget" (segundos)
 SCAN_PROFILES = {
     "quick": {
         "description": "Varredura rápida - portas mais comuns",
@@ -28,12 +32,21 @@ SCAN_PROFILES = {
     
     "comprehensive": {
         "description": "Varredura completa - top 1000 portas",
-        "ports": list(range(1, 1001)),
+        "ports": top_n("tcp", 1000),
         "timeout": 5,
         "threads": 50,
         "protocols": ["TCP"]
     },
     
+    "discovery": {
+        "description": "Inventário - para no primeiro serviço encontrado em cada host",
+        "ports": top_n("tcp", 100),
+        "timeout": 1,
+        "threads": 200,
+        "protocols": ["TCP"],
+        "max_open_per_host": 1
+    },
+    
     "stealth": {
         "description": "Varredura stealth - lenta e discreta",
         "ports": [21, 22, 23, 25, 53, 80, 110, 143, 443, 993, 995],
@@ -101,12 +114,20 @@ NETWORK_TIMEOUTS = {
     "slow": 10       # Redes lentas ou com alta latência
 }
 
+# Política de Retransmissão para sondas sem resposta (timeout)
+# O timeout da tentativa N é timeout * backoff ** N
+RETRY_POLICY = {
+    "retries": 0,
+    "backoff": 2.0
+}
+
 # Configurações de Threads por Tipo de Varredura
 THREAD_CONFIGS = {
     "aggressive": 500,   # Varredura agressiva
     "normal": 100,       # Varredura normal
     "conservative": 50,  # Varredura conservadora
-    "stealth": 10        # Varredura stealth
+    "stealth": 10,       # Varredura stealth
+    "auto": "auto"       # Ajuste automático (AIMD) conforme respostas/timeouts
 }
 
 # Mensagens de Status Personalizadas
@@ -121,7 +142,11 @@ STATUS_MESSAGES = {
 OUTPUT_FORMATS = {
     "csv": {
         "extension": ".csv",
-        "headers": ["Host", "Port", "Protocol", "Status", "Timestamp"]
+        "headers": ["Host", "Port", "Protocol", "Status", "ResponseTime"]
+    },
+    "ndjson": {
+        "extension": ".ndjson",
+        "format": "streaming"
     },
     "json": {
         "extension": ".json", 
@@ -134,9 +159,19 @@ OUTPUT_FORMATS = {
     "txt": {
         "extension": ".txt",
         "format": "human_readable"
+    },
+    "pscan": {
+        "extension": ".pscan",
+        "format": "binary"
     }
 }
 
+# Compressão da saída pela extensão adicional (ex: resultados.ndjson.gz)
+OUTPUT_COMPRESSION = {
+    ".gz": "gzip",
+    ".zst": "zstd"  # requer o pacote zstandard
+}
+
 # Configurações de Logging
 LOGGING_CONFIG = {
     "level": "INFO",
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Listas de exclusão de targets
+
+ExclusionList guarda as faixas que nunca devem ser sondadas (IPs, CIDRs
+e faixas a-b) como intervalos de inteiros ordenados e mesclados, um
+vetor por versão de IP. A consulta de um host é uma busca binária
+(O(log n)) e as redes do target são expandidas já sem as faixas
+excluídas: um /8 com milhares de exclusões não gera nem testa os
+endereços excluídos. Hostnames são comparados apenas pelo nome.
+"""
+
+import bisect
+import ipaddress
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+def host_range(network) -> Tuple[int, int]:
+    """Primeiro e último endereço (inteiros) que network.hosts() geraria"""
+    first, last = int(network.network_address), int(network.broadcast_address)
+    if network.version == 4 and network.prefixlen < 31:
+        return first + 1, last - 1  # sem rede/broadcast
+    if network.version == 6 and network.prefixlen < 127:
+        return first + 1, last  # sem o endereço anycast do roteador da sub-rede
+    return first, last
+
+
+def split_entries(text: str) -> List[str]:
+    """Separa uma lista de exclusões (vírgulas, espaços ou linhas; # inicia comentário)"""
+    entries = []
+    for line in text.splitlines():
+        line = line.split('#', 1)[0]
+        entries.extend(entry for entry in line.replace(',', ' ').split() if entry)
+    return entries
+
+
+def parse_entry(entry: str) -> Tuple[int, int, int]:
+    """Converte IP, CIDR ou faixa a-b em (versão, início, fim)"""
+    if '-' in entry and '/' not in entry:
+        start, _, end = entry.partition('-')
+        try:
+            first, last = ipaddress.ip_address(start.strip()), ipaddress.ip_address(end.strip())
+        except ValueError:
+            pass  # pode ser um hostname com hífen
+        else:
+            if first.version != last.version or first > last:
+                raise ValueError(f"faixa de exclusão inválida: {entry}")
+            return first.version, int(first), int(last)
+    # strict=False: 10.0.0.5/24 exclui a rede 10.0.0.0/24 inteira
+    network = ipaddress.ip_network(entry, strict=False)
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+class ExclusionList:
+    """Faixas de IP e hostnames excluídos da varredura"""
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self.names = set()
+        ranges: Dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            try:
+                version, start, end = parse_entry(entry)
+            except ValueError:
+                # Hostname só se tiver letras e não for um IP/CIDR malformado
+                if not any(c.isalpha() for c in entry) or ':' in entry or '/' in entry:
+                    raise ValueError(f"exclusão inválida: {entry}") from None
+                self.names.add(entry.lower())
+                continue
+            ranges[version].append((start, end))
+
+        # Intervalos mesclados (sobrepostos ou adjacentes), em vetores paralelos para bisect
+        self.starts: Dict[int, List[int]] = {}
+        self.ends: Dict[int, List[int]] = {}
+        for version, items in ranges.items():
+            starts, ends = [], []
+            for start, end in sorted(items):
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.starts[version], self.ends[version] = starts, ends
+
+    @classmethod
+    def load(cls, specs: Iterable[str] = (), files: Iterable[str] = ()) -> 'ExclusionList':
+        """Monta a lista a partir de textos (ex: --exclude) e arquivos (--exclude-file)"""
+        entries = [entry for spec in specs for entry in split_entries(spec)]
+        for path in files:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries.extend(split_entries(f.read()))
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return sum(len(starts) for starts in self.starts.values()) + len(self.names)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def _covers(self, version: int, value: int) -> bool:
+        index = bisect.bisect_right(self.starts[version], value) - 1
+        return index >= 0 and value <= self.ends[version][index]
+
+    def __contains__(self, host: str) -> bool:
+        """Se o host (IP ou hostname) está excluído, em O(log n)"""
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return host.lower() in self.names
+        return self._covers(address.version, int(address))
+
+    def remaining(self, network) -> Iterator[Tuple[int, int]]:
+        """Faixas (inclusivas) dos hosts da rede que não estão excluídos"""
+        first, last = host_range(network)
+        starts, ends = self.starts[network.version], self.ends[network.version]
+        # Começa no último intervalo iniciado antes da rede (pode cobri-la em parte)
+        index = max(0, bisect.bisect_right(starts, first) - 1)
+        current = first
+        while index < len(starts) and starts[index] <= last:
+            if ends[index] >= current:
+                if starts[index] > current:
+                    yield current, starts[index] - 1
+                current = ends[index] + 1
+            index += 1
+        if current <= last:
+            yield current, last
+
+    def count(self, network) -> int:
+        """Hosts da rede fora das exclusões"""
+        return sum(end - start + 1 for start, end in self.remaining(network))
+
+    def hosts(self, network) -> Iterator[str]:
+        """Como network.hosts(), sem os endereços excluídos"""
+        address = type(network.network_address)
+        for start, end in self.remaining(network):
+            for value in range(start, end + 1):
+                yield str(address(value))
+
+    def host_at(self, network, index: int) -> str:
+        """O index-ésimo host não excluído da rede"""
+        for start, end in self.remaining(network):
+            if index <= end - start:
+                return str(type(network.network_address)(start + index))
+            index -= end - start + 1
+        raise IndexError(index)
+
+    def entries(self) -> List[str]:
+        """Forma canônica (faixas mescladas e hostnames), aceita pelo construtor"""
+        entries = []
+        for version, starts in self.starts.items():
+            address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+            for start, end in zip(starts, self.ends[version]):
+                entries.append(str(address(start)) if start == end else f"{address(start)}-{address(end)}")
+        return entries + sorted(self.names)
+
+    def describe(self) -> str:
+        ranges = len(self) - len(self.names)
+        excluded = sum(end - start + 1 for version in self.starts
+                       for start, end in zip(self.starts[version], self.ends[version]))
+        text = f"{ranges} faixa(s), {excluded} endereço(s)"
+        if self.names:
+            text += f", {len(self.names)} hostname(s)"
+        return text
@@ -9,7 +9,225 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
 import queue
 import time
-from port_scanner import PortScanner, expand_cidr, expand_port_range, get_common_ports
+from array import array
+from collections import deque
+from port_scanner import CancellationToken, PortScanner, ScanAggregator, ScanResult, expand_cidr, expand_port_range, get_common_ports
+from port_db import order_by_frequency
+from writers import open_writer
+
+# Tempo máximo por tick da interface processando a fila de resultados
+FRAME_BUDGET = 0.012
+
+# Intervalo entre ticks: com resultados pendentes e com a fila vazia (ms)
+BUSY_INTERVAL = 10
+IDLE_INTERVAL = 100
+
+# Resultados enviados por mensagem da fila
+QUEUE_BATCH = 500
+
+# Intervalo máximo entre envios de resultados e progresso à interface (s)
+FLUSH_INTERVAL = 0.1
+
+# Janela usada no cálculo de sondas/s e do tempo restante (s)
+RATE_WINDOW = 5.0
+
+# Linhas mantidas na tabela; a última fração fica reservada a portas abertas
+VIEW_CAPACITY = 200000
+OPEN_RESERVE = 0.1
+OPEN_STATUSES = ("open", "open|filtered")
+
+# Filtros da tabela: rótulo -> status (None = todos)
+STATUS_FILTERS = {
+    "Todos": None,
+    "Abertas": "open",
+    "Fechadas": "closed",
+    "Filtradas": "filtered",
+    "Abertas|Filtradas": "open|filtered",
+}
+
+STATUS_TAGS = {
+    "open": "open",
+    "closed": "closed",
+    "filtered": "filtered",
+    "open|filtered": "filtered",
+}
+
+
+class ResultView:
+    """
+    Resultados exibidos na tabela, com filtro por status
+
+    Mantém, para cada status, as posições dos resultados na lista; trocar
+    o filtro apenas escolhe outra lista de posições, sem copiar resultados.
+    A lista é limitada a `capacity` linhas: cheia, as portas fechadas e
+    filtradas deixam de ser exibidas (contadas em `omitted`) e a reserva
+    final fica para as abertas. O conjunto completo está no ResultStore
+    do scanner, usado para salvar.
+    """
+    
+    def __init__(self, capacity=VIEW_CAPACITY, open_reserve=OPEN_RESERVE):
+        self.capacity = capacity
+        self.other_limit = capacity - int(capacity * open_reserve)
+        self.results = []
+        self.positions = {}
+        self.status = None
+        self.omitted = 0
+    
+    def append(self, result):
+        limit = self.capacity if result.status in OPEN_STATUSES else self.other_limit
+        if len(self.results) >= limit:
+            self.omitted += 1
+            return
+        self.positions.setdefault(result.status, array('I')).append(len(self.results))
+        self.results.append(result)
+    
+    def set_filter(self, status):
+        self.status = status
+    
+    def __len__(self):
+        if self.status is None:
+            return len(self.results)
+        return len(self.positions.get(self.status, ()))
+    
+    def rows(self, first, count):
+        """Resultados das linhas [first, first + count) da visão atual"""
+        if self.status is None:
+            return self.results[first:first + count]
+        return [self.results[i] for i in self.positions.get(self.status, ())[first:first + count]]
+
+
+class ProgressTracker:
+    """Sondas por segundo (janela deslizante) e tempo restante estimado"""
+    
+    def __init__(self, window=RATE_WINDOW, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self.samples = deque()
+        self.completed = 0
+        self.total = 0
+    
+    def update(self, completed, total):
+        now = self.clock()
+        self.samples.append((now, completed))
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.window:
+            self.samples.popleft()
+        self.completed, self.total = completed, total
+    
+    @property
+    def rate(self):
+        if len(self.samples) < 2:
+            return 0.0
+        (start, first), (end, last) = self.samples[0], self.samples[-1]
+        return (last - first) / (end - start) if end > start else 0.0
+    
+    @property
+    def eta(self):
+        """Segundos restantes, ou None enquanto não há taxa medida"""
+        rate = self.rate
+        return (self.total - self.completed) / rate if rate else None
+    
+    def describe(self):
+        percent = self.completed / self.total * 100 if self.total else 0.0
+        text = f"{self.completed}/{self.total} sondas ({percent:.1f}%) | {self.rate:.0f} sondas/s"
+        eta = self.eta
+        if eta is not None:
+            minutes, seconds = divmod(int(eta), 60)
+            text += f" | restante {minutes:02d}:{seconds:02d}"
+        return text
+
+
+class VirtualResultTable:
+    """
+    Treeview virtualizada: só as linhas visíveis existem no widget
+
+    A barra de rolagem é controlada pela posição na ResultView; rolar ou
+    chegar resultados apenas atualiza os valores das linhas visíveis.
+    """
+    
+    ROW_HEIGHT = 20
+    
+    def __init__(self, parent, view):
+        self.view = view
+        self.first = 0
+        self.visible = 15
+        self.items = []
+        
+        style = ttk.Style(parent)
+        style.configure("Results.Treeview", rowheight=self.ROW_HEIGHT)
+        columns = ("Host", "Port", "Protocol", "Status")
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", height=self.visible,
+                                 style="Results.Treeview")
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=150)
+        self.tree.tag_configure("open", background="#d4edda")
+        self.tree.tag_configure("closed", background="#f8d7da")
+        self.tree.tag_configure("filtered", background="#fff3cd")
+        
+        self.v_scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.on_scrollbar)
+        self.h_scrollbar = ttk.Scrollbar(parent, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.h_scrollbar.set)
+        
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1, "units"))
+    
+    def grid(self, row):
+        self.tree.grid(row=row, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.v_scrollbar.grid(row=row, column=1, sticky=(tk.N, tk.S))
+        self.h_scrollbar.grid(row=row + 1, column=0, sticky=(tk.W, tk.E))
+    
+    @property
+    def at_end(self):
+        return self.first + self.visible >= len(self.view)
+    
+    def on_resize(self, event):
+        # Uma linha é ocupada pelo cabeçalho
+        visible = max(1, event.height // self.ROW_HEIGHT - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+    
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first = int(float(amount) * len(self.view))
+            self.refresh()
+        else:
+            self.scroll(int(amount), unit)
+    
+    def scroll(self, amount, unit):
+        self.first += amount * (self.visible if unit == "pages" else 3)
+        self.refresh()
+        return "break"
+    
+    def follow(self):
+        """Mantém as últimas linhas visíveis enquanto chegam resultados"""
+        self.first = len(self.view)
+        self.refresh()
+    
+    def reset(self):
+        self.first = 0
+        self.refresh()
+    
+    def refresh(self):
+        """Reescreve as linhas visíveis a partir da posição atual"""
+        total = len(self.view)
+        self.first = max(0, min(self.first, total - self.visible))
+        rows = self.view.rows(self.first, self.visible)
+        
+        while len(self.items) < len(rows):
+            self.items.append(self.tree.insert("", tk.END))
+        while len(self.items) > len(rows):
+            self.tree.delete(self.items.pop())
+        for item, result in zip(self.items, rows):
+            self.tree.item(item, values=(result.host, result.port, result.protocol, result.status.upper()),
+                           tags=(STATUS_TAGS.get(result.status, ""),))
+        
+        if total:
+            self.v_scrollbar.set(self.first / total, min(1.0, (self.first + len(rows)) / total))
+        else:
+            self.v_scrollbar.set(0, 1)
 
 
 class PortScannerGUI:
@@ -26,6 +244,11 @@ class PortScannerGUI:
         # Variáveis
         self.scanning = False
         self.scan_thread = None
+        self.scanner = None
+        self.cancel_token = None
+        # ResultStore da última varredura (completo, com despejo em disco): usado ao salvar
+        self.scan_results = None
+        self.tracker = ProgressTracker()
         
         self.setup_ui()
         
@@ -111,43 +334,43 @@ class PortScannerGUI:
         self.progress_var = tk.StringVar(value="Pronto para iniciar varredura")
         ttk.Label(main_frame, textvariable=self.progress_var).grid(row=5, column=0, columnspan=2, sticky=tk.W)
         
-        self.progress_bar = ttk.Progressbar(main_frame, mode='indeterminate')
+        self.progress_bar = ttk.Progressbar(main_frame, mode='determinate')
         self.progress_bar.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 10))
         
         # Área de resultados
         results_frame = ttk.LabelFrame(main_frame, text="Resultados", padding="5")
         results_frame.grid(row=7, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
         
-        # Treeview para resultados
-        columns = ("Host", "Port", "Protocol", "Status")
-        self.results_tree = ttk.Treeview(results_frame, columns=columns, show="headings", height=15)
-        
-        for col in columns:
-            self.results_tree.heading(col, text=col)
-            self.results_tree.column(col, width=150)
-        
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=self.results_tree.yview)
-        h_scrollbar = ttk.Scrollbar(results_frame, orient="horizontal", command=self.results_tree.xview)
-        self.results_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        self.results_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        # Filtro por status (troca a visão sem recriar as linhas)
+        filter_frame = ttk.Frame(results_frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        ttk.Label(filter_frame, text="Exibir:").grid(row=0, column=0, sticky=tk.W)
+        self.filter_var = tk.StringVar(value="Todos")
+        filter_combo = ttk.Combobox(filter_frame, textvariable=self.filter_var, values=list(STATUS_FILTERS),
+                                    state="readonly", width=18)
+        filter_combo.grid(row=0, column=1, sticky=tk.W, padx=(5, 10))
+        filter_combo.bind("<<ComboboxSelected>>", self.apply_filter)
+        self.count_var = tk.StringVar(value="")
+        ttk.Label(filter_frame, textvariable=self.count_var).grid(row=0, column=2, sticky=tk.W)
+        
+        # Tabela virtualizada sobre os resultados
+        self.result_view = ResultView()
+        self.results_table = VirtualResultTable(results_frame, self.result_view)
+        self.results_table.grid(row=1)
         
         # Configurar redimensionamento
         main_frame.columnconfigure(1, weight=1)
         main_frame.rowconfigure(7, weight=1)
         results_frame.columnconfigure(0, weight=1)
-        results_frame.rowconfigure(0, weight=1)
+        results_frame.rowconfigure(1, weight=1)
         target_frame.columnconfigure(1, weight=1)
         ports_frame.columnconfigure(1, weight=1)
         
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         
-        # Variável para armazenar resultados
-        self.scan_results = []
+        # Resumo da varredura, atualizado a cada resultado
+        self.summary = ScanAggregator()
     
     def start_scan(self):
         """Inicia a varredura"""
@@ -198,8 +421,6 @@ class PortScannerGUI:
             elif port_mode == "top1000":
                 ports.extend(common_ports['tcp_top1000'])
         
-        ports = sorted(list(set(ports)))
-        
         # Determina protocolos
         protocols = []
         if self.tcp_var.get():
@@ -207,6 +428,9 @@ class PortScannerGUI:
         if self.udp_var.get():
             protocols.append('UDP')
         
+        # Portas mais prováveis de estarem abertas primeiro
+        ports = order_by_frequency(ports, [p.lower() for p in protocols])
+        
         # Expande targets
         try:
             targets = expand_cidr(target)
@@ -218,139 +442,198 @@ class PortScannerGUI:
         self.scanning = True
         self.scan_button.config(state="disabled")
         self.stop_button.config(state="normal")
-        self.progress_bar.start()
+        self.tracker = ProgressTracker()
+        self.progress_bar.config(maximum=max(1, len(targets) * len(ports) * len(protocols)), value=0)
         self.clear_results()
         
+        # Token criado antes da thread: Parar funciona mesmo antes do scanner existir
+        self.cancel_token = CancellationToken()
+        
         # Inicia thread de varredura
         self.scan_thread = threading.Thread(
             target=self.scan_worker,
-            args=(targets, ports, protocols, timeout, threads),
+            args=(targets, ports, protocols, timeout, threads, self.cancel_token),
             daemon=True
         )
         self.scan_thread.start()
     
-    def scan_worker(self, targets, ports, protocols, timeout, threads):
-        """Worker thread para realizar a varredura"""
+    def scan_worker(self, targets, ports, protocols, timeout, threads, cancel_token):
+        """Worker thread: envia resultados e progresso à medida que as sondas terminam"""
         try:
-            scanner = PortScanner(timeout=timeout, max_threads=threads)
+            scanner = PortScanner(timeout=timeout, max_threads=threads, cancel_token=cancel_token)
+            self.scanner = scanner
             
             # Atualiza progresso
             self.result_queue.put(("progress", f"Escaneando {len(targets)} host(s), {len(ports)} porta(s)"))
             
-            # Realiza varredura
-            results = scanner.scan_range(targets, ports, protocols)
+            # Callbacks rodam na thread de despacho: acumulam e enviam em lotes
+            batch = []
+            last_flush = time.monotonic()
             
-            # Envia resultados
-            for result in results:
-                self.result_queue.put(("result", result))
+            def flush(completed, total):
+                nonlocal batch, last_flush
+                if batch:
+                    self.result_queue.put(("results", batch))
+                    batch = []
+                self.result_queue.put(("stats", (completed, total)))
+                last_flush = time.monotonic()
             
-            self.result_queue.put(("complete", f"Varredura concluída. {len(results)} portas verificadas."))
+            def on_progress(completed, total):
+                if (len(batch) >= QUEUE_BATCH or completed == total
+                        or time.monotonic() - last_flush >= FLUSH_INTERVAL):
+                    flush(completed, total)
+            
+            results = scanner.scan_range(targets, ports, protocols, progress_callback=on_progress,
+                                         result_callback=lambda result: batch.append(result))
+            if batch:
+                self.result_queue.put(("results", batch))
+            self.scan_results = results
+            
+            if scanner.stop_reason == "cancelled":
+                self.result_queue.put(("stopped", f"Varredura interrompida. {len(results)} portas verificadas."))
+            else:
+                self.result_queue.put(("complete", f"Varredura concluída. {len(results)} portas verificadas."))
             
         except Exception as e:
             self.result_queue.put(("error", str(e)))
+        finally:
+            self.scanner = None
     
     def stop_scan(self):
-        """Para a varredura"""
-        self.scanning = False
-        self.scan_button.config(state="normal")
+        """Interrompe a varredura: sondas pendentes são descartadas e as em andamento abortadas"""
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
         self.stop_button.config(state="disabled")
-        self.progress_bar.stop()
-        self.progress_var.set("Varredura interrompida")
+        self.progress_var.set("Interrompendo varredura...")
     
     def check_queue(self):
-        """Verifica messages da queue de resultados"""
+        """Processa a queue de resultados dentro do orçamento de um tick"""
+        deadline = time.perf_counter() + FRAME_BUDGET
+        follow = self.results_table.at_end
+        added = False
         try:
-            while True:
+            while time.perf_counter() < deadline:
                 msg_type, data = self.result_queue.get_nowait()
                 
                 if msg_type == "progress":
                     self.progress_var.set(data)
-                elif msg_type == "result":
-                    self.add_result(data)
+                elif msg_type == "results":
+                    self.add_results(data)
+                    added = True
+                elif msg_type == "stats":
+                    self.update_progress(*data)
                 elif msg_type == "complete":
                     self.scan_complete(data)
+                elif msg_type == "stopped":
+                    self.scan_stopped(data)
                 elif msg_type == "error":
                     self.scan_error(data)
         except queue.Empty:
             pass
         
-        # Agenda próxima verificação
-        self.root.after(100, self.check_queue)
+        # A tabela é redesenhada uma vez por tick, não por resultado
+        if added:
+            if follow:
+                self.results_table.follow()
+            else:
+                self.results_table.refresh()
+            self.update_count()
+        
+        # Agenda próxima verificação (antes, se ainda há resultados na fila)
+        interval = IDLE_INTERVAL if self.result_queue.empty() else BUSY_INTERVAL
+        self.root.after(interval, self.check_queue)
+    
+    def add_results(self, results):
+        """Armazena resultados; a tabela exibe apenas as linhas visíveis"""
+        for result in results:
+            self.result_view.append(result)
+            self.summary.add(result)
+    
+    def update_progress(self, completed, total):
+        """Barra determinada, sondas/s e tempo restante"""
+        self.tracker.update(completed, total)
+        self.progress_bar.config(maximum=max(1, total), value=completed)
+        if self.scanner is not None and self.scanner.stop_reason is None:
+            self.progress_var.set(self.tracker.describe())
+    
+    def apply_filter(self, event=None):
+        """Troca o status exibido sem recriar a tabela"""
+        self.result_view.set_filter(STATUS_FILTERS[self.filter_var.get()])
+        self.results_table.reset()
+        self.update_count()
     
-    def add_result(self, result):
-        """Adiciona resultado à tree view"""
-        # Define cor baseada no status
-        tags = []
-        if result.status == "open":
-            tags = ["open"]
-        elif result.status == "closed":
-            tags = ["closed"]
-        elif "filtered" in result.status:
-            tags = ["filtered"]
-        
-        # Adiciona à tree
-        item = self.results_tree.insert("", tk.END, values=(
-            result.host, result.port, result.protocol, result.status.upper()
-        ), tags=tags)
-        
-        # Armazena resultado
-        self.scan_results.append(result)
-        
-        # Configura cores
-        self.results_tree.tag_configure("open", background="#d4edda")
-        self.results_tree.tag_configure("closed", background="#f8d7da")
-        self.results_tree.tag_configure("filtered", background="#fff3cd")
+    def update_count(self):
+        total = len(self.result_view.results)
+        shown = len(self.result_view)
+        text = f"{shown} de {total} resultado(s)" if shown != total else f"{total} resultado(s)"
+        if self.result_view.omitted:
+            text += f" ({self.result_view.omitted} não exibido(s); use Salvar para todos)"
+        self.count_var.set(text)
     
     def scan_complete(self, message):
         """Callback quando varredura completa"""
         self.scanning = False
         self.scan_button.config(state="normal")
         self.stop_button.config(state="disabled")
-        self.progress_bar.stop()
         self.progress_var.set(message)
         
         # Mostra estatísticas
-        open_count = len([r for r in self.scan_results if r.status == "open"])
-        closed_count = len([r for r in self.scan_results if r.status == "closed"])
-        filtered_count = len([r for r in self.scan_results if "filtered" in r.status])
+        counts = self.summary.counts
+        open_count = counts.get("open", 0)
+        closed_count = counts.get("closed", 0)
+        filtered_count = counts.get("filtered", 0) + counts.get("open|filtered", 0)
         
         stats_message = f"Portas abertas: {open_count}, fechadas: {closed_count}, filtradas: {filtered_count}"
         messagebox.showinfo("Varredura Concluída", f"{message}\n\n{stats_message}")
     
+    def scan_stopped(self, message):
+        """Callback quando a varredura foi interrompida pelo usuário"""
+        self.scanning = False
+        self.scan_button.config(state="normal")
+        self.stop_button.config(state="disabled")
+        self.progress_var.set(message)
+    
     def scan_error(self, error_msg):
         """Callback quando há erro na varredura"""
         self.scanning = False
         self.scan_button.config(state="normal")
         self.stop_button.config(state="disabled")
-        self.progress_bar.stop()
         self.progress_var.set("Erro na varredura")
         messagebox.showerror("Erro na Varredura", f"Erro durante a varredura:\n{error_msg}")
     
     def clear_results(self):
         """Limpa os resultados"""
-        for item in self.results_tree.get_children():
-            self.results_tree.delete(item)
-        self.scan_results = []
+        self.result_view = ResultView()
+        self.result_view.set_filter(STATUS_FILTERS[self.filter_var.get()])
+        self.results_table.view = self.result_view
+        self.results_table.reset()
+        self.update_count()
+        self.summary = ScanAggregator()
+        if self.scan_results is not None:
+            self.scan_results.close()
+            self.scan_results = None
         self.progress_var.set("Resultados limpos")
     
     def save_results(self):
-        """Salva os resultados em arquivo CSV"""
+        """Salva todos os resultados da última varredura (formato pela extensão escolhida)"""
+        if self.scanning:
+            messagebox.showwarning("Aviso", "Aguarde o fim da varredura para salvar")
+            return
         if not self.scan_results:
             messagebox.showwarning("Aviso", "Nenhum resultado para salvar")
             return
         
         filename = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            filetypes=[("CSV files", "*.csv"), ("NDJSON files", "*.ndjson"), ("JSON files", "*.json"),
+                       ("XML files", "*.xml"), ("Text files", "*.txt"), ("All files", "*.*")],
             title="Salvar Resultados"
         )
         
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write("Host,Port,Protocol,Status\n")
-                    for result in self.scan_results:
-                        f.write(f"{result.host},{result.port},{result.protocol},{result.status}\n")
+                with open_writer(filename) as writer:
+                    writer.write_many(self.scan_results)
                 
                 messagebox.showinfo("Sucesso", f"Resultados salvos em:\n{filename}")
             except Exception as e:
@@ -362,6 +645,12 @@ def main():
     root = tk.Tk()
     app = PortScannerGUI(root)
     
+    # Fechar a janela interrompe a varredura em andamento
+    def on_close():
+        app.stop_scan()
+        root.destroy()
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    
     try:
         root.mainloop()
     except KeyboardInterrupt:
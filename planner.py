@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Planejamento e estimativa de custo de varreduras
+Calcula o número de sondas aritmeticamente (sem expandir os targets),
+estima a duração a partir do timeout, da concorrência, do perfil de
+protocolos e das estatísticas de varreduras anteriores, e escolhe a
+estratégia da varredura a partir de uma pré-varredura por amostragem
+"""
+
+import ipaddress
+import random
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Iterable, List, Optional
+
+# Limites padrão acima dos quais a estimativa gera aviso
+DEFAULT_LIMITS = {
+    "max_probes": 10_000_000,
+    "max_duration": 4 * 3600,  # segundos
+}
+
+# Concorrência média assumida para --threads auto (a janela AIMD parte de
+# 10 e cresce até o máximo; na prática estabiliza bem abaixo dele)
+AUTO_CONCURRENCY_ESTIMATE = 100
+
+
+@dataclass
+class ScanStats:
+    """
+    Estatísticas de rede usadas no modelo de custo
+
+    rtt_ms: duração típica de uma sonda respondida (open/closed)
+    response_ratio: fração das sondas TCP respondidas antes do timeout
+    open_ratio: fração das sondas que encontram porta aberta
+    """
+    rtt_ms: float = 50.0
+    response_ratio: float = 0.7
+    open_ratio: float = 0.01
+    samples: int = 0
+
+    @classmethod
+    def from_summaries(cls, summaries: Iterable[Dict]) -> 'ScanStats':
+        """
+        Agrega resumos de ScanHistory (results_by_status e latency),
+        ponderando cada varredura pelo número de sondas
+        """
+        probes = responded = opened = 0
+        rtt_weighted = 0.0
+        rtt_count = 0
+        for summary in summaries:
+            counts = summary.get('results_by_status') or {}
+            total = sum(counts.values())
+            if not total:
+                continue
+            probes += total
+            responded += counts.get('open', 0) + counts.get('closed', 0)
+            opened += counts.get('open', 0)
+            by_status = (summary.get('latency') or {}).get('by_status') or {}
+            for status in ('open', 'closed'):
+                stats = by_status.get(status) or {}
+                if stats.get('count'):
+                    rtt_weighted += stats['mean_ms'] * stats['count']
+                    rtt_count += stats['count']
+
+        if not probes:
+            return cls()
+        defaults = cls()
+        return cls(
+            rtt_ms=rtt_weighted / rtt_count if rtt_count else defaults.rtt_ms,
+            response_ratio=responded / probes,
+            open_ratio=opened / probes,
+            samples=probes,
+        )
+
+
+@dataclass
+class ScanPlan:
+    """Resultado do planejamento: tamanho, duração estimada e avisos"""
+    hosts: int
+    ports: int
+    protocols: List[str]
+    probes: int
+    concurrency: int
+    estimated_seconds: float
+    expected_open: int
+    stats: ScanStats
+    warnings: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data['estimated_seconds'] = round(self.estimated_seconds, 1)
+        data['estimated_duration'] = format_duration(self.estimated_seconds)
+        return data
+
+
+def count_targets(target: str, exclude=None) -> int:
+    """
+    Conta os hosts que expand_cidr geraria, sem gerar a lista
+    (mesma semântica de network.hosts(): sem rede/broadcast em IPv4).
+    Com exclude (ExclusionList), desconta as faixas excluídas.
+    """
+    total = 0
+    for part in target.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            network = ipaddress.ip_network(part, strict=False)
+        except ValueError:
+            if not exclude or part not in exclude:
+                total += 1  # hostname
+            continue
+        if exclude:
+            total += exclude.count(network)
+            continue
+        size = network.num_addresses
+        if network.version == 4 and network.prefixlen < 31:
+            size -= 2
+        elif network.version == 6 and network.prefixlen < 127:
+            size -= 1  # endereço anycast do roteador da sub-rede
+        total += size
+    return total
+
+
+def _target_parts(target: str, exclude=None):
+    """Gera (parte, quantidade de hosts) para cada item da lista de targets"""
+    for part in target.split(','):
+        part = part.strip()
+        if part:
+            yield part, count_targets(part, exclude)
+
+
+def host_at(target: str, index: int, exclude=None) -> str:
+    """
+    Retorna o index-ésimo host que expand_cidr geraria, em O(partes),
+    sem expandir a lista
+    """
+    for part, size in _target_parts(target, exclude):
+        if index < size:
+            try:
+                network = ipaddress.ip_network(part, strict=False)
+            except ValueError:
+                return part
+            if exclude:
+                return exclude.host_at(network, index)
+            # hosts() pula o endereço de rede quando há mais de dois endereços
+            offset = 1 if size < network.num_addresses else 0
+            return str(network.network_address + offset + index)
+        index -= size
+    raise IndexError(index)
+
+
+def count_ports(port_spec: str, presets: Optional[Dict[str, int]] = None) -> int:
+    """
+    Conta portas distintas de uma especificação (ex: 1-1000,22) sem
+    expandi-la; presets mapeia nomes de listas (ex: top100) ao tamanho
+    """
+    spec = port_spec.strip().lower()
+    if presets and spec in presets:
+        return presets[spec]
+
+    intervals = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = map(int, part.split('-'))
+        else:
+            start = end = int(part)
+        if start <= end:
+            intervals.append((start, end))
+
+    # Une intervalos sobrepostos para não contar portas repetidas
+    total = 0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end + 1:
+            if current_end is not None:
+                total += current_end - current_start + 1
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start + 1
+    return total
+
+
+def probe_seconds(protocol: str, timeout: float, stats: ScanStats,
+                  retries: int = 0, backoff: float = 2.0) -> float:
+    """
+    Duração esperada de uma sonda: respostas levam ~RTT; sondas sem
+    resposta esperam o timeout de cada tentativa. UDP sem payload quase
+    nunca responde, então conta como timeout.
+    """
+    unanswered = timeout * sum(backoff ** attempt for attempt in range(retries + 1))
+    if protocol.upper() == 'UDP':
+        return unanswered
+    answered = stats.rtt_ms / 1000
+    return stats.response_ratio * answered + (1 - stats.response_ratio) * unanswered
+
+
+def estimate(hosts: int, ports: int, protocols: Iterable[str], timeout: float,
+             threads, stats: Optional[ScanStats] = None, retries: int = 0,
+             backoff: float = 2.0, per_host_limit: Optional[int] = None,
+             time_budget: Optional[float] = None,
+             limits: Optional[Dict] = None,
+             protocol_settings: Optional[Dict[str, Dict]] = None) -> ScanPlan:
+    """
+    Estima o custo de uma varredura a partir das contagens. Cada protocolo
+    tem pool próprio (threads, timeout e taxa em protocol_settings), então
+    a duração é a do protocolo mais lento.
+    """
+    protocols = [p.upper() for p in protocols] or ['TCP']
+    stats = stats or ScanStats()
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    protocol_settings = {proto.upper(): options for proto, options in (protocol_settings or {}).items()}
+
+    probes = hosts * ports * len(protocols)
+    concurrency = 0
+    seconds = 0.0
+    for protocol in protocols:
+        options = protocol_settings.get(protocol, {})
+        lane_threads = options.get('threads') or threads
+        lane_concurrency = AUTO_CONCURRENCY_ESTIMATE if lane_threads == 'auto' else int(lane_threads)
+        if per_host_limit:
+            lane_concurrency = min(lane_concurrency, hosts * per_host_limit)
+        lane_concurrency = max(1, min(lane_concurrency, hosts * ports or 1))
+        concurrency += lane_concurrency
+
+        lane_timeout = options.get('timeout') or timeout
+        lane_seconds = hosts * ports * probe_seconds(protocol, lane_timeout, stats, retries, backoff) / lane_concurrency
+        if options.get('rate'):
+            lane_seconds = max(lane_seconds, hosts * ports / options['rate'])
+        seconds = max(seconds, lane_seconds)
+
+    warnings = []
+    if time_budget and seconds > time_budget:
+        warnings.append(f"A varredura será interrompida pelo limite de tempo "
+                        f"({format_duration(time_budget)}) antes de terminar")
+        seconds = time_budget
+    if probes > limits['max_probes']:
+        warnings.append(f"{probes:,} sondas excedem o limite de {limits['max_probes']:,}")
+    if seconds > limits['max_duration']:
+        warnings.append(f"Duração estimada de {format_duration(seconds)} excede o limite de "
+                        f"{format_duration(limits['max_duration'])}")
+
+    return ScanPlan(
+        hosts=hosts,
+        ports=ports,
+        protocols=protocols,
+        probes=probes,
+        concurrency=concurrency,
+        estimated_seconds=seconds,
+        expected_open=round(probes * stats.open_ratio),
+        stats=stats,
+        warnings=warnings,
+    )
+
+
+def format_duration(seconds: float) -> str:
+    """Formata segundos como 1h02m03s"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+def print_plan(plan: ScanPlan) -> None:
+    """Exibe o plano no terminal"""
+    print("\n" + "=" * 60)
+    print("ESTIMATIVA DA VARREDURA")
+    print("=" * 60)
+    print(f"[*] Hosts: {plan.hosts:,} | Portas: {plan.ports:,} | Protocolos: {', '.join(plan.protocols)}")
+    print(f"[*] Sondas: {plan.probes:,} | Concorrência: {plan.concurrency}")
+    print(f"[*] Duração estimada: {format_duration(plan.estimated_seconds)}")
+    print(f"[*] Portas abertas esperadas: ~{plan.expected_open:,}")
+    source = f"{plan.stats.samples:,} sondas anteriores" if plan.stats.samples else "valores padrão"
+    print(f"[*] Modelo: RTT {plan.stats.rtt_ms:.1f}ms | respostas {plan.stats.response_ratio:.0%} ({source})")
+    for warning in plan.warnings:
+        print(f"[!] {warning}")
+
+
+# Parâmetros da pré-varredura por amostragem
+SAMPLE_HOSTS = 32
+SAMPLE_PORTS = 20
+DISCOVERY_PORTS = 5
+
+# Abaixo desta fração de hosts ativos a descoberta de hosts compensa
+DISCOVERY_DENSITY = 0.5
+
+# Timeout escolhido = RTT p99 x fator, limitado ao timeout informado
+RTT_TIMEOUT_FACTOR = 4
+MIN_TIMEOUT = 0.25
+
+# Com muitas sondas sem resposta as threads passam o tempo esperando
+# timeouts; a concorrência é dobrada até o limite
+HIGH_FILTERED_RATIO = 0.5
+MAX_AUTO_THREADS = 500
+
+
+@dataclass
+class SampleStats:
+    """Medições da pré-varredura por amostragem"""
+    hosts_total: int
+    hosts_sampled: int
+    probes: int
+    live_hosts: int
+    filtered_ratio: float
+    open_ports: List[int]
+    rtt_p50_ms: Optional[float] = None
+    rtt_p90_ms: Optional[float] = None
+    rtt_p99_ms: Optional[float] = None
+
+    @property
+    def live_density(self) -> float:
+        return self.live_hosts / self.hosts_sampled if self.hosts_sampled else 0.0
+
+
+@dataclass
+class AutoPlan:
+    """Configuração escolhida para a varredura principal e o porquê"""
+    sample: SampleStats
+    discovery: bool
+    discovery_ports: List[int]
+    timeout: float
+    threads: object
+    ports: List[int]
+    reasons: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data['sample']['live_density'] = round(self.sample.live_density, 3)
+        # A lista completa de portas já está no job; registra só o início
+        data['ports'] = self.ports[:20]
+        return data
+
+
+def _percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+
+def presample(scanner, target: str, ports: List[int], protocols: Iterable[str],
+              host_sample: int = SAMPLE_HOSTS, port_sample: int = SAMPLE_PORTS,
+              seed: Optional[int] = None, exclude=None) -> SampleStats:
+    """
+    Sonda uma amostra aleatória de hosts x portas do espaço de targets.
+    Metade das portas da amostra são as mais prováveis (início da lista
+    ordenada por frequência) e o restante é sorteado. Hosts excluídos
+    (exclude) nunca entram na amostra.
+    """
+    rng = random.Random(seed)
+    total = count_targets(target, exclude)
+    hosts = [host_at(target, index, exclude)
+             for index in sorted(rng.sample(range(total), min(host_sample, total)))]
+
+    head = ports[:port_sample // 2]
+    tail = ports[port_sample // 2:]
+    sample_ports = head + rng.sample(tail, min(len(tail), port_sample - len(head)))
+
+    results = scanner.scan_range(hosts, sample_ports, list(protocols))
+
+    live = {r.host for r in results if r.status in ('open', 'closed')}
+    tcp = [r for r in results if r.protocol == 'TCP']
+    filtered = sum(1 for r in tcp if r.status == 'filtered')
+    rtts = sorted(r.response_time for r in results
+                  if r.status in ('open', 'closed') and r.response_time is not None)
+    return SampleStats(
+        hosts_total=total,
+        hosts_sampled=len(hosts),
+        probes=len(results),
+        live_hosts=len(live),
+        filtered_ratio=filtered / len(tcp) if tcp else 0.0,
+        open_ports=sorted({r.port for r in results if r.status == 'open'}),
+        rtt_p50_ms=_percentile(rtts, 0.50),
+        rtt_p90_ms=_percentile(rtts, 0.90),
+        rtt_p99_ms=_percentile(rtts, 0.99),
+    )
+
+
+def choose_plan(sample: SampleStats, timeout: float, threads, ports: List[int]) -> AutoPlan:
+    """Configura a varredura principal a partir da amostra"""
+    reasons = []
+
+    # Descoberta de hosts só compensa em redes esparsas maiores que a amostra
+    discovery = sample.hosts_total > sample.hosts_sampled and sample.live_density < DISCOVERY_DENSITY
+    discovery_ports = []
+    if discovery:
+        seen_open = [port for port in ports if port in set(sample.open_ports)]
+        discovery_ports = (seen_open + [port for port in ports if port not in seen_open])[:DISCOVERY_PORTS]
+        reasons.append(f"{sample.live_density:.0%} dos hosts amostrados responderam: "
+                       f"descoberta de hosts nas portas {discovery_ports}")
+
+    if sample.rtt_p99_ms is not None:
+        chosen = max(MIN_TIMEOUT, sample.rtt_p99_ms * RTT_TIMEOUT_FACTOR / 1000)
+        if chosen < timeout:
+            reasons.append(f"RTT p99 de {sample.rtt_p99_ms:.1f}ms: timeout reduzido de {timeout}s para {chosen:.2f}s")
+            timeout = round(chosen, 3)
+
+    if threads != 'auto' and sample.filtered_ratio >= HIGH_FILTERED_RATIO and threads < MAX_AUTO_THREADS:
+        increased = min(MAX_AUTO_THREADS, threads * 2)
+        reasons.append(f"{sample.filtered_ratio:.0%} das sondas sem resposta: threads de {threads} para {increased}")
+        threads = increased
+
+    if sample.open_ports:
+        opened = set(sample.open_ports)
+        ports = [port for port in ports if port in opened] + [port for port in ports if port not in opened]
+        reasons.append(f"Portas abertas na amostra sondadas primeiro: {sample.open_ports[:10]}")
+
+    return AutoPlan(sample, discovery, discovery_ports, timeout, threads, ports, reasons)
+
+
+def discover_hosts(scanner, hosts: List[str], ports: List[int]) -> List[str]:
+    """Mantém apenas os hosts que responderam (open ou RST) em alguma porta"""
+    results = scanner.scan_range(hosts, ports, ['TCP'])
+    live = {r.host for r in results if r.status in ('open', 'closed')}
+    return [host for host in hosts if host in live]
+
+
+def print_auto_plan(plan: AutoPlan) -> None:
+    """Exibe a estratégia escolhida"""
+    sample = plan.sample
+    print("\n[+] Pré-varredura: "
+          f"{sample.live_hosts}/{sample.hosts_sampled} hosts ativos | "
+          f"{sample.filtered_ratio:.0%} sem resposta | RTT p50 {sample.rtt_p50_ms or 0:.1f}ms")
+    for reason in plan.reasons or ["Amostra não indicou ajustes; configuração mantida"]:
+        print(f"[+] Plano: {reason}")
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Base de frequência de portas
+Tabela no estilo nmap-services com a probabilidade observada de cada porta
+estar aberta, usada para ordenar varreduras da porta mais provável para a
+menos provável
+"""
+
+from typing import Dict, List, Iterable
+
+# Formato: <serviço> <porta>/<protocolo> <frequência de abertura>
+# Frequências aproximadas a partir das estatísticas públicas do nmap-services
+SERVICES_TABLE = """
+http            80/tcp      0.484143
+telnet          23/tcp      0.221265
+https           443/tcp     0.208669
+ftp             21/tcp      0.197667
+ssh             22/tcp      0.182286
+smtp            25/tcp      0.131314
+ms-wbt-server   3389/tcp    0.083904
+pop3            110/tcp     0.077142
+microsoft-ds    445/tcp     0.056944
+netbios-ssn     139/tcp     0.050809
+imap            143/tcp     0.050137
+domain          53/tcp      0.048463
+msrpc           135/tcp     0.047798
+mysql           3306/tcp    0.045390
+http-proxy      8080/tcp    0.042052
+pptp            1723/tcp    0.039721
+rpcbind         111/tcp     0.030034
+pop3s           995/tcp     0.029921
+imaps           993/tcp     0.027199
+vnc             5900/tcp    0.023390
+rtsp            554/tcp     0.018846
+ident           113/tcp     0.017004
+submission      587/tcp     0.016892
+http-alt        8000/tcp    0.016482
+nfs             2049/tcp    0.015984
+https-alt       8443/tcp    0.015102
+postgresql      5432/tcp    0.014890
+ms-sql-s        1433/tcp    0.014152
+smtps           465/tcp     0.013581
+sip             5060/tcp    0.012997
+upnp            49152/tcp   0.012345
+printer         515/tcp     0.011876
+ipp             631/tcp     0.011519
+redis           6379/tcp    0.010998
+oracle          1521/tcp    0.010532
+jetdirect       9100/tcp    0.010211
+http-alt        8008/tcp    0.009875
+cslistener      9000/tcp    0.009642
+http-rpc-epmap  593/tcp     0.009311
+ldap            389/tcp     0.008992
+snmp            161/tcp     0.008713
+unknown         49153/tcp   0.008427
+sunrpc-alt      32768/tcp   0.008103
+rsftp           26/tcp      0.007997
+vnc-1           5901/tcp    0.007734
+x11             6000/tcp    0.007512
+mongod          27017/tcp   0.007344
+ftp-data        20/tcp      0.007119
+ldaps           636/tcp     0.006890
+exec            512/tcp     0.006702
+login           513/tcp     0.006581
+shell           514/tcp     0.006432
+kerberos-sec    88/tcp      0.006297
+http-proxy-alt  3128/tcp    0.006118
+socks           1080/tcp    0.005987
+squid-http      8888/tcp    0.005842
+ppp             3000/tcp    0.005719
+upnp            5000/tcp    0.005633
+afp             548/tcp     0.005498
+rtsp-alt        8554/tcp    0.005311
+unknown         49154/tcp   0.005203
+irc             6667/tcp    0.005117
+cisco-sccp      2000/tcp    0.005008
+lpd             10000/tcp   0.004912
+ms-sql-m        1434/tcp    0.004806
+finger          79/tcp      0.004711
+time            37/tcp      0.004620
+nntp            119/tcp     0.004502
+daytime         13/tcp      0.004419
+bgp             179/tcp     0.004301
+ntp             123/tcp     0.004210
+iss-realsecure  902/tcp     0.004037
+cpanel          2082/tcp    0.003944
+cpanel-ssl      2083/tcp    0.003871
+whm             2087/tcp    0.003790
+elasticsearch   9200/tcp    0.003712
+memcached       11211/tcp   0.003630
+http-alt        8081/tcp    0.003555
+http-alt        9090/tcp    0.003478
+proxmox         8006/tcp    0.003402
+nrpe            5666/tcp    0.003331
+zabbix-agent    10050/tcp   0.003260
+amqp            5672/tcp    0.003191
+kubernetes      6443/tcp    0.003125
+docker          2375/tcp    0.003061
+docker-s        2376/tcp    0.002999
+winrm           5985/tcp    0.002938
+winrm-s         5986/tcp    0.002880
+rdp-alt         3390/tcp    0.002822
+dnp             1025/tcp    0.002765
+nfs-or-iis      1026/tcp    0.002711
+iad1            1027/tcp    0.002658
+blackjack       1029/tcp    0.002606
+netbios-ns      137/tcp     0.002555
+xmpp-client     5222/tcp    0.002505
+minecraft       25565/tcp   0.002457
+tomcat-ajp      8009/tcp    0.002410
+http-mgmt       8010/tcp    0.002364
+webmin          10001/tcp   0.002319
+sip-tls         5061/tcp    0.002275
+vnc-2           5902/tcp    0.002232
+unknown         49155/tcp   0.002190
+nessus          8834/tcp    0.002149
+kibana          5601/tcp    0.002109
+couchdb         5984/tcp    0.002070
+cassandra       9042/tcp    0.002032
+rabbitmq-mgmt   15672/tcp   0.001995
+git             9418/tcp    0.001959
+svn             3690/tcp    0.001924
+rsync           873/tcp     0.001890
+openvpn         1194/tcp    0.001857
+echo            7/tcp       0.001825
+discard         9/tcp       0.001794
+chargen         19/tcp      0.001764
+tftp            69/tcp      0.001735
+gopher          70/tcp      0.001707
+pop2            109/tcp     0.001680
+uucp            540/tcp     0.001654
+rtmp            1935/tcp    0.001629
+iscsi           3260/tcp    0.001605
+epmd            4369/tcp    0.001582
+oracle-tns      1526/tcp    0.001560
+db2             50000/tcp   0.001539
+msdp            639/tcp     0.001519
+ipsec-nat-t     4500/tcp    0.001500
+ipp             631/udp     0.450281
+snmp            161/udp     0.433467
+netbios-ns      137/udp     0.365163
+ntp             123/udp     0.330879
+netbios-dgm     138/udp     0.297830
+ms-sql-m        1434/udp    0.293184
+microsoft-ds    445/udp     0.253118
+msrpc           135/udp     0.244452
+dhcps           67/udp      0.228010
+domain          53/udp      0.213496
+netbios-ssn     139/udp     0.193434
+isakmp          500/udp     0.163742
+dhcpc           68/udp      0.140118
+route           520/udp     0.139376
+upnp            1900/udp    0.136543
+nat-t-ike       4500/udp    0.124467
+syslog          514/udp     0.119804
+unknown         49152/udp   0.116002
+snmptrap        162/udp     0.103510
+tftp            69/udp      0.102835
+mdns            5353/udp    0.100479
+unknown         49154/udp   0.092382
+sunrpc          111/udp     0.085785
+radius          1812/udp    0.074993
+radius-acct     1813/udp    0.071231
+l2tp            1701/udp    0.067321
+sip             5060/udp    0.062210
+openvpn         1194/udp    0.058899
+kerberos-sec    88/udp      0.052014
+nfs             2049/udp    0.049851
+ldap            389/udp     0.044120
+llmnr           5355/udp    0.040018
+rpcbind         32768/udp   0.037202
+echo            7/udp       0.034821
+ws-discovery    3702/udp    0.031510
+memcache        11211/udp   0.028911
+pptp            1723/udp    0.025016
+wireguard       51820/udp   0.021004
+quic            443/udp     0.019922
+chargen         19/udp      0.017310
+daytime         13/udp      0.015612
+time            37/udp      0.014004
+"""
+
+
+def _parse_table(table: str) -> Dict[str, Dict[int, float]]:
+    """Converte a tabela textual em {protocolo: {porta: frequência}}"""
+    frequencies: Dict[str, Dict[int, float]] = {'tcp': {}, 'udp': {}}
+
+    for line in table.strip().splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        _, port_proto, frequency = line.split()
+        port, proto = port_proto.split('/')
+        port = int(port)
+        # Entradas repetidas mantêm a maior frequência
+        current = frequencies[proto].get(port, 0.0)
+        frequencies[proto][port] = max(current, float(frequency))
+
+    return frequencies
+
+
+def _build_rankings(frequencies: Dict[str, Dict[int, float]]) -> Dict[str, List[int]]:
+    """Ordena as portas conhecidas de cada protocolo por frequência decrescente"""
+    return {
+        proto: sorted(table, key=lambda port: (-table[port], port))
+        for proto, table in frequencies.items()
+    }
+
+
+PORT_FREQUENCIES = _parse_table(SERVICES_TABLE)
+_RANKINGS = _build_rankings(PORT_FREQUENCIES)
+_RANK_INDEX = {
+    proto: {port: position for position, port in enumerate(ranked)}
+    for proto, ranked in _RANKINGS.items()
+}
+_TOP_CACHE: Dict[tuple, List[int]] = {}
+
+
+def top_n(proto: str, n: int) -> List[int]:
+    """
+    Retorna as n portas mais prováveis de estarem abertas para o protocolo.
+    Portas fora da tabela completam a lista em ordem crescente.
+    """
+    proto = proto.lower()
+    n = max(0, min(n, 65535))
+    key = (proto, n)
+    if key not in _TOP_CACHE:
+        ranked = _RANKINGS[proto][:n]
+        if len(ranked) < n:
+            known = _RANK_INDEX[proto]
+            fill = (port for port in range(1, 65536) if port not in known)
+            ranked.extend(next(fill) for _ in range(n - len(ranked)))
+        _TOP_CACHE[key] = ranked
+    return list(_TOP_CACHE[key])
+
+
+def frequency(proto: str, port: int) -> float:
+    """Retorna a frequência de abertura conhecida da porta (0.0 se ausente)"""
+    return PORT_FREQUENCIES[proto.lower()].get(port, 0.0)
+
+
+def rank(proto: str, port: int) -> int:
+    """Posição da porta no ranking do protocolo (0 = mais provável)"""
+    known = _RANK_INDEX[proto.lower()]
+    if port in known:
+        return known[port]
+    # Portas desconhecidas vêm depois de todas as conhecidas, em ordem crescente
+    return len(known) + port
+
+
+def order_by_frequency(ports: Iterable[int], protocols: Iterable[str] = ('tcp',)) -> List[int]:
+    """
+    Ordena portas da mais provável para a menos provável, sem repetições.
+    Com vários protocolos, vale a melhor posição entre eles.
+    """
+    protocols = [p.lower() for p in protocols] or ['tcp']
+    return sorted(set(ports), key=lambda port: (min(rank(p, port) for p in protocols), port))
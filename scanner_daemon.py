@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Daemon de varredura com pools aquecidos e socket de controle
+
+Um processo de longa duração mantém os pools de threads por protocolo, o
+cache de DNS e os limitadores de taxa entre varreduras, e recebe jobs por
+um socket Unix. O CLI (port_scanner.py --daemon) e o backend Django
+(SCANNER_DAEMON_SOCKET) submetem jobs e recebem os resultados em
+streaming, à medida que as sondas terminam.
+
+Protocolo: quadros com cabeçalho de 5 bytes (tipo + tamanho, big-endian)
+
+  J  cliente -> daemon  job em JSON (target ou hosts, portas, opções)
+  S  cliente -> daemon  pedido de status; resposta S com JSON
+  C  cliente -> daemon  cancela o job em andamento na conexão
+  R  daemon -> cliente  lote de resultados empacotados (RESULT)
+  P  daemon -> cliente  progresso: concluídas, total (PROGRESS)
+  D  daemon -> cliente  fim do job: JSON com stop_reason e duração
+  E  daemon -> cliente  erro em texto
+
+Exemplos:
+  python scanner_daemon.py --socket /tmp/portscanner.sock --threads 500 --udp-rate 500
+  python scanner_daemon.py --status
+  python port_scanner.py -t 10.0.0.0/24 --top100 --daemon
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from exclusions import ExclusionList
+from port_scanner import CancellationToken, PortScanner, RateLimiter, ResultStore, ScanAggregator, ScanResult, expand_cidr
+from scanfile import NO_RESPONSE_TIME, PROTOCOLS, PROTOCOL_CODES, STATUSES, STATUS_CODES
+
+DEFAULT_SOCKET = os.environ.get('PORTSCANNER_SOCKET', '/tmp/portscanner.sock')
+
+FRAME = struct.Struct('>cI')
+# tamanho do host, seguido do host e de porta, protocolo, status e tempo (µs)
+RESULT = struct.Struct('>HBBI')
+PROGRESS = struct.Struct('>II')
+
+# Lotes de resultados são enviados ao atingir este tamanho ou este intervalo
+FLUSH_BYTES = 64 * 1024
+FLUSH_INTERVAL = 0.1
+
+# Validade das entradas do cache de DNS (falhas expiram antes)
+DNS_TTL = 300
+DNS_NEGATIVE_TTL = 30
+
+# Opções do job repassadas ao PortScanner
+SCANNER_OPTIONS = ('timeout', 'max_threads', 'per_host_limit', 'randomize', 'seed',
+                   'max_open_per_host', 'max_open', 'time_budget', 'retries',
+                   'retry_backoff', 'protocol_settings')
+
+
+class DaemonError(Exception):
+    """Erro reportado pelo daemon ou falha de comunicação"""
+
+
+def send_frame(sock: socket.socket, kind: bytes, payload: bytes = b'') -> None:
+    sock.sendall(FRAME.pack(kind, len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def recv_frame(sock: socket.socket):
+    """Próximo quadro (tipo, payload) ou (None, b'') se a conexão fechou"""
+    header = _recv_exact(sock, FRAME.size)
+    if header is None:
+        return None, b''
+    kind, size = FRAME.unpack(header)
+    payload = _recv_exact(sock, size) if size else b''
+    if payload is None:
+        return None, b''
+    return kind, payload
+
+
+def pack_result(result) -> bytes:
+    host = result.host.encode('utf-8')
+    if result.response_time is None:
+        response_time = NO_RESPONSE_TIME
+    else:
+        response_time = min(int(result.response_time * 1000), NO_RESPONSE_TIME - 1)
+    return (struct.pack('>H', len(host)) + host +
+            RESULT.pack(result.port, PROTOCOL_CODES[result.protocol], STATUS_CODES[result.status],
+                        response_time))
+
+
+def unpack_results(payload: bytes) -> List[ScanResult]:
+    results = []
+    offset = 0
+    while offset < len(payload):
+        size, = struct.unpack_from('>H', payload, offset)
+        offset += 2
+        host = payload[offset:offset + size].decode('utf-8')
+        offset += size
+        port, protocol, status, response_time = RESULT.unpack_from(payload, offset)
+        offset += RESULT.size
+        results.append(ScanResult(host, port, PROTOCOLS[protocol], STATUSES[status],
+                                  None if response_time == NO_RESPONSE_TIME else response_time / 1000))
+    return results
+
+
+class DNSCache:
+    """Resolução de hostnames com cache (inclusive de falhas) compartilhado entre jobs"""
+
+    def __init__(self, ttl: float = DNS_TTL, negative_ttl: float = DNS_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries: Dict[str, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, host: str) -> str:
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry and entry[1] > now:
+                self.hits += 1
+                if isinstance(entry[0], OSError):
+                    raise entry[0]
+                return entry[0]
+            self.misses += 1
+        try:
+            address = socket.getaddrinfo(host, None, socket.AF_INET)[0][4][0]
+        except OSError as e:
+            with self.lock:
+                self.entries[host] = (e, now + self.negative_ttl)
+            raise
+        with self.lock:
+            self.entries[host] = (address, now + self.ttl)
+        return address
+
+    def stats(self) -> Dict:
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class _JobStream:
+    """Envia resultados e progresso de um job em lotes"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.buffer = bytearray()
+        self.last_flush = time.monotonic()
+        self.progress = None
+
+    def result(self, result) -> None:
+        self.buffer += pack_result(result)
+        if len(self.buffer) >= FLUSH_BYTES:
+            self.flush()
+
+    def update(self, completed: int, total: int) -> None:
+        self.progress = (completed, total)
+        if time.monotonic() - self.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            send_frame(self.sock, b'R', bytes(self.buffer))
+            self.buffer = bytearray()
+        if self.progress:
+            send_frame(self.sock, b'P', PROGRESS.pack(*self.progress))
+            self.progress = None
+        self.last_flush = time.monotonic()
+
+
+class _DaemonScanner(PortScanner):
+    """Varredura de um job: o progresso vai para o cliente, não para o log do daemon"""
+
+    def _print_progress(self, completed, total, lanes) -> None:
+        pass
+
+
+class ScannerDaemon:
+    """Recursos compartilhados pelos jobs e servidor do socket de controle"""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, threads: int = 500,
+                 rates: Optional[Dict[str, float]] = None, dns_ttl: float = DNS_TTL):
+        self.socket_path = socket_path
+        self.threads = threads
+        self.executors = {protocol: ThreadPoolExecutor(max_workers=threads,
+                                                       thread_name_prefix=f"daemon-{protocol.lower()}")
+                          for protocol in PROTOCOLS}
+        self.rate_limiters = {protocol.upper(): RateLimiter(rate)
+                              for protocol, rate in (rates or {}).items() if rate}
+        self.dns = DNSCache(ttl=dns_ttl)
+        self.started = time.time()
+        self.jobs_active = 0
+        self.jobs_served = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    def status(self) -> Dict:
+        return {
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.started, 1),
+            'threads': self.threads,
+            'jobs_active': self.jobs_active,
+            'jobs_served': self.jobs_served,
+            'rate_limits': {protocol: limiter.rate for protocol, limiter in self.rate_limiters.items()},
+            'dns_cache': self.dns.stats(),
+        }
+
+    def run_job(self, sock: socket.socket, spec: Dict) -> None:
+        """Executa um job e transmite os resultados pela conexão"""
+        options = {name: spec[name] for name in SCANNER_OPTIONS if spec.get(name) is not None}
+        # Os pools do daemon limitam o total; o job limita suas sondas simultâneas
+        if options.get('max_threads') != 'auto':
+            options['max_threads'] = min(int(options.get('max_threads', 100)), self.threads)
+        exclude = ExclusionList(spec.get('exclude') or ())
+        # Hostnames também são conferidos pelo endereço resolvido (cache de DNS do daemon)
+        scanner = _DaemonScanner(executors=self.executors, rate_limiters=self.rate_limiters,
+                              resolver=self.dns.resolve, exclude=exclude or None, **options)
+        hosts = spec.get('hosts')
+        if hosts:
+            hosts = [host for host in hosts if host not in exclude]
+        else:
+            hosts = expand_cidr(spec['target'], exclude)
+        skip = {(host, port, protocol) for host, port, protocol in spec.get('skip') or ()}
+        stream = _JobStream(sock)
+
+        # Cancelamento pelo cliente (quadro C ou conexão encerrada)
+        def watch():
+            kind, _ = recv_frame(sock)
+            if kind in (b'C', None):
+                scanner.cancel()
+        threading.Thread(target=watch, name='daemon-cancel', daemon=True).start()
+
+        with self.lock:
+            self.jobs_active += 1
+        start = time.perf_counter()
+        try:
+            results = scanner.scan_range(hosts, spec['ports'], spec.get('protocols') or ['TCP'],
+                                         progress_callback=stream.update, result_callback=stream.result,
+                                         skip=skip)
+            stream.flush()
+        finally:
+            # Contadores atualizados antes do quadro D: o status já reflete o job
+            with self.lock:
+                self.jobs_active -= 1
+                self.jobs_served += 1
+        send_frame(sock, b'D', json.dumps({
+            'stop_reason': scanner.stop_reason,
+            'elapsed_s': round(time.perf_counter() - start, 3),
+            'hosts': len(hosts),
+            'total': len(results),
+        }).encode('utf-8'))
+        results.close()
+
+    def serve_forever(self) -> None:
+        if not hasattr(socket, 'AF_UNIX'):
+            raise DaemonError("o daemon requer sockets Unix (indisponíveis nesta plataforma)")
+        if os.path.exists(self.socket_path):
+            # Remove socket órfão de uma execução anterior
+            try:
+                DaemonClient(self.socket_path).status()
+                raise DaemonError(f"já existe um daemon em {self.socket_path}")
+            except OSError:
+                os.remove(self.socket_path)
+
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                kind, payload = recv_frame(self.request)
+                try:
+                    if kind == b'S':
+                        send_frame(self.request, b'S', json.dumps(daemon.status()).encode('utf-8'))
+                    elif kind == b'J':
+                        daemon.run_job(self.request, json.loads(payload))
+                    elif kind is not None:
+                        send_frame(self.request, b'E', f"quadro desconhecido: {kind!r}".encode('utf-8'))
+                except (KeyError, ValueError, TypeError) as e:
+                    send_frame(self.request, b'E', f"job inválido: {e}".encode('utf-8'))
+                except OSError:
+                    pass  # cliente desconectou
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self.server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        print(f"[+] Daemon escutando em {self.socket_path} (pid {os.getpid()}, {self.threads} threads por protocolo)")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.server:
+            self.server.server_close()
+            self.server = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class DaemonClient:
+    """Cliente do socket de controle"""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, timeout: Optional[float] = None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def status(self) -> Dict:
+        with self._connect() as sock:
+            send_frame(sock, b'S')
+            kind, payload = recv_frame(sock)
+        if kind != b'S':
+            raise DaemonError("resposta inválida do daemon")
+        return json.loads(payload)
+
+    def submit(self, spec: Dict, result_callback: Optional[Callable] = None,
+               progress_callback: Optional[Callable] = None,
+               cancel_token: Optional[CancellationToken] = None) -> Dict:
+        """
+        Envia um job e consome o stream até o fim. Cancelar o token envia
+        um quadro C; o daemon aborta as sondas e encerra o job com os
+        resultados parciais.
+        """
+        with self._connect() as sock:
+            send_frame(sock, b'J', json.dumps(spec).encode('utf-8'))
+            finished = threading.Event()
+
+            def watch():
+                while not finished.is_set():
+                    if cancel_token.wait(FLUSH_INTERVAL):
+                        try:
+                            send_frame(sock, b'C')
+                        except OSError:
+                            pass
+                        return
+            if cancel_token is not None:
+                threading.Thread(target=watch, name='daemon-client-cancel', daemon=True).start()
+
+            try:
+                while True:
+                    kind, payload = recv_frame(sock)
+                    if kind is None:
+                        raise DaemonError("conexão com o daemon encerrada durante o job")
+                    if kind == b'R':
+                        if result_callback:
+                            for result in unpack_results(payload):
+                                result_callback(result)
+                    elif kind == b'P':
+                        if progress_callback:
+                            progress_callback(*PROGRESS.unpack(payload))
+                    elif kind == b'D':
+                        return json.loads(payload)
+                    elif kind == b'E':
+                        raise DaemonError(payload.decode('utf-8'))
+            finally:
+                finished.set()
+
+
+class RemoteScanner(PortScanner):
+    """
+    PortScanner que executa as sondas no daemon
+
+    Mesma interface (scan_range, results, aggregator, display_results,
+    stop_reason); os resultados recebidos são armazenados localmente.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, **options):
+        super().__init__(**options)
+        self.client = DaemonClient(socket_path)
+        self.options = {name: options[name] for name in SCANNER_OPTIONS if options.get(name) is not None}
+
+    def scan_range(self, hosts: List[str], ports: List[int], protocols: List[str] = None,
+                   progress_callback=None, result_callback=None, skip=None):
+        spec = {'hosts': list(hosts)}
+        if skip:
+            spec['skip'] = [list(probe) for probe in skip]
+        return self._submit(spec, ports, protocols, progress_callback, result_callback)
+
+    def scan_target(self, target: str, ports: List[int], protocols: List[str] = None,
+                    progress_callback=None, result_callback=None, exclude: Optional[ExclusionList] = None):
+        """Como scan_range, mas a expansão do target (e a exclusão de faixas) acontece no daemon"""
+        spec = {'target': target}
+        if exclude:
+            spec['exclude'] = exclude.entries()
+        return self._submit(spec, ports, protocols, progress_callback, result_callback)
+
+    def _submit(self, spec, ports, protocols, progress_callback, result_callback):
+        if self.exclude and 'exclude' not in spec:
+            spec['exclude'] = self.exclude.entries()
+        self.results = ResultStore(self.memory_limit_mb, result_type=ScanResult)
+        self.aggregator = ScanAggregator()
+        self.stop_reason = self.cancel_token.reason
+
+        def receive(result):
+            self._store(result)
+            if result_callback:
+                result_callback(result)
+        
+        last_print = [0.0]
+        
+        def progress(completed, total):
+            if progress_callback:
+                progress_callback(completed, total)
+            # Quadros P chegam até 10x por segundo; exibe no máximo um por segundo
+            now = time.monotonic()
+            if now - last_print[0] >= 1 or completed == total:
+                last_print[0] = now
+                print(f"[+] Progresso: {completed}/{total} ({(completed/total)*100:.1f}%)")
+
+        print(f"[+] Enviando job ao daemon ({self.client.socket_path})")
+        spec = dict(spec, ports=list(ports), protocols=protocols or ['TCP'], max_threads=self.max_threads,
+                    **{name: value for name, value in self.options.items() if name != 'max_threads'})
+        if self.auto_threads:
+            spec['max_threads'] = 'auto'
+        try:
+            done = self.client.submit(spec, receive, progress, self.cancel_token)
+        except KeyboardInterrupt:
+            # Fechar a conexão cancela o job no daemon; ficam os resultados já recebidos
+            self.cancel('interrupted')
+            print(f"[!] Varredura interrompida: {len(self.results)} resultado(s) parcial(is)")
+            return self.results
+        self.stop_reason = done.get('stop_reason')
+        print(f"[+] Daemon concluiu o job em {done['elapsed_s']:.2f}s ({done['total']} resultados)")
+        return self.results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daemon do Port Scanner (socket Unix)")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                        help=f'Caminho do socket (padrão: {DEFAULT_SOCKET} ou $PORTSCANNER_SOCKET)')
+    parser.add_argument('--threads', type=int, default=500, help='Threads por protocolo (padrão: 500)')
+    parser.add_argument('--tcp-rate', type=float, metavar='SONDAS/S',
+                        help='Limite global de sondas TCP por segundo, somando todos os jobs')
+    parser.add_argument('--udp-rate', type=float, metavar='SONDAS/S',
+                        help='Limite global de sondas UDP por segundo, somando todos os jobs')
+    parser.add_argument('--dns-ttl', type=float, default=DNS_TTL, help='Validade do cache de DNS em segundos')
+    parser.add_argument('--status', action='store_true', help='Consulta o status de um daemon em execução')
+    args = parser.parse_args(argv)
+
+    if args.status:
+        try:
+            status = DaemonClient(args.socket, timeout=5).status()
+        except OSError as e:
+            print(f"[-] Daemon indisponível em {args.socket}: {e}")
+            return 1
+        for name, value in status.items():
+            print(f"{name}: {value}")
+        return 0
+
+    # SIGTERM (systemd, kill) encerra como Ctrl+C, removendo o socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    daemon = ScannerDaemon(args.socket, threads=args.threads,
+                           rates={'TCP': args.tcp_rate, 'UDP': args.udp_rate}, dns_ttl=args.dns_ttl)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[!] Daemon encerrado")
+    except DaemonError as e:
+        print(f"[-] {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
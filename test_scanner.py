@@ -8,8 +8,34 @@ import socket
 import threading
 import time
 import tempfile
+import json
 import os
-from port_scanner import PortScanner, ScanResult, expand_cidr, expand_port_range, get_common_ports
+import gzip
+import queue
+import io
+from contextlib import redirect_stdout
+import xml.etree.ElementTree as ET
+from port_scanner import (PortScanner, ScanAggregator, ProbeScheduler, CongestionController, RateLimiter,
+                          LatencyHistogram, latency_histograms, ScanResult, expand_cidr, expand_port_range,
+                          get_common_ports)
+from port_db import top_n, order_by_frequency
+from metrics import MetricsRegistry
+from tracing import Tracer
+from memprofile import MemoryProfiler
+from exclusions import ExclusionList
+import config
+import planner
+import writers
+import scanfile
+import resultstore
+import scanner_daemon
+try:
+    import gui_scanner
+except ImportError:  # tkinter ausente
+    gui_scanner = None
+from benchmarks import regression
+from benchmarks import run as benchmark_run
+from benchmarks.simnet import NetworkSpec, SimulatedNetwork
 
 
 class TestPortScanner(unittest.TestCase):
@@ -61,6 +87,23 @@ class TestPortScanner(unittest.TestCase):
         self.assertIn(443, ports['tcp_common']) # HTTPS
         self.assertIn(53, ports['udp_common'])  # DNS
     
+    def test_top_ports_frequency_order(self):
+        """Top portas seguem a tabela de frequência, não range(1, N)"""
+        top1000 = top_n('tcp', 1000)
+        
+        self.assertEqual(len(top1000), 1000)
+        self.assertEqual(len(set(top1000)), 1000)
+        self.assertEqual(top1000[0], 80)
+        for port in (3306, 5432, 8080):
+            self.assertIn(port, top1000)
+        self.assertEqual(top_n('udp', 2), [631, 161])
+        self.assertEqual(len(set(top_n('udp', 100))), 100)
+        # Portas fora da tabela completam a lista em ordem crescente
+        tail = [port for port in top1000 if port not in top_n('tcp', 100)][-10:]
+        self.assertEqual(tail, sorted(tail))
+        self.assertEqual(len(config.SCAN_PROFILES['comprehensive']['ports']), 1000)
+        self.assertEqual(order_by_frequency([1, 8080, 22, 80]), [80, 22, 8080, 1])
+    
     def test_scan_result_creation(self):
         """Testa criação de objetos ScanResult"""
         result = ScanResult("127.0.0.1", 80, "TCP", "open")
@@ -70,6 +113,67 @@ class TestPortScanner(unittest.TestCase):
         self.assertEqual(result.protocol, "TCP")
         self.assertEqual(result.status, "open")
     
+    def test_latency_histograms(self):
+        """Histogramas agregam latência geral, por status, host e porta"""
+        histogram = LatencyHistogram()
+        for value in (0.5, 3, 3, 40, 900):
+            histogram.add(value)
+        stats = histogram.stats()
+        self.assertEqual(stats['count'], 5)
+        self.assertEqual(stats['max_ms'], 900)
+        self.assertTrue(2 <= stats['p50_ms'] <= 5)
+        
+        results = [
+            ScanResult("10.0.0.1", 80, "TCP", "open", 2.0),
+            ScanResult("10.0.0.1", 81, "TCP", "filtered", 1000.0),
+            ScanResult("10.0.0.2", 80, "TCP", "closed", None),
+        ]
+        summary = latency_histograms(results)
+        self.assertEqual(summary['overall']['count'], 2)
+        self.assertEqual(set(summary['by_status']), {"open", "filtered"})
+        self.assertEqual(list(summary['by_host']), ["10.0.0.1"])
+        self.assertEqual(list(summary['by_port'])[0], "81/TCP")
+    
+    def test_display_lists_open_filtered_in_full(self):
+        """Relatório lista todas as abertas|filtradas; fechadas são truncadas, salvo com show_all"""
+        scanner = PortScanner()
+        scanner.results = resultstore.ResultStore(None, result_type=ScanResult)
+        for port in range(1, 31):
+            scanner.results.append(ScanResult("10.0.0.1", port, "UDP", "open|filtered" if port % 2 else "closed"))
+        scanner.aggregator = ScanAggregator.from_results(scanner.results)
+        
+        output = io.StringIO()
+        with redirect_stdout(output):
+            scanner.display_results()
+        self.assertEqual(output.getvalue().count("- OPEN|FILTERED"), 15)
+        self.assertEqual(output.getvalue().count("- CLOSED"), 10)
+        self.assertIn("... e mais 5 portas fechadas", output.getvalue())
+        
+        output = io.StringIO()
+        with redirect_stdout(output):
+            scanner.display_results(show_all=True)
+        self.assertEqual(output.getvalue().count("- CLOSED"), 15)
+        self.assertNotIn("... e mais", output.getvalue())
+    
+    def test_scan_aggregator(self):
+        """Resumo em passada única: contagens, abertas por host e primeiras K"""
+        results = [ScanResult(f"10.0.0.{i % 4}", 100 - i, "TCP", "open" if i % 5 == 0 else "closed", 0.3)
+                   for i in range(40)]
+        aggregator = ScanAggregator(top_k=3)
+        for result in results:
+            aggregator.add(result)
+        
+        self.assertEqual(aggregator.counts, {'open': 8, 'closed': 32})
+        self.assertEqual(aggregator.hosts_with_open, 4)
+        self.assertEqual(sorted(port for port, _ in aggregator.open_ports["10.0.0.0"]), [80, 100])
+        expected = sorted((r for r in results if r.status == 'closed'), key=lambda r: (r.host, r.port))[:3]
+        self.assertEqual(aggregator.first('closed'), expected)
+        summary = aggregator.to_dict()
+        self.assertEqual(summary['hosts'], 4)
+        self.assertEqual(summary['latency']['overall']['count'], 40)
+        # Buckets abaixo de 1ms: percentis de localhost não ficam acima da média
+        self.assertLessEqual(summary['latency']['overall']['p50_ms'], 0.5)
+    
     def test_tcp_scan_closed_port(self):
         """Testa scan TCP em porta fechada"""
         # Usa uma porta que provavelmente está fechada
@@ -80,6 +184,17 @@ class TestPortScanner(unittest.TestCase):
         self.assertEqual(result.protocol, 'TCP')
         self.assertEqual(result.host, self.test_host)
         self.assertEqual(result.port, 65432)
+        self.assertIsNotNone(result.response_time)
+    
+    def test_retry_backoff_policy(self):
+        """Timeout cresce exponencialmente e só timeouts são retransmitidos"""
+        scanner = PortScanner(timeout=0.5, retries=2, retry_backoff=2.0)
+        
+        self.assertEqual(scanner.probe_timeout(0), 0.5)
+        self.assertEqual(scanner.probe_timeout(2), 2.0)
+        self.assertTrue(scanner.should_retry(ScanResult("h", 1, "TCP", "filtered"), 1))
+        self.assertFalse(scanner.should_retry(ScanResult("h", 1, "TCP", "filtered"), 2))
+        self.assertFalse(scanner.should_retry(ScanResult("h", 1, "TCP", "closed"), 0))
     
     def test_save_results(self):
         """Testa salvamento de resultados"""
@@ -109,6 +224,444 @@ class TestPortScanner(unittest.TestCase):
             if os.path.exists(tmp_name):
                 os.unlink(tmp_name)
 
+    
+    def test_streaming_writers(self):
+        """Testa os writers em streaming: formato pela extensão e gzip"""
+        results = [ScanResult("127.0.0.1", 80, "TCP", "open", 1.5),
+                   ScanResult("10.0.0.1", 53, "UDP", "open|filtered")]
+        self.assertEqual(writers.detect_format("scan.ndjson.gz"), ('ndjson', 'gzip'))
+        self.assertEqual(writers.detect_format("scan.out"), ('csv', None))
+        
+        with tempfile.TemporaryDirectory() as directory:
+            parsed = {}
+            for name in ("scan.json", "scan.ndjson.gz", "scan.xml"):
+                path = os.path.join(directory, name)
+                with writers.open_writer(path, metadata={'target': '127.0.0.1'}, level=1) as writer:
+                    for result in results:
+                        writer.write(result)
+                parsed[name] = path
+            
+            with open(parsed["scan.json"], encoding='utf-8') as f:
+                document = json.load(f)
+            self.assertEqual(document['scan'], {'target': '127.0.0.1'})
+            self.assertEqual(document['total'], 2)
+            self.assertEqual(document['results'][0]['response_time_ms'], 1.5)
+            
+            with gzip.open(parsed["scan.ndjson.gz"], 'rt', encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f]
+            self.assertEqual([row['status'] for row in rows], ['open', 'open|filtered'])
+            
+            root = ET.parse(parsed["scan.xml"]).getroot()
+            self.assertEqual(root.get('target'), '127.0.0.1')
+            self.assertEqual([port.get('number') for port in root.iter('port')], ['80', '53'])
+    
+    def test_binary_scan_file(self):
+        """Testa o formato .pscan: índice por host, filtro por status e conversão CSV"""
+        results = [ScanResult("10.0.0.2", 22, "TCP", "open", 0.25),
+                   ScanResult("example.com", 80, "TCP", "filtered"),
+                   ScanResult("10.0.0.1", 53, "UDP", "open|filtered"),
+                   ScanResult("::1", 443, "TCP", "closed", 1.0),
+                   ScanResult("10.0.0.2", 23, "TCP", "closed", 0.5)]
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "scan.pscan")
+            with writers.open_writer(path, metadata={'target': '10.0.0.0/30'}) as writer:
+                writer.write_many(results)
+            
+            with scanfile.ScanFile(path) as scan:
+                self.assertEqual(len(scan), 5)
+                self.assertEqual(scan.metadata['target'], '10.0.0.0/30')
+                self.assertEqual(scan.counts['closed'], 2)
+                self.assertEqual(sorted(scan.hosts()), sorted({r.host for r in results}))
+                self.assertEqual([(r.port, r.status, r.response_time) for r in scan.host("10.0.0.2")],
+                                 [(22, 'open', 0.25), (23, 'closed', 0.5)])
+                self.assertEqual(scan.host("example.com")[0].response_time, None)
+                self.assertEqual(scan.host("10.9.9.9"), [])
+                self.assertCountEqual([r.host for r in scan.filter('closed')], ['10.0.0.2', '::1'])
+            
+            csv_path = os.path.join(directory, "scan.csv")
+            copy_path = os.path.join(directory, "copy.pscan")
+            scanfile.main(['to-csv', path, csv_path])
+            scanfile.main(['from-csv', csv_path, copy_path])
+            with scanfile.ScanFile(path) as scan, scanfile.ScanFile(copy_path) as copy:
+                self.assertEqual(list(scan), list(copy))
+    
+    def test_result_store_spills_to_disk(self):
+        """Testa o despejo em disco e o merge externo dos segmentos"""
+        limit_mb = 5 * resultstore.RESULT_BYTES / 2**20
+        store = resultstore.ResultStore(limit_mb, result_type=ScanResult)
+        results = [ScanResult(f"10.0.0.{i % 7}", 1000 - i, "TCP", ("open", "closed", "filtered")[i % 3],
+                              i / 10 if i % 2 else None) for i in range(23)]
+        store.extend(results)
+        
+        self.assertEqual(len(store.segments), 4)
+        self.assertEqual(len(store.buffer), 3)
+        self.assertEqual(len(store), 23)
+        self.assertEqual(store.counts, {'open': 8, 'closed': 8, 'filtered': 7})
+        self.assertCountEqual(list(store), results)
+        
+        key = resultstore.result_key
+        self.assertEqual(list(store.sorted()), sorted(results, key=key))
+        self.assertEqual(list(store.sorted('open')), sorted((r for r in results if r.status == 'open'), key=key))
+        self.assertEqual(store.first('closed', 3),
+                         sorted((r for r in results if r.status == 'closed'), key=key)[:3])
+        
+        directory = store._tempdir
+        self.assertTrue(os.path.isdir(directory))
+        store.close()
+        self.assertFalse(os.path.exists(directory))
+        self.assertEqual(len(store), 0)
+
+
+@unittest.skipIf(gui_scanner is None, 'tkinter indisponível')
+class TestGUIModels(unittest.TestCase):
+    """Tabela virtualizada e progresso da GUI (sem abrir janela)"""
+    
+    def test_filter_selects_rows_without_copying(self):
+        view = gui_scanner.ResultView()
+        for port in range(100):
+            view.append(ScanResult("10.0.0.1", port, "TCP", "open" if port % 10 == 0 else "closed"))
+        
+        self.assertEqual(len(view), 100)
+        self.assertEqual([r.port for r in view.rows(98, 15)], [98, 99])
+        view.set_filter("open")
+        self.assertEqual(len(view), 10)
+        self.assertEqual([r.port for r in view.rows(2, 3)], [20, 30, 40])
+        view.set_filter("filtered")
+        self.assertEqual(view.rows(0, 15), [])
+
+    def test_view_capacity_keeps_open_ports(self):
+        """Tabela cheia deixa de exibir fechadas, mas a reserva guarda as abertas"""
+        view = gui_scanner.ResultView(capacity=10, open_reserve=0.2)
+        for port in range(20):
+            view.append(ScanResult("10.0.0.1", port, "TCP", "closed"))
+        for port in (80, 443, 8080):
+            view.append(ScanResult("10.0.0.1", port, "TCP", "open"))
+
+        self.assertEqual(len(view), 10)
+        self.assertEqual(view.omitted, 13)
+        view.set_filter("open")
+        self.assertEqual([r.port for r in view.rows(0, 5)], [80, 443])
+    
+    def test_progress_rate_and_eta(self):
+        now = [0.0]
+        tracker = gui_scanner.ProgressTracker(window=5, clock=lambda: now[0])
+        self.assertIsNone(tracker.eta)
+        for second in range(10):
+            now[0] = float(second)
+            tracker.update(second * 100, 2000)
+        
+        self.assertAlmostEqual(tracker.rate, 100.0)
+        self.assertAlmostEqual(tracker.eta, 11.0)
+        self.assertIn("restante 00:11", tracker.describe())
+
+    def test_stop_before_scanner_exists(self):
+        """Parar antes de o worker criar o scanner ainda cancela a varredura"""
+        gui = type('StubGUI', (), {})()
+        gui.result_queue = gui_scanner.queue.Queue()
+        gui.cancel_token = gui_scanner.CancellationToken()
+        gui.cancel_token.cancel()
+
+        gui_scanner.PortScannerGUI.scan_worker(gui, ["127.0.0.1"], list(range(1, 200)), ["TCP"], 1, 4,
+                                               gui.cancel_token)
+        messages = []
+        while not gui.result_queue.empty():
+            messages.append(gui.result_queue.get_nowait())
+        self.assertEqual(messages[-1][0], "stopped")
+        self.assertIsNone(gui.scanner)
+
+
+class TestProbeScheduler(unittest.TestCase):
+    """Testes do escalonador de sondas"""
+    
+    def _drain(self, scheduler):
+        probes = []
+        while True:
+            probe = scheduler.next_probe()
+            if probe is None:
+                break
+            scheduler.release(probe[0])
+            probes.append(probe)
+        return probes
+    
+    def test_interleaves_hosts(self):
+        """Sondas consecutivas devem alternar entre hosts"""
+        scheduler = ProbeScheduler(["10.0.0.1", "10.0.0.2", "10.0.0.3"], [22, 80], ["TCP"])
+        probes = self._drain(scheduler)
+        
+        self.assertEqual([p[0] for p in probes[:3]], ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        self.assertEqual([p[1] for p in probes], [22, 22, 22, 80, 80, 80])
+    
+    def test_randomized_is_permutation(self):
+        """Ordem embaralhada cobre todo o espaço, sem repetição, e é reproduzível"""
+        hosts = [f"10.0.0.{i}" for i in range(1, 8)]
+        ports = list(range(1, 12))
+        probes = self._drain(ProbeScheduler(hosts, ports, ["TCP", "UDP"], randomize=True, seed=42))
+        again = self._drain(ProbeScheduler(hosts, ports, ["TCP", "UDP"], randomize=True, seed=42))
+        
+        self.assertEqual(len(probes), len(hosts) * len(ports) * 2)
+        self.assertEqual(len(set(probes)), len(probes))
+        self.assertEqual(probes, again)
+    
+    def test_per_host_limit(self):
+        """Host saturado tem sondas adiadas até liberação"""
+        scheduler = ProbeScheduler(["10.0.0.1"], [1, 2, 3], ["TCP"], per_host_limit=2)
+        
+        first = scheduler.next_probe()
+        second = scheduler.next_probe()
+        self.assertIsNotNone(second)
+        self.assertIsNone(scheduler.next_probe())
+        self.assertTrue(scheduler.has_pending())
+        
+        scheduler.release(first[0])
+        self.assertEqual(scheduler.next_probe(), ("10.0.0.1", 3, "TCP", 0))
+    
+    def test_retries_after_first_pass(self):
+        """Retransmissões só saem depois da primeira passada"""
+        scheduler = ProbeScheduler(["10.0.0.1"], [1, 2], ["TCP"])
+        
+        first = scheduler.next_probe()
+        scheduler.release(first[0])
+        scheduler.retry(first)
+        
+        self.assertEqual(scheduler.next_probe(), ("10.0.0.1", 2, "TCP", 0))
+        self.assertEqual(scheduler.next_probe(), ("10.0.0.1", 1, "TCP", 1))
+        self.assertIsNone(scheduler.next_probe())
+
+    def test_skip_completed_probes(self):
+        """Sondas já concluídas (job retomado) ficam fora da ordem e do total"""
+        hosts = ["10.0.0.1", "10.0.0.2"]
+        skip = {("10.0.0.1", 1, "TCP"), ("10.0.0.2", 3, "TCP"), ("10.0.0.9", 1, "TCP")}
+        scheduler = ProbeScheduler(hosts, [1, 2, 3], ["TCP"], randomize=True, seed=7, skip=skip)
+        probes = self._drain(scheduler)
+
+        self.assertEqual(scheduler.total, 4)
+        self.assertEqual(len(probes), 4)
+        self.assertFalse({p[:3] for p in probes} & skip)
+
+
+class TestCongestionController(unittest.TestCase):
+    """Testes do controle de concorrência AIMD"""
+    
+    def test_grows_while_healthy(self):
+        """Janela cresce aditivamente sem timeouts"""
+        controller = CongestionController(initial=4, maximum=100)
+        for _ in range(4):
+            controller.on_result(False)
+        self.assertEqual(controller.window, 6)
+    
+    def test_backs_off_on_timeout_spike(self):
+        """Pico de timeouts reduz a janela multiplicativamente"""
+        controller = CongestionController(initial=10, maximum=100)
+        for _ in range(10):
+            controller.on_result(False)
+        window = controller.window
+        for _ in range(window):
+            controller.on_result(True)
+        self.assertEqual(controller.window, window // 2)
+    
+    def test_backs_off_on_congestion_error(self):
+        """ENOBUFS/EAGAIN reduz a janela imediatamente, respeitando o mínimo"""
+        controller = CongestionController(initial=3, minimum=2)
+        controller.on_congestion()
+        self.assertEqual(controller.window, 2)
+        self.assertEqual(len(controller.history), 2)
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Testes do limitador de taxa (token bucket) por protocolo"""
+
+    def test_rate_limiter_budget(self):
+        """Orçamento libera o burst e depois uma ficha a cada 1/rate segundos"""
+        limiter = RateLimiter(rate=10, burst=2)
+        for _ in range(2):
+            self.assertTrue(limiter.available())
+            limiter.consume()
+        self.assertFalse(limiter.available())
+        self.assertAlmostEqual(limiter.delay(), 0.1, delta=0.02)
+
+
+class TestMetrics(unittest.TestCase):
+    """Testes da exportação de métricas no formato Prometheus"""
+    
+    def test_render_prometheus_text(self):
+        """Contadores, gauges e histogramas são renderizados com labels"""
+        registry = MetricsRegistry()
+        probes = registry.counter('test_probes_total', 'Sondas')
+        probes.inc(protocol='TCP', status='open')
+        probes.inc(2, protocol='TCP', status='open')
+        registry.gauge('test_in_flight', 'Em andamento').set(7)
+        registry.histogram('test_seconds', 'Duração', buckets=(0.1, 1)).observe(0.5)
+        
+        text = registry.render()
+        self.assertIn('# TYPE test_probes_total counter', text)
+        self.assertIn('test_probes_total{protocol="TCP",status="open"} 3', text)
+        self.assertIn('test_in_flight 7', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn('test_seconds_bucket{le="1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn('test_seconds_count 1', text)
+        self.assertIs(registry.counter('test_probes_total', 'Sondas'), probes)
+
+
+class TestTracing(unittest.TestCase):
+    """Testes do rastreamento em formato Trace Event"""
+    
+    def test_spans_written_as_trace_events(self):
+        """Spans de fase e de sondas amostradas viram eventos 'X'"""
+        tracer = Tracer(sample_rate=1.0)
+        scanner = PortScanner(timeout=1, max_threads=2, tracer=tracer)
+        scanner.scan_range(["127.0.0.1"], [65431, 65432], ["TCP"])
+        
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
+            tmp_name = tmp.name
+        try:
+            tracer.write(tmp_name)
+            with open(tmp_name, 'r') as f:
+                trace = json.load(f)
+        finally:
+            os.unlink(tmp_name)
+        
+        names = [event['name'] for event in trace['traceEvents'] if event['ph'] == 'X']
+        self.assertIn('scan_range', names)
+        self.assertEqual(names.count('connect'), 2)
+        self.assertEqual(names.count('result_append'), 2)
+
+
+class TestPlanner(unittest.TestCase):
+    """Testes da estimativa de custo"""
+
+    def test_counts_match_expansion(self):
+        """Contagem aritmética bate com a expansão real de targets e portas"""
+        for target in ["10.0.0.0/24", "10.0.0.0/31", "10.0.0.5/32", "10.0.0.1,10.1.0.0/30,host", "2001:db8::/120"]:
+            self.assertEqual(planner.count_targets(target), len(expand_cidr(target)))
+        self.assertEqual(planner.count_targets("10.0.0.0/8"), 2**24 - 2)
+        self.assertEqual(planner.count_ports("1-1000,22,900-1100"), len(expand_port_range("1-1000,22,900-1100")))
+        self.assertEqual(planner.count_ports("top100", {"top100": 100}), 100)
+
+    def test_estimate_uses_history_and_warns(self):
+        """Histórico ajusta o modelo; limites excedidos geram avisos"""
+        stats = planner.ScanStats.from_summaries([{
+            'results_by_status': {'open': 10, 'closed': 90, 'filtered': 100},
+            'latency': {'by_status': {'open': {'count': 10, 'mean_ms': 20.0},
+                                      'closed': {'count': 90, 'mean_ms': 20.0}}},
+        }])
+        self.assertAlmostEqual(stats.response_ratio, 0.5)
+        self.assertAlmostEqual(stats.rtt_ms, 20.0)
+
+        plan = planner.estimate(100, 10, ["TCP"], timeout=2, threads=10, stats=stats,
+                                limits={'max_duration': 60})
+        # 1000 sondas * (0.5 * 0.02s + 0.5 * 2s) / 10 threads
+        self.assertAlmostEqual(plan.estimated_seconds, 101.0)
+        self.assertEqual(plan.expected_open, 50)
+        self.assertEqual(len(plan.warnings), 1)
+
+    def test_host_at_matches_expansion(self):
+        """Acesso aleatório ao espaço de targets sem expandir a lista"""
+        target = "10.0.0.0/29,10.0.1.0/31,host,2001:db8::/126"
+        expanded = expand_cidr(target)
+        self.assertEqual([planner.host_at(target, i) for i in range(len(expanded))], expanded)
+
+    def test_exclusions_subtracted_before_expansion(self):
+        """Faixas excluídas são mescladas e somem da expansão, da contagem e da amostragem"""
+        exclude = ExclusionList(["10.0.0.0/30", "10.0.0.2-10.0.0.9", "10.0.0.10", "2001:db8::2", "Router.lan"])
+        self.assertEqual(exclude.entries(), ["10.0.0.0-10.0.0.10", "2001:db8::2", "router.lan"])
+        self.assertIn("10.0.0.7", exclude)
+        self.assertNotIn("10.0.0.11", exclude)
+        self.assertIn("router.lan", exclude)
+        with self.assertRaises(ValueError):
+            ExclusionList(["10.0.0.300"])
+
+        target = "10.0.0.0/28,10.0.0.5,router.lan,host,2001:db8::/126"
+        expanded = expand_cidr(target, exclude)
+        self.assertEqual(expanded, [h for h in expand_cidr(target) if h not in exclude])
+        self.assertEqual(expanded[:4], ["10.0.0.11", "10.0.0.12", "10.0.0.13", "10.0.0.14"])
+        self.assertEqual(planner.count_targets(target, exclude), len(expanded))
+        self.assertEqual([planner.host_at(target, i, exclude) for i in range(len(expanded))], expanded)
+
+    def test_hostname_resolving_to_excluded_address_is_skipped(self):
+        """Hostname cujo endereço resolvido está excluído não recebe nenhuma sonda"""
+        exclude = ExclusionList(["127.0.0.0/24"])
+        scanner = PortScanner(timeout=0.5, max_threads=4, exclude=exclude,
+                              resolver={"router.example": "127.0.0.5", "other.example": "127.0.1.1"}.get)
+        results = scanner.scan_range(["router.example", "other.example"], [1, 2, 3], ["TCP"])
+        self.assertEqual(scanner.excluded_hosts, {"router.example"})
+        self.assertEqual(sorted((r.host, r.port) for r in results),
+                         [("other.example", 1), ("other.example", 2), ("other.example", 3)])
+
+        # Sem resolver, o hostname é resolvido pelo sistema antes da checagem
+        scanner = PortScanner(timeout=0.5, max_threads=4, exclude=ExclusionList(["127.0.0.0/8"]))
+        self.assertEqual(list(scanner.scan_range(["localhost"], [1, 2], ["TCP"])), [])
+        self.assertEqual(scanner.excluded_hosts, {"localhost"})
+
+    def test_choose_plan_from_sample(self):
+        """Rede esparsa ativa a descoberta; RTT baixo reduz o timeout"""
+        sample = planner.SampleStats(hosts_total=4096, hosts_sampled=32, probes=640, live_hosts=4,
+                                     filtered_ratio=0.8, open_ports=[443], rtt_p99_ms=20.0)
+        plan = planner.choose_plan(sample, timeout=3, threads=100, ports=[80, 22, 443, 8080])
+        self.assertTrue(plan.discovery)
+        self.assertEqual(plan.discovery_ports[0], 443)
+        self.assertAlmostEqual(plan.timeout, 0.25)
+        self.assertEqual(plan.threads, 200)
+        self.assertEqual(plan.ports, [443, 80, 22, 8080])
+
+
+class TestMemoryProfiler(unittest.TestCase):
+    """Testes do perfil de memória por fase"""
+
+    def test_phase_reports_peak_and_allocators(self):
+        """Fase registra pico, variação e os maiores alocadores"""
+        profiler = MemoryProfiler(top=5).start()
+        try:
+            with profiler.phase('alloc'):
+                data = [bytes(1024) for _ in range(1000)]
+        finally:
+            profiler.stop()
+
+        summary = profiler.summary()
+        phase = summary['phases'][0]
+        self.assertEqual(phase['name'], 'alloc')
+        self.assertGreaterEqual(phase['peak_mb'], 0.9)
+        self.assertTrue(any('test_scanner.py' in a['location'] for a in phase['top_allocators']))
+        self.assertEqual(summary['peak_mb'], phase['peak_mb'])
+        self.assertEqual(len(data), 1000)
+
+
+class TestBenchmarkRegression(unittest.TestCase):
+    """Testes do gate de regressão dos benchmarks"""
+
+    def test_detects_throughput_and_memory_regressions(self):
+        """Mediana fora da tolerância é regressão; ruído dentro do MAD não"""
+        baseline = regression.summarize([
+            {'probes_per_s': 1000, 'peak_rss_mb': 20},
+            {'probes_per_s': 1050, 'peak_rss_mb': 21},
+            {'probes_per_s': 980, 'peak_rss_mb': 20},
+        ])
+        noisy = regression.summarize([{'probes_per_s': 960, 'peak_rss_mb': 21}])
+        self.assertEqual(regression.compare('caso', baseline, noisy), [])
+
+        slower = regression.summarize([
+            {'probes_per_s': 700, 'peak_rss_mb': 40},
+            {'probes_per_s': 720, 'peak_rss_mb': 41},
+        ])
+        found = regression.compare('caso', baseline, slower)
+        self.assertEqual(sorted(item.metric for item in found), ['peak_rss_mb', 'probes_per_s'])
+
+    def test_failed_case_does_not_hang(self):
+        """Filho que falha ou morre sem medições vira CaseFailed, sem bloquear a suite"""
+        scenario = benchmark_run.Scenario('tiny', NetworkSpec(hosts=1, ports=2, base_address='127.14.0.1'))
+        with self.assertRaisesRegex(benchmark_run.CaseFailed, 'TypeError'):
+            benchmark_run.run_case(scenario, benchmark_run.Engine('broken', {'no_such_option': 1}), timeout=60)
+
+        class DeadProcess:
+            exitcode = -9
+
+        with self.assertRaisesRegex(benchmark_run.CaseFailed, 'código -9'):
+            benchmark_run._receive(queue.Queue(), DeadProcess(), timeout=60)
+        DeadProcess.exitcode = None
+        with self.assertRaisesRegex(benchmark_run.CaseFailed, 'tempo esgotado'):
+            benchmark_run._receive(queue.Queue(), DeadProcess(), timeout=0)
+
 
 class TestServerForTesting:
     """Servidor simples para testes"""
@@ -224,6 +777,57 @@ class TestIntegration(unittest.TestCase):
         self.assertIn("open", result.status)
         self.assertEqual(result.protocol, "UDP")
     
+    def test_early_termination_first_open(self):
+        """Host deixa de ser sondado após a primeira porta aberta"""
+        server = TestServerForTesting(12350, 'TCP')
+        server.start()
+        self.test_servers.append(server)
+        
+        scanner = PortScanner(timeout=1, max_threads=1, max_open_per_host=1)
+        results = scanner.scan_range(["127.0.0.1"], [12350, 12351, 12352], ["TCP"])
+        
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].status, "open")
+    
+    def test_early_termination_max_open(self):
+        """Varredura global encerra ao atingir o total de portas abertas"""
+        server = TestServerForTesting(12353, 'TCP')
+        server.start()
+        self.test_servers.append(server)
+        
+        scanner = PortScanner(timeout=1, max_threads=1, max_open=1)
+        results = scanner.scan_range(["127.0.0.1"], [12353, 12354, 12355], ["TCP"])
+        
+        self.assertEqual(scanner.stop_reason, "max_open")
+        self.assertEqual(len(results), 1)
+    
+    def test_cancel_aborts_in_flight_probes(self):
+        """Cancelamento acorda as sondas em andamento e devolve os resultados parciais"""
+        spec = NetworkSpec(hosts=1, ports=200, open_ratio=0.1, filtered_ratio=0.9,
+                           base_address='127.20.0.9', base_port=22000)
+        with SimulatedNetwork(spec) as network:
+            scanner = PortScanner(timeout=5, max_threads=20)
+            threading.Timer(0.3, scanner.cancel).start()
+            start = time.perf_counter()
+            results = scanner.scan_range(network.hosts, network.ports, ["TCP", "UDP"])
+        
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual(scanner.stop_reason, "cancelled")
+        self.assertLess(len(results), 400)
+        self.assertTrue(all(r.status == "open" for r in results if r.protocol == "TCP"))
+    
+    def test_protocol_pools_are_independent(self):
+        """Sondas UDP lentas não atrasam os resultados TCP"""
+        finished = {}
+        start = time.perf_counter()
+        scanner = PortScanner(timeout=1, max_threads=2, protocol_settings={'UDP': {'timeout': 0.3}})
+        results = scanner.scan_range(
+            ["127.0.0.1"], [12360, 12361, 12362, 12363], ["TCP", "UDP"],
+            result_callback=lambda r: finished.setdefault(r.protocol, []).append(time.perf_counter() - start))
+        
+        self.assertEqual(len(results), 8)
+        self.assertLess(max(finished["TCP"]), min(finished["UDP"]))
+
     def test_scan_range_integration(self):
         """Testa varredura de range completa"""
         # Inicia alguns servidores
@@ -249,6 +853,46 @@ class TestIntegration(unittest.TestCase):
         open_results = [r for r in results if "open" in r.status]
         self.assertTrue(len(open_results) > 0)
 
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'daemon requer sockets Unix')
+    def test_daemon_job_streams_results(self):
+        """Job submetido ao daemon retorna os mesmos resultados da varredura local"""
+        server = TestServerForTesting(12370, 'TCP')
+        server.start()
+        self.test_servers.append(server)
+        
+        path = os.path.join(tempfile.mkdtemp(), 'scanner.sock')
+        daemon = scanner_daemon.ScannerDaemon(path, threads=4)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        for _ in range(50):
+            if daemon.server:
+                break
+            time.sleep(0.05)
+        try:
+            streamed = []
+            remote = scanner_daemon.RemoteScanner(path, timeout=1, max_threads=4)
+            results = remote.scan_target("127.0.0.1", [12370, 12371], ["TCP"],
+                                         result_callback=streamed.append)
+            
+            self.assertEqual(sorted((r.port, r.status) for r in results), [(12370, "open"), (12371, "closed")])
+            self.assertEqual(len(streamed), 2)
+            self.assertEqual(remote.aggregator.counts["open"], 1)
+            status = scanner_daemon.DaemonClient(path).status()
+            self.assertEqual(status["jobs_served"], 1)
+        finally:
+            daemon.server.shutdown()
+            thread.join(5)
+        self.assertFalse(os.path.exists(path))
+
+    def test_simulated_network_accuracy(self):
+        """Varredura da rede simulada dos benchmarks bate com o estado esperado"""
+        spec = NetworkSpec(hosts=2, ports=10, open_ratio=0.3, filtered_ratio=0.1,
+                           base_address='127.20.0.1', base_port=21000)
+        with SimulatedNetwork(spec) as network:
+            scanner = PortScanner(timeout=0.3, max_threads=20)
+            results = scanner.scan_range(network.hosts, network.ports, ["TCP"])
+            self.assertEqual(network.accuracy(results), 1.0)
+
 
 def run_performance_test():
     """Executa teste de performance"""
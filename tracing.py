@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Rastreamento da linha do tempo da varredura
+Registra spans das fases (expansão de targets, conexões, gravação de
+resultados, escrita no banco) no formato Trace Event JSON, que pode ser
+aberto no chrome://tracing ou no Perfetto (ui.perfetto.dev)
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+
+class _Span:
+    """Context manager que grava um evento completo ('X') ao sair"""
+
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._add({
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': (self.start - self.tracer.origin) / 1000,
+            'dur': (end - self.start) / 1000,
+            'pid': self.tracer.pid,
+            'tid': threading.get_ident(),
+            'args': self.args,
+        })
+        return False
+
+
+class Tracer:
+    """
+    Coletor de spans em memória
+
+    Spans de fase são sempre gravados; spans por sonda são amostrados com
+    probabilidade sample_rate para manter o overhead e o arquivo pequenos.
+    """
+
+    # Limite de eventos em memória; excedentes são descartados e contados
+    MAX_EVENTS = 200000
+
+    enabled = True
+
+    def __init__(self, sample_rate: float = 0.1, seed: Optional[int] = None):
+        self.sample_rate = sample_rate
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.events: List[Dict] = []
+        self.dropped = 0
+        self._random = random.Random(seed)
+        self._thread_names: Dict[int, str] = {}
+
+    def _add(self, event: Dict) -> None:
+        # list.append é atômico no CPython; dispensa lock no caminho quente
+        if len(self.events) >= self.MAX_EVENTS:
+            self.dropped += 1
+            return
+        tid = event['tid']
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self.events.append(event)
+
+    def span(self, name: str, category: str = 'scan', **args):
+        """Span de fase, sempre registrado"""
+        return _Span(self, name, category, args)
+
+    def sample(self) -> bool:
+        """Decide se a sonda atual terá seus spans registrados"""
+        return self._random.random() < self.sample_rate
+
+    def instant(self, name: str, category: str = 'scan', **args) -> None:
+        """Evento pontual (ex.: parada antecipada)"""
+        self._add({
+            'name': name, 'cat': category, 'ph': 'i', 's': 'p',
+            'ts': (time.perf_counter_ns() - self.origin) / 1000,
+            'pid': self.pid, 'tid': threading.get_ident(), 'args': args,
+        })
+
+    def to_dict(self) -> Dict:
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in self._thread_names.items()
+        ]
+        return {
+            'traceEvents': metadata + list(self.events),
+            'displayTimeUnit': 'ms',
+            'otherData': {'sample_rate': self.sample_rate, 'dropped_events': self.dropped},
+        }
+
+    def write(self, filename: str) -> None:
+        """Grava o trace em JSON (Trace Event Format)"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+
+class NullTracer:
+    """Tracer desativado: spans são no-ops de custo mínimo"""
+
+    enabled = False
+    _context = nullcontext()
+
+    def span(self, name: str, category: str = 'scan', **args):
+        return self._context
+
+    def sample(self) -> bool:
+        return False
+
+    def instant(self, name: str, category: str = 'scan', **args) -> None:
+        pass
+
+
+NULL_TRACER = NullTracer()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Perfil de memória por fase da varredura
+Usa tracemalloc para tirar snapshots nas fronteiras das fases (expansão de
+targets, varredura, gravação de resultados, histórico) e reportar o pico de
+memória e os maiores alocadores de cada uma
+"""
+
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from typing import Dict, List
+
+# tracemalloc é global ao processo: perfis simultâneos (vários jobs no
+# Django) compartilham o rastreamento, que só é desligado pelo último
+_lock = threading.Lock()
+_users = 0
+_started_here = False
+
+
+class MemoryProfiler:
+    """
+    Perfil de memória com tracemalloc
+
+    Cada fase registra a memória rastreada na entrada e na saída, o pico
+    atingido durante a fase e as linhas de código que mais cresceram entre
+    os dois snapshots. Os valores são do processo inteiro: com varreduras
+    simultâneas, as alocações de uma aparecem no perfil da outra.
+    """
+
+    enabled = True
+
+    def __init__(self, top: int = 10, frames: int = 1):
+        self.top = top
+        self.frames = frames
+        self.phases: List[Dict] = []
+        self._running = False
+
+    def start(self) -> 'MemoryProfiler':
+        global _users, _started_here
+        with _lock:
+            if not self._running:
+                self._running = True
+                _users += 1
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(self.frames)
+                    _started_here = True
+        return self
+
+    def stop(self) -> None:
+        global _users, _started_here
+        with _lock:
+            if self._running:
+                self._running = False
+                _users -= 1
+                if _users == 0 and _started_here:
+                    tracemalloc.stop()
+                    _started_here = False
+
+    def phase(self, name: str):
+        """Context manager que mede uma fase"""
+        return _Phase(self, name)
+
+    def summary(self) -> Dict:
+        """Resumo serializável em JSON (pico global e detalhes por fase)"""
+        return {
+            'peak_mb': max((phase['peak_mb'] for phase in self.phases), default=0.0),
+            'phases': self.phases,
+        }
+
+    def report(self) -> None:
+        """Imprime o pico e os maiores alocadores de cada fase"""
+        print("\n" + "=" * 60)
+        print("PERFIL DE MEMÓRIA POR FASE")
+        print("=" * 60)
+        for phase in self.phases:
+            print(f"[{phase['name']}] pico {phase['peak_mb']:.2f} MB | "
+                  f"variação {phase['delta_mb']:+.2f} MB | {phase['duration_s']:.2f}s")
+            for allocator in phase['top_allocators']:
+                print(f"    {allocator['size_diff_kb']:+10.1f} KB  {allocator['count_diff']:+8d} blocos  "
+                      f"{allocator['location']}")
+
+
+class _Phase:
+    """Snapshots de entrada e saída de uma fase"""
+
+    __slots__ = ('profiler', 'name', 'snapshot', 'current', 'start')
+
+    def __init__(self, profiler: MemoryProfiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.start()
+        self.snapshot = tracemalloc.take_snapshot()
+        self.current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        # Ignora as próprias estruturas do tracemalloc e do profiler
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                   tracemalloc.Filter(False, __file__)]
+        stats = snapshot.filter_traces(filters).compare_to(
+            self.snapshot.filter_traces(filters), 'lineno')
+        top = [
+            {
+                'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                'size_diff_kb': round(stat.size_diff / 1024, 1),
+                'size_kb': round(stat.size / 1024, 1),
+                'count_diff': stat.count_diff,
+            }
+            for stat in stats[:self.profiler.top]
+        ]
+        self.profiler.phases.append({
+            'name': self.name,
+            'start_mb': round(self.current / 2**20, 3),
+            'end_mb': round(current / 2**20, 3),
+            'delta_mb': round((current - self.current) / 2**20, 3),
+            'peak_mb': round(peak / 2**20, 3),
+            'duration_s': round(duration, 3),
+            'top_allocators': top,
+        })
+        # Libera o snapshot de entrada antes da próxima fase
+        self.snapshot = None
+        return False
+
+
+class NullProfiler:
+    """Perfil desativado: fases são no-ops"""
+
+    enabled = False
+    _context = nullcontext()
+
+    def start(self) -> 'NullProfiler':
+        return self
+
+    def stop(self) -> None:
+        pass
+
+    def phase(self, name: str):
+        return self._context
+
+    def summary(self) -> Dict:
+        return {}
+
+    def report(self) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -5,16 +5,33 @@ Desenvolvida para detectar portas abertas, fechadas e filtradas em redes
 """
 
 import socket
+import errno
+import os
+import select
 import threading
 import time
 import argparse
 import ipaddress
-from concurrent.futures import ThreadPoolExecutor
+import math
+import bisect
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import ExitStack
 from dataclasses import dataclass
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Optional, Tuple
 import sys
 import struct
 
+from port_db import top_n, order_by_frequency
+from metrics import REGISTRY
+from tracing import Tracer, NULL_TRACER
+from memprofile import MemoryProfiler, NULL_PROFILER
+from exclusions import ExclusionList
+from planner import count_targets, estimate, print_plan, presample, choose_plan, discover_hosts, print_auto_plan
+from writers import WRITERS, open_writer
+from resultstore import ResultStore, DEFAULT_MEMORY_LIMIT_MB
+
 
 @dataclass
 class ScanResult:
@@ -23,174 +40,1107 @@ class ScanResult:
     port: int
     protocol: str
     status: str  # 'open', 'closed', 'filtered'
+    response_time: Optional[float] = None  # Duração da sonda em ms (relógio monotônico)
+
+
+class LatencyHistogram:
+    """
+    Histograma de latência com buckets fixos em escala logarítmica (ms)
+    
+    Agregação em O(1) por amostra e memória constante; percentis são
+    estimados por interpolação dentro do bucket correspondente.
+    """
+    
+    BUCKETS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+    
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+    
+    def add(self, value_ms: float) -> None:
+        """Registra uma amostra em milissegundos"""
+        index = bisect.bisect_left(self.BUCKETS_MS, value_ms)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+    
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Estima o percentil (0-1) interpolando linearmente dentro do bucket"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= target:
+                lower = max(self.BUCKETS_MS[index - 1] if index > 0 else 0.0, self.min)
+                upper = min(self.BUCKETS_MS[index] if index < len(self.BUCKETS_MS) else self.max, self.max)
+                estimate = lower + (upper - lower) * (target - seen) / bucket_count
+                return round(max(self.min, min(estimate, self.max)), 3)
+            seen += bucket_count
+        return self.max
+    
+    def stats(self) -> Dict[str, float]:
+        """Resumo compacto: contagem, média, p50, p90, p99, mínimo e máximo"""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 3),
+            'p50_ms': self.percentile(0.50),
+            'p90_ms': self.percentile(0.90),
+            'p99_ms': self.percentile(0.99),
+            'min_ms': round(self.min, 3),
+            'max_ms': round(self.max, 3),
+        }
+    
+    def to_dict(self) -> Dict:
+        """Resumo com a contagem por bucket (apenas buckets não vazios)"""
+        data = self.stats()
+        labels = [f"<={bound}" for bound in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}"]
+        data['buckets'] = {label: n for label, n in zip(labels, self.counts) if n}
+        return data
+
+
+class ProbeScheduler:
+    """
+    Escalonador de sondas intercaladas entre hosts
+    
+    Percorre o espaço host x porta x protocolo de forma que sondas
+    consecutivas atinjam hosts diferentes (round-robin), ou em uma
+    permutação pseudoaleatória reproduzível (passeio afim no grupo
+    cíclico Z_n) quando randomize=True. Respeita um limite de sondas
+    simultâneas por host, adiando as sondas de hosts saturados.
+    
+    Cada sonda é uma tupla (host, porta, protocolo, tentativa). Sondas
+    reenviadas via retry() têm prioridade baixa: só são disparadas depois
+    que a primeira passada termina.
+    """
+    
+    # Limite de sondas adiadas em memória antes de aguardar liberações
+    MAX_DEFERRED = 4096
+    
+    def __init__(self, hosts: List[str], ports: List[int], protocols: List[str],
+                 per_host_limit: Optional[int] = None, randomize: bool = False,
+                 seed: Optional[int] = None, skip: Optional[Set[Tuple[str, int, str]]] = None):
+        self.hosts = list(hosts)
+        self.ports = list(ports)
+        self.protocols = list(protocols)
+        self.per_host_limit = per_host_limit or None
+        # Sondas (host, porta, protocolo) já concluídas, ex: job retomado
+        self.skip = skip or None
+        self.space = len(self.hosts) * len(self.ports) * len(self.protocols)
+        self.total = self.space
+        if self.skip:
+            hosts_set, ports_set, protocols_set = set(self.hosts), set(self.ports), set(self.protocols)
+            self.total -= sum(1 for host, port, protocol in self.skip
+                              if host in hosts_set and port in ports_set and protocol in protocols_set)
+        
+        self.in_flight: Dict[str, int] = {}
+        self.finished_hosts: Set[str] = set()
+        self._deferred: Dict[str, deque] = {}
+        self._deferred_count = 0
+        self._ready = deque()
+        self._retries = deque()
+        self._order = self._walk(randomize, seed)
+        self._exhausted = self.total == 0
+    
+    def _walk(self, randomize: bool, seed: Optional[int]):
+        """Gera os índices do espaço de sondas na ordem de visita"""
+        n = self.space
+        if not randomize or n <= 1:
+            yield from range(n)
+            return
+        
+        # Passeio afim i -> (a*i + c) mod n com mdc(a, n) = 1 é uma permutação
+        rng = random.Random(seed)
+        a = rng.randrange(1, n)
+        while math.gcd(a, n) != 1:
+            a = rng.randrange(1, n)
+        c = rng.randrange(n)
+        
+        index = c
+        for _ in range(n):
+            yield index
+            index = (index + a) % n
+    
+    def _decode(self, index: int) -> Tuple[str, int, str, int]:
+        """Converte índice linear em (host, porta, protocolo, tentativa)"""
+        host_count = len(self.hosts)
+        host = self.hosts[index % host_count]
+        rest = index // host_count
+        protocol = self.protocols[rest % len(self.protocols)]
+        port = self.ports[rest // len(self.protocols)]
+        return host, port, protocol, 0
+    
+    def _has_capacity(self, host: str) -> bool:
+        if self.per_host_limit is None:
+            return True
+        return self.in_flight.get(host, 0) < self.per_host_limit
+    
+    def _defer(self, probe: Tuple[str, int, str, int]) -> None:
+        self._deferred.setdefault(probe[0], deque()).append(probe)
+        self._deferred_count += 1
+    
+    def next_probe(self) -> Optional[Tuple[str, int, str, int]]:
+        """
+        Retorna a próxima sonda que pode ser disparada, ou None se nenhuma
+        estiver disponível no momento (fim da varredura ou hosts saturados)
+        """
+        if self._ready:
+            probe = self._ready.popleft()
+        else:
+            probe = None
+            while not self._exhausted and self._deferred_count < self.MAX_DEFERRED:
+                index = next(self._order, None)
+                if index is None:
+                    self._exhausted = True
+                    break
+                candidate = self._decode(index)
+                if candidate[0] in self.finished_hosts:
+                    continue
+                if self.skip and candidate[:3] in self.skip:
+                    continue
+                if self._has_capacity(candidate[0]):
+                    probe = candidate
+                    break
+                self._defer(candidate)
+            
+            # Retransmissões só depois de esgotada a primeira passada
+            while probe is None and self._exhausted and self._deferred_count == 0 and self._retries:
+                candidate = self._retries.popleft()
+                if candidate[0] in self.finished_hosts:
+                    continue
+                if self._has_capacity(candidate[0]):
+                    probe = candidate
+                else:
+                    self._defer(candidate)
+            if probe is None:
+                return None
+        
+        host = probe[0]
+        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        return probe
+    
+    def release(self, host: str) -> None:
+        """Marca a conclusão de uma sonda do host, liberando sondas adiadas"""
+        self.in_flight[host] -= 1
+        backlog = self._deferred.get(host)
+        if backlog:
+            self._ready.append(backlog.popleft())
+            self._deferred_count -= 1
+            if not backlog:
+                del self._deferred[host]
+    
+    def retry(self, probe: Tuple[str, int, str, int]) -> None:
+        """Reagenda uma sonda como nova tentativa de baixa prioridade"""
+        host, port, protocol, attempt = probe
+        self._retries.append((host, port, protocol, attempt + 1))
+    
+    def drop_host(self, host: str) -> None:
+        """Encerra a varredura de um host, descartando suas sondas restantes"""
+        self.finished_hosts.add(host)
+        backlog = self._deferred.pop(host, None)
+        if backlog:
+            self._deferred_count -= len(backlog)
+        if any(probe[0] == host for probe in self._ready):
+            self._ready = deque(probe for probe in self._ready if probe[0] != host)
+    
+    def has_pending(self) -> bool:
+        """Indica se ainda há sondas a disparar"""
+        return (bool(self._ready) or bool(self._retries)
+                or self._deferred_count > 0 or not self._exhausted)
+
+
+# Métricas do motor de varredura (registro global, exportado em /metrics e --metrics)
+PROBES_TOTAL = REGISTRY.counter('portscanner_probes_total', 'Sondas finalizadas por protocolo e status')
+PROBE_TIMEOUTS = REGISTRY.counter('portscanner_probe_timeouts_total', 'Tentativas encerradas por timeout')
+PROBE_RETRIES = REGISTRY.counter('portscanner_probe_retries_total', 'Sondas retransmitidas')
+PROBE_DURATION = REGISTRY.histogram('portscanner_probe_duration_seconds', 'Duração de cada tentativa de sonda')
+PROBES_IN_FLIGHT = REGISTRY.gauge('portscanner_probes_in_flight', 'Sondas (sockets) em andamento')
+PROBES_PENDING = REGISTRY.gauge('portscanner_probes_pending', 'Sondas aguardando disparo (profundidade da fila)')
+CONCURRENCY_WINDOW = REGISTRY.gauge('portscanner_concurrency_window', 'Janela de concorrência AIMD atual')
+SCANS_RUNNING = REGISTRY.gauge('portscanner_scans_running', 'Varreduras em execução')
+
+# Status que resultam de timeout e podem ser retransmitidos
+RETRYABLE_STATUSES = ('filtered', 'open|filtered')
+
+# Erros locais que indicam saturação (buffers do kernel, conntrack, portas efêmeras)
+CONGESTION_ERRNOS = {errno.ENOBUFS, errno.EAGAIN, errno.EWOULDBLOCK}
+
+# connect() não bloqueante ainda em andamento (WSAEWOULDBLOCK no Windows)
+CONNECT_IN_PROGRESS = {errno.EINPROGRESS, errno.EALREADY, getattr(errno, 'WSAEWOULDBLOCK', errno.EINPROGRESS)}
+
+
+class CongestionController:
+    """
+    Controle de concorrência AIMD (aumento aditivo, redução multiplicativa)
+    
+    A janela de sondas simultâneas cresce enquanto a taxa de timeouts de
+    cada rodada fica próxima da taxa de referência observada, e é reduzida
+    multiplicativamente em picos de timeout ou erros locais como
+    ENOBUFS/EAGAIN. Uma rodada corresponde a uma janela de respostas.
+    """
+    
+    def __init__(self, initial=10, minimum=1, maximum=500,
+                 increase=2, decrease=0.5, spike_threshold=0.2):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.spike_threshold = spike_threshold
+        self.window = max(minimum, min(initial, maximum))
+        self.baseline = None
+        
+        self._start = time.monotonic()
+        self._samples = 0
+        self._timeouts = 0
+        # Evolução da janela: lista de (segundos desde o início, janela)
+        self.history = [(0.0, self.window)]
+    
+    def _set_window(self, window: int) -> None:
+        window = max(self.minimum, min(int(window), self.maximum))
+        if window != self.window:
+            self.window = window
+            self.history.append((time.monotonic() - self._start, window))
+    
+    def _end_round(self) -> None:
+        self._samples = 0
+        self._timeouts = 0
+    
+    def on_result(self, timed_out: bool) -> None:
+        """Registra a conclusão de uma sonda"""
+        self._samples += 1
+        if timed_out:
+            self._timeouts += 1
+        if self._samples < self.window:
+            return
+        
+        ratio = self._timeouts / self._samples
+        if self.baseline is None:
+            self.baseline = ratio
+        
+        if ratio > self.baseline + self.spike_threshold:
+            self._set_window(self.window * self.decrease)
+        else:
+            self._set_window(self.window + self.increase)
+            # Referência acompanha lentamente a taxa de timeouts da rede
+            self.baseline = 0.8 * self.baseline + 0.2 * ratio
+        self._end_round()
+    
+    def on_congestion(self) -> None:
+        """Reduz a janela imediatamente após erro local de saturação"""
+        self._set_window(self.window * self.decrease)
+        self._end_round()
+    
+    def summary(self) -> Dict[str, float]:
+        """Resumo da concorrência escolhida ao longo da varredura"""
+        windows = [window for _, window in self.history]
+        return {
+            'final': self.window,
+            'peak': max(windows),
+            'adjustments': len(self.history) - 1,
+        }
+
+
+class RateLimiter:
+    """
+    Orçamento de sondas por segundo (token bucket)
+    
+    Acumula até burst fichas à taxa rate; cada sonda disparada consome
+    uma ficha. Pode ser compartilhado pelos laços de despacho de várias
+    varreduras (daemon): o saldo é protegido por lock.
+    """
+    
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate / 10)
+        self.tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+    
+    def available(self) -> bool:
+        """Indica se há ficha para disparar uma sonda agora"""
+        with self._lock:
+            self._refill()
+            return self.tokens >= 1
+    
+    def consume(self) -> None:
+        with self._lock:
+            self.tokens -= 1
+    
+    def delay(self) -> float:
+        """Segundos até a próxima ficha"""
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class ScanCancelled(Exception):
+    """Sonda abortada porque a varredura foi cancelada"""
+
+
+class ExcludedHost(Exception):
+    """Host cujo endereço resolvido está na lista de exclusão"""
+
+
+class CancellationToken:
+    """
+    Cancelamento cooperativo da varredura
+    
+    Sondas esperam pelo socket e pelo token ao mesmo tempo (poll/select),
+    então cancel() acorda imediatamente as sondas em andamento, em vez de
+    aguardar o timeout de cada uma. Pode ser cancelado de qualquer thread.
+    """
+    
+    def __init__(self):
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._wakeup = None
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+    
+    def cancel(self, reason: str = 'cancelled') -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            if self._wakeup:
+                # O byte nunca é lido: o socket fica legível para todas as sondas
+                self._wakeup[1].send(b'x')
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Dorme até o timeout ou o cancelamento; True se cancelado"""
+        return self._event.wait(timeout)
+    
+    def _wakeup_socket(self) -> socket.socket:
+        with self._lock:
+            if self._wakeup is None:
+                self._wakeup = socket.socketpair()
+                if self._event.is_set():
+                    self._wakeup[1].send(b'x')
+            return self._wakeup[0]
+    
+    def wait_socket(self, sock: socket.socket, timeout: float, write: bool = False) -> bool:
+        """
+        Espera o socket ficar pronto (write=True: connect concluído) por até
+        timeout segundos. Retorna False no timeout; levanta ScanCancelled se
+        a varredura for cancelada durante a espera.
+        """
+        if self.cancelled:
+            raise ScanCancelled()
+        wakeup = self._wakeup_socket()
+        if hasattr(select, 'poll'):
+            poller = select.poll()
+            poller.register(sock, select.POLLOUT if write else select.POLLIN)
+            poller.register(wakeup, select.POLLIN)
+            ready = poller.poll(timeout * 1000)
+        else:
+            # Windows: falha de connect é sinalizada na lista de exceções
+            readable, writable, failed = select.select([wakeup] if write else [wakeup, sock],
+                                                       [sock] if write else [], [sock], timeout)
+            ready = readable + writable + failed
+        if self.cancelled:
+            raise ScanCancelled()
+        return bool(ready)
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._wakeup:
+                for sock in self._wakeup:
+                    sock.close()
+                self._wakeup = None
+
+
+class _ProtocolLane:
+    """Fila, pool de threads, concorrência e orçamento de um protocolo"""
+    
+    def __init__(self, protocol: str, scheduler: ProbeScheduler, threads: int,
+                 controller: Optional[CongestionController], limiter: Optional[RateLimiter]):
+        self.protocol = protocol
+        self.scheduler = scheduler
+        self.threads = threads
+        self.controller = controller
+        self.limiter = limiter
+        self.executor = None
+        self.in_flight = 0
+        self.completed = 0
+    
+    @property
+    def limit(self) -> int:
+        return self.controller.window if self.controller else self.threads
 
 
 class PortScanner:
     """Classe principal para varredura de portas"""
     
-    def __init__(self, timeout=3, max_threads=100):
+    # Limite superior do pool quando max_threads='auto'
+    AUTO_MAX_THREADS = 500
+    
+    def __init__(self, timeout=3, max_threads=100, per_host_limit=None,
+                 randomize=False, seed=None, max_open_per_host=None,
+                 max_open=None, time_budget=None, retries=0, retry_backoff=2.0,
+                 tracer=None, protocol_settings=None, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                 executors=None, rate_limiters=None, resolver=None, cancel_token=None,
+                 exclude=None):
         self.timeout = timeout
-        self.max_threads = max_threads
-        self.results = []
+        self.auto_threads = max_threads == 'auto'
+        self.max_threads = self.AUTO_MAX_THREADS if self.auto_threads else max_threads
+        # Ajustes por protocolo: {'UDP': {'threads': 50, 'timeout': 1, 'rate': 200}}
+        # Cada protocolo tem fila, pool e orçamento próprios
+        self.protocol_settings = {proto.upper(): dict(options)
+                                  for proto, options in (protocol_settings or {}).items()}
+        self.controller = None
+        self.controllers: Dict[str, CongestionController] = {}
+        # Recursos compartilhados entre varreduras (daemon): pools já aquecidos
+        # e orçamentos por protocolo, e resolução de nomes com cache
+        self.executors = {proto.upper(): pool for proto, pool in (executors or {}).items()}
+        self.rate_limiters = {proto.upper(): limiter for proto, limiter in (rate_limiters or {}).items()}
+        self.resolver = resolver
+        # Faixas que nunca são sondadas (ExclusionList): conferidas também no
+        # endereço resolvido dos hostnames, imediatamente antes da sonda
+        self.exclude = exclude
+        self.excluded_hosts: Set[str] = set()
+        self.per_host_limit = per_host_limit
+        self.randomize = randomize
+        self.seed = seed
+        # Critérios de parada antecipada (None = desativado)
+        self.max_open_per_host = max_open_per_host
+        self.max_open = max_open
+        self.time_budget = time_budget
+        # Retransmissões de sondas sem resposta, com timeout exponencial
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.stop_reason = None
+        # Cancelamento externo (Parar, Ctrl+C, job cancelado); um token já
+        # cancelado encerra também as varreduras seguintes deste scanner
+        self.cancel_token = cancel_token or CancellationToken()
+        # Rastreamento opcional da linha do tempo (Trace Event JSON)
+        self.tracer = tracer or NULL_TRACER
+        # Resultados acima do limite de memória são despejados em disco
+        self.memory_limit_mb = memory_limit_mb
+        self.results = ResultStore(memory_limit_mb, result_type=ScanResult)
+        self.aggregator = ScanAggregator()
         self.lock = threading.Lock()
+        self._congestion_events = 0
+    
+    def _note_error(self, error: OSError) -> None:
+        """Contabiliza erros locais de saturação para o controle de concorrência"""
+        if error.errno in CONGESTION_ERRNOS:
+            with self.lock:
+                self._congestion_events += 1
         
-    def scan_tcp_port(self, host: str, port: int) -> ScanResult:
+    def protocol_option(self, protocol: str, name: str, default=None):
+        """Valor configurado para o protocolo, ou o padrão"""
+        value = self.protocol_settings.get(protocol.upper(), {}).get(name)
+        return default if value is None else value
+    
+    def probe_timeout(self, attempt: int = 0, protocol: Optional[str] = None) -> float:
+        """Timeout da tentativa: cresce exponencialmente a cada retransmissão"""
+        timeout = self.protocol_option(protocol, 'timeout', self.timeout) if protocol else self.timeout
+        return timeout * (self.retry_backoff ** attempt)
+    
+    def address(self, host: str) -> str:
+        """
+        Endereço usado na sonda (via resolver com cache, se configurado).
+        Com lista de exclusão, hostnames são resolvidos aqui e o endereço
+        conferido é o mesmo usado na conexão; excluído, levanta ExcludedHost.
+        """
+        address = self.resolver(host) if self.resolver else host
+        if not self.exclude:
+            return address
+        if address == host:
+            try:
+                ipaddress.ip_address(host)
+            except ValueError:
+                address = socket.gethostbyname(host)
+        if address in self.exclude:
+            raise ExcludedHost(f"{host} ({address})")
+        return address
+    
+    def cancel(self, reason: str = 'cancelled') -> None:
+        """
+        Cancela a varredura: sondas na fila são descartadas e as em andamento
+        abortadas; scan_range retorna os resultados parciais. Seguro a partir
+        de outra thread.
         """
-        Realiza varredura TCP em uma porta específica usando SYN scan básico
+        if self.stop_reason is None:
+            self.stop_reason = reason
+        self.cancel_token.cancel(reason)
+    
+    def should_retry(self, result: Optional[ScanResult], attempt: int) -> bool:
+        """Indica se a sonda ficou sem resposta e ainda tem retransmissões"""
+        return (result is not None and attempt < self.retries
+                and result.status in RETRYABLE_STATUSES)
+    
+    def scan_tcp_port(self, host: str, port: int, timeout: float = None) -> ScanResult:
         """
+        Realiza varredura TCP em uma porta específica usando connect scan
+        """
+        start = time.perf_counter()
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.timeout)
-            
-            # Tenta conectar na porta
-            result = sock.connect_ex((host, port))
-            sock.close()
-            
-            if result == 0:
-                return ScanResult(host, port, 'TCP', 'open')
-            else:
-                return ScanResult(host, port, 'TCP', 'closed')
-                
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                # Connect não bloqueante: a espera também acorda no cancelamento
+                sock.setblocking(False)
+                error = sock.connect_ex((self.address(host), port))
+                if error in CONNECT_IN_PROGRESS:
+                    if not self.cancel_token.wait_socket(sock, timeout or self.timeout, write=True):
+                        raise socket.timeout()
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if error:
+                    # OSError escolhe a subclasse pelo errno (ex: ConnectionRefusedError)
+                    raise OSError(error, os.strerror(error))
+            status = 'open'
+        except ConnectionRefusedError:
+            status = 'closed'
         except socket.timeout:
-            return ScanResult(host, port, 'TCP', 'filtered')
-        except socket.error:
-            return ScanResult(host, port, 'TCP', 'filtered')
+            status = 'filtered'
+        except socket.gaierror:
+            status = 'filtered'
+        except OSError as e:
+            if e.errno in CONGESTION_ERRNOS:
+                self._note_error(e)
+                status = 'filtered'
+            else:
+                status = 'closed'
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return ScanResult(host, port, 'TCP', status, elapsed_ms)
             
-    def scan_udp_port(self, host: str, port: int) -> ScanResult:
+    def scan_udp_port(self, host: str, port: int, timeout: float = None) -> ScanResult:
         """
         Realiza varredura UDP em uma porta específica
         UDP é mais complexo pois é um protocolo sem conexão
         """
+        start = time.perf_counter()
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.settimeout(self.timeout)
-            
-            # Envia um pacote UDP vazio ou com dados genéricos
-            message = b"UDP_SCAN_TEST"
-            sock.sendto(message, (host, port))
-            
-            try:
-                # Tenta receber uma resposta
-                sock.recvfrom(1024)
-                sock.close()
-                return ScanResult(host, port, 'UDP', 'open')
-            except socket.timeout:
-                # Timeout pode indicar que a porta está aberta (sem resposta)
-                # ou filtrada. Para UDP, assumimos aberta se não há erro ICMP
-                sock.close()
-                return ScanResult(host, port, 'UDP', 'open|filtered')
-            except ConnectionRefusedError:
-                # ICMP Port Unreachable - porta fechada
-                sock.close()
-                return ScanResult(host, port, 'UDP', 'closed')
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.setblocking(False)
+                
+                # Envia um pacote UDP vazio ou com dados genéricos
+                message = b"UDP_SCAN_TEST"
+                sock.sendto(message, (self.address(host), port))
+                
+                try:
+                    # Tenta receber uma resposta (a espera acorda no cancelamento)
+                    if not self.cancel_token.wait_socket(sock, timeout or self.timeout):
+                        raise socket.timeout()
+                    sock.recvfrom(1024)
+                    status = 'open'
+                except socket.timeout:
+                    # Timeout pode indicar que a porta está aberta (sem resposta)
+                    # ou filtrada. Para UDP, assumimos aberta se não há erro ICMP
+                    status = 'open|filtered'
+                except ConnectionRefusedError:
+                    # ICMP Port Unreachable - porta fechada
+                    status = 'closed'
                 
         except socket.error as e:
-            return ScanResult(host, port, 'UDP', 'filtered')
+            self._note_error(e)
+            status = 'filtered'
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return ScanResult(host, port, 'UDP', status, elapsed_ms)
             
-    def scan_host_port(self, host: str, port: int, protocol: str) -> None:
-        """Escaneia uma porta específica de um host"""
+    def scan_host_port(self, host: str, port: int, protocol: str, attempt: int = 0) -> Optional[ScanResult]:
+        """
+        Escaneia uma porta específica de um host. Resultados que ainda serão
+        retransmitidos não são armazenados.
+        """
+        timeout = self.probe_timeout(attempt, protocol)
         if protocol.upper() == 'TCP':
-            result = self.scan_tcp_port(host, port)
+            scan = self.scan_tcp_port
         elif protocol.upper() == 'UDP':
-            result = self.scan_udp_port(host, port)
+            scan = self.scan_udp_port
         else:
-            return
+            return None
+        
+        # Sondas canceladas não geram resultado
+        try:
+            if not self.tracer.sample():
+                result = scan(host, port, timeout)
+                if not self.should_retry(result, attempt):
+                    self._store(result)
+                return result
+            
+            # Sonda amostrada: registra spans da conexão e da gravação do resultado
+            with self.tracer.span('connect', 'probe', host=host, port=port,
+                                  protocol=protocol, attempt=attempt) as span:
+                result = scan(host, port, timeout)
+                span.args['status'] = result.status
+        except ScanCancelled:
+            return None
+        except ExcludedHost:
+            # Nenhuma sonda sai para o host; o dispatcher descarta as demais portas
+            with self.lock:
+                self.excluded_hosts.add(host)
+            return None
+        if not self.should_retry(result, attempt):
+            with self.tracer.span('result_append', 'probe'):
+                self._store(result)
+        return result
             
+    def _store(self, result: ScanResult) -> None:
+        """Guarda um resultado final e atualiza o resumo"""
         with self.lock:
             self.results.append(result)
-            
-    def scan_range(self, hosts: List[str], ports: List[int], protocols: List[str] = None) -> List[ScanResult]:
+            self.aggregator.add(result)
+    
+    def _record_attempt(self, result: Optional[ScanResult]) -> None:
+        """Atualiza as métricas de uma tentativa concluída"""
+        if result is None:
+            return
+        if result.response_time is not None:
+            PROBE_DURATION.observe(result.response_time / 1000, protocol=result.protocol)
+        if result.status in RETRYABLE_STATUSES:
+            PROBE_TIMEOUTS.inc(protocol=result.protocol)
+    
+    def _build_lanes(self, hosts: List[str], ports: List[int], protocols: List[str],
+                     skip=None) -> List[_ProtocolLane]:
+        """Cria uma fila com pool, janela e orçamento próprios por protocolo"""
+        lanes = []
+        for protocol in protocols:
+            threads = self.protocol_option(protocol, 'threads', self.max_threads)
+            scheduler = ProbeScheduler(hosts, ports, [protocol],
+                                       per_host_limit=self.per_host_limit,
+                                       randomize=self.randomize, seed=self.seed, skip=skip)
+            controller = CongestionController(maximum=threads) if self.auto_threads else None
+            rate = self.protocol_option(protocol, 'rate')
+            limiter = self.rate_limiters.get(protocol.upper()) or (RateLimiter(rate) if rate else None)
+            lanes.append(_ProtocolLane(protocol.upper(), scheduler, threads, controller, limiter))
+        return lanes
+    
+    def _dispatch(self, lanes: List[_ProtocolLane], progress_callback=None, result_callback=None) -> int:
+        """
+        Laço principal: dispara sondas de cada protocolo no seu próprio pool,
+        respeitando a janela de concorrência e o orçamento de cada um, e
+        aplica os critérios de parada sobre o conjunto. Retorna o número de
+        retransmissões.
+        """
+        deadline = time.monotonic() + self.time_budget if self.time_budget else None
+        open_by_host: Dict[str, int] = {}
+        open_total = 0
+        retried = 0
+        self.controllers = {lane.protocol: lane.controller for lane in lanes if lane.controller}
+        self.controller = next(iter(self.controllers.values()), None)
+        congestion_seen = self._congestion_events
+        total = sum(lane.scheduler.total for lane in lanes)
+        SCANS_RUNNING.inc()
+        PROBES_PENDING.inc(total)
+        
+        pending = {}
+        queued = total
+        try:
+            with ExitStack() as stack:
+                for lane in lanes:
+                    lane.executor = self.executors.get(lane.protocol)
+                    if lane.executor is None:
+                        lane.executor = stack.enter_context(ThreadPoolExecutor(
+                            max_workers=lane.threads, thread_name_prefix=f"scan-{lane.protocol.lower()}"))
+                
+                def interrupted(exc_type, exc, tb):
+                    # Ctrl+C: aborta as sondas antes de fechar os pools e devolve
+                    # os resultados parciais
+                    if exc_type is not KeyboardInterrupt:
+                        return False
+                    self.cancel('interrupted')
+                    for future in pending:
+                        future.cancel()
+                    return True
+                stack.push(interrupted)
+                completed = 0
+                
+                while True:
+                    # Submete até a janela de cada protocolo, intercalando hosts
+                    throttle = None
+                    for lane in lanes:
+                        while self.stop_reason is None and lane.in_flight < lane.limit:
+                            if lane.limiter and not lane.limiter.available():
+                                if lane.scheduler.has_pending():
+                                    delay = lane.limiter.delay()
+                                    throttle = delay if throttle is None else min(throttle, delay)
+                                break
+                            probe = lane.scheduler.next_probe()
+                            if probe is None:
+                                break
+                            if lane.limiter:
+                                lane.limiter.consume()
+                            future = lane.executor.submit(self.scan_host_port, *probe)
+                            pending[future] = (lane, probe)
+                            lane.in_flight += 1
+                            queued -= 1
+                            PROBES_IN_FLIGHT.inc()
+                            PROBES_PENDING.dec()
+                    
+                    remaining = None
+                    if deadline is not None:
+                        remaining = max(0.0, deadline - time.monotonic())
+                    if throttle is not None:
+                        remaining = throttle if remaining is None else min(remaining, throttle)
+                    
+                    if pending:
+                        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                    elif throttle is not None and self.stop_reason is None:
+                        # Só há sondas aguardando orçamento
+                        self.cancel_token.wait(remaining)
+                        done = ()
+                    else:
+                        break
+                    
+                    for future in done:
+                        lane, probe = pending.pop(future)
+                        host, attempt = probe[0], probe[3]
+                        lane.scheduler.release(host)
+                        lane.in_flight -= 1
+                        PROBES_IN_FLIGHT.dec()
+                        result = future.result()
+                        self._record_attempt(result)
+                        if lane.controller and result is not None:
+                            lane.controller.on_result(result.status in RETRYABLE_STATUSES)
+                        
+                        if self.should_retry(result, attempt):
+                            lane.scheduler.retry(probe)
+                            retried += 1
+                            queued += 1
+                            PROBE_RETRIES.inc(protocol=probe[2])
+                            PROBES_PENDING.inc()
+                            continue
+                        
+                        completed += 1
+                        lane.completed += 1
+                        if result is None and host in self.excluded_hosts:
+                            for other in lanes:
+                                other.scheduler.drop_host(host)
+                        if result is not None:
+                            PROBES_TOTAL.inc(protocol=result.protocol, status=result.status)
+                            if result_callback:
+                                result_callback(result)
+                        if progress_callback:
+                            progress_callback(completed, total)
+                        if completed % 50 == 0 or completed == total:
+                            self._print_progress(completed, total, lanes)
+                        
+                        if result is None or result.status != 'open':
+                            continue
+                        open_total += 1
+                        open_by_host[host] = open_by_host.get(host, 0) + 1
+                        if self.max_open_per_host and open_by_host[host] >= self.max_open_per_host:
+                            for other in lanes:
+                                other.scheduler.drop_host(host)
+                        if self.max_open and open_total >= self.max_open:
+                            self.stop_reason = 'max_open'
+                            self.tracer.instant('stop', reason='max_open')
+                    
+                    if self._congestion_events != congestion_seen:
+                        congestion_seen = self._congestion_events
+                        for controller in self.controllers.values():
+                            controller.on_congestion()
+                    for protocol, controller in self.controllers.items():
+                        CONCURRENCY_WINDOW.set(controller.window, protocol=protocol)
+                    
+                    if deadline is not None and time.monotonic() >= deadline and self.stop_reason is None:
+                        self.stop_reason = 'time_budget'
+                        self.tracer.instant('stop', reason='time_budget')
+                    
+                    if self.cancel_token.cancelled and self.stop_reason is None:
+                        self.stop_reason = self.cancel_token.reason
+                    if self.stop_reason is not None:
+                        # Cancela sondas não iniciadas; as em andamento terminam em até um
+                        # timeout, ou imediatamente quando a varredura foi cancelada, e
+                        # seus resultados também chegam ao result_callback
+                        for future in pending:
+                            future.cancel()
+                        wait(pending)
+                        for future, (lane, probe) in pending.items():
+                            if future.cancelled():
+                                continue
+                            result = future.result()
+                            if result is not None and not self.should_retry(result, probe[3]) and result_callback:
+                                result_callback(result)
+                        break
+        finally:
+            # Sondas descartadas (parada antecipada ou erro) deixam de contar
+            PROBES_IN_FLIGHT.dec(len(pending))
+            PROBES_PENDING.dec(queued)
+            SCANS_RUNNING.dec()
+        
+        return retried
+    
+    def _print_progress(self, completed: int, total: int, lanes: List[_ProtocolLane]) -> None:
+        """Progresso combinado e, com mais de um protocolo, por protocolo"""
+        line = f"[+] Progresso: {completed}/{total} ({(completed/total)*100:.1f}%)"
+        if len(lanes) > 1:
+            line += "".join(f" | {lane.protocol} {lane.completed}/{lane.scheduler.total}" for lane in lanes)
+        windows = [f"{lane.protocol} {lane.controller.window}" for lane in lanes if lane.controller]
+        if windows:
+            line += f" | Janela: {', '.join(windows) if len(lanes) > 1 else lanes[0].controller.window}"
+        print(line)
+        
+    def scan_range(self, hosts: List[str], ports: List[int], protocols: List[str] = None,
+                   progress_callback=None, result_callback=None, skip=None) -> List[ScanResult]:
         """
         Escaneia uma lista de hosts em uma lista de portas
+        
+        progress_callback, se informado, é chamado com (concluídas, total)
+        a cada sonda finalizada (retransmissões não contam). result_callback
+        recebe cada resultado final assim que a sonda termina, de modo que
+        resultados TCP saem enquanto as sondas UDP ainda aguardam timeout.
+        skip é um conjunto de (host, porta, protocolo) já sondados, que não
+        entram na varredura nem no total (retomada de jobs interrompidos).
         """
         if protocols is None:
             protocols = ['TCP']
             
         print(f"[+] Iniciando varredura de {len(hosts)} host(s) em {len(ports)} porta(s)")
         print(f"[+] Protocolos: {', '.join(protocols)}")
-        print(f"[+] Timeout: {self.timeout}s | Max Threads: {self.max_threads}")
+        threads_label = f"auto (até {self.max_threads})" if self.auto_threads else self.max_threads
+        print(f"[+] Timeout: {self.timeout}s | Max Threads: {threads_label}")
+        for protocol, options in self.protocol_settings.items():
+            details = ", ".join(f"{name} {value}" for name, value in options.items() if value is not None)
+            if details and protocol in [p.upper() for p in protocols]:
+                print(f"[+] {protocol}: {details}")
+        if self.per_host_limit:
+            print(f"[+] Limite por host: {self.per_host_limit} sonda(s) simultânea(s)")
+        if self.max_open_per_host:
+            print(f"[+] Parada por host após {self.max_open_per_host} porta(s) aberta(s)")
+        if self.max_open:
+            print(f"[+] Parada global após {self.max_open} porta(s) aberta(s)")
+        if self.time_budget:
+            print(f"[+] Orçamento de tempo: {self.time_budget}s")
+        if self.retries:
+            print(f"[+] Retransmissões: {self.retries} (backoff x{self.retry_backoff})")
         print("-" * 60)
         
-        self.results = []
+        self.results = ResultStore(self.memory_limit_mb, result_type=ScanResult)
+        self.aggregator = ScanAggregator()
+        self.excluded_hosts = set()
+        self.stop_reason = self.cancel_token.reason
         
-        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            futures = []
-            
-            for host in hosts:
-                for port in ports:
-                    for protocol in protocols:
-                        future = executor.submit(self.scan_host_port, host, port, protocol)
-                        futures.append(future)
-            
-            # Aguarda conclusão de todas as threads
-            completed = 0
-            total = len(futures)
-            
-            for future in futures:
-                future.result()
-                completed += 1
-                if completed % 50 == 0 or completed == total:
-                    print(f"[+] Progresso: {completed}/{total} ({(completed/total)*100:.1f}%)")
+        lanes = self._build_lanes(hosts, ports, protocols, skip)
+        if skip:
+            print(f"[+] Retomando: {len(hosts) * len(ports) * len(protocols) - sum(lane.scheduler.total for lane in lanes)} "
+                  f"sonda(s) já concluída(s)")
+        probes = sum(lane.scheduler.total for lane in lanes)
+        with self.tracer.span('scan_range', hosts=len(hosts), ports=len(ports), probes=probes):
+            retried = self._dispatch(lanes, progress_callback, result_callback)
+        
+        if self.stop_reason == 'max_open':
+            print(f"[!] Varredura encerrada: limite de {self.max_open} porta(s) aberta(s) atingido")
+        elif self.stop_reason == 'time_budget':
+            print(f"[!] Varredura encerrada: orçamento de {self.time_budget}s esgotado")
+        elif self.stop_reason in ('cancelled', 'interrupted'):
+            print(f"[!] Varredura {'interrompida' if self.stop_reason == 'interrupted' else 'cancelada'}: "
+                  f"{len(self.results)} resultado(s) parcial(is)")
+        finished_hosts = set().union(*(lane.scheduler.finished_hosts for lane in lanes)) if lanes else set()
+        if self.excluded_hosts:
+            print(f"[+] Hosts ignorados (endereço resolvido excluído): {len(self.excluded_hosts)}")
+        if finished_hosts - self.excluded_hosts:
+            print(f"[+] Hosts encerrados antecipadamente: {len(finished_hosts - self.excluded_hosts)}")
+        if retried:
+            print(f"[+] Sondas retransmitidas: {retried}")
+        if self.results.segments:
+            print(f"[+] Resultados despejados em disco: {self.results.spilled} "
+                  f"em {len(self.results.segments)} segmento(s)")
+        for protocol, controller in self.controllers.items():
+            stats = controller.summary()
+            label = f" {protocol}" if len(self.controllers) > 1 else ""
+            print(f"[+] Concorrência automática{label}: final {stats['final']}, pico {stats['peak']}, "
+                  f"{stats['adjustments']} ajuste(s)")
         
         return self.results
         
-    def display_results(self) -> None:
-        """Exibe os resultados da varredura de forma organizada"""
+    def display_results(self, show_all: bool = False) -> None:
+        """
+        Exibe os resultados da varredura de forma organizada. Portas abertas e
+        abertas|filtradas são sempre listadas por completo; fechadas e filtradas
+        mostram as primeiras top_k, ou todas com show_all (--all no CLI).
+        """
         if not self.results:
             print("[-] Nenhum resultado encontrado")
             return
-            
-        # Organiza resultados por status
-        open_ports = [r for r in self.results if r.status == 'open']
-        open_filtered = [r for r in self.results if 'open' in r.status and 'filtered' in r.status]
-        closed_ports = [r for r in self.results if r.status == 'closed']
-        filtered_ports = [r for r in self.results if r.status == 'filtered']
+        
+        # Resumo mantido durante a varredura; refeito se os resultados foram trocados
+        summary = self.aggregator
+        if summary.total != len(self.results):
+            summary = ScanAggregator.from_results(self.results)
+        counts = summary.counts
         
         print("\n" + "="*60)
         print("RESULTADOS DA VARREDURA")
         print("="*60)
         
-        if open_ports:
-            print(f"\n[+] PORTAS ABERTAS ({len(open_ports)}):")
-            for result in sorted(open_ports, key=lambda x: (x.host, x.port)):
-                print(f"    {result.host}:{result.port}/{result.protocol} - {result.status.upper()}")
-                
-        if open_filtered:
-            print(f"\n[?] PORTAS ABERTAS|FILTRADAS ({len(open_filtered)}):")
-            for result in sorted(open_filtered, key=lambda x: (x.host, x.port)):
-                print(f"    {result.host}:{result.port}/{result.protocol} - {result.status.upper()}")
+        if counts.get('open'):
+            print(f"\n[+] PORTAS ABERTAS ({counts['open']}):")
+            for host in sorted(summary.open_ports):
+                for port, protocol in sorted(summary.open_ports[host]):
+                    print(f"    {host}:{port}/{protocol} - OPEN")
         
-        if closed_ports:
-            print(f"\n[-] PORTAS FECHADAS ({len(closed_ports)}):")
+        for status, title, label in (('open|filtered', "[?] PORTAS ABERTAS|FILTRADAS", "abertas|filtradas"),
+                                     ('closed', "[-] PORTAS FECHADAS", "fechadas"),
+                                     ('filtered', "[!] PORTAS FILTRADAS", "filtradas")):
+            if not counts.get(status):
+                continue
+            print(f"\n{title} ({counts[status]}):")
+            if show_all or status == 'open|filtered':
+                # Lista completa em ordem (host, porta), lida por merge dos segmentos
+                for result in self._sorted_results(status):
+                    print(f"    {result.host}:{result.port}/{result.protocol} - {result.status.upper()}")
+                continue
             # Mostra apenas algumas para não poluir a saída
-            for result in sorted(closed_ports, key=lambda x: (x.host, x.port))[:10]:
+            for result in summary.first(status):
                 print(f"    {result.host}:{result.port}/{result.protocol} - {result.status.upper()}")
-            if len(closed_ports) > 10:
-                print(f"    ... e mais {len(closed_ports) - 10} portas fechadas")
-                
-        if filtered_ports:
-            print(f"\n[!] PORTAS FILTRADAS ({len(filtered_ports)}):")
-            for result in sorted(filtered_ports, key=lambda x: (x.host, x.port))[:10]:
-                print(f"    {result.host}:{result.port}/{result.protocol} - {result.status.upper()}")
-            if len(filtered_ports) > 10:
-                print(f"    ... e mais {len(filtered_ports) - 10} portas filtradas")
+            if counts[status] > summary.top_k:
+                print(f"    ... e mais {counts[status] - summary.top_k} portas {label} (use --all para listar)")
+        
+        print(f"\n[*] Total de portas escaneadas: {summary.total}")
         
-        print(f"\n[*] Total de portas escaneadas: {len(self.results)}")
+        latency = summary.latency.stats()
+        if latency['count']:
+            print(f"[*] Latência das sondas: média {latency['mean_ms']:.1f}ms | "
+                  f"p50 {latency['p50_ms']:.1f}ms | p99 {latency['p99_ms']:.1f}ms | "
+                  f"máx {latency['max_ms']:.1f}ms")
         
-    def save_results(self, filename: str) -> None:
-        """Salva os resultados em um arquivo"""
+    def _sorted_results(self, status: str):
+        """Resultados de um status em ordem (host, porta), sem carregar o store inteiro"""
+        if isinstance(self.results, ResultStore):
+            return self.results.sorted(status)
+        return sorted((r for r in self.results if r.status == status), key=lambda r: (r.host, r.port, r.protocol))
+    
+    def save_results(self, filename: str, format: Optional[str] = None) -> None:
+        """
+        Salva os resultados em um arquivo (formato pela extensão: .csv,
+        .ndjson, .json, .xml, .txt; .gz / .zst para comprimir)
+        """
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write("Host,Port,Protocol,Status\n")
-                for result in sorted(self.results, key=lambda x: (x.host, x.port)):
-                    f.write(f"{result.host},{result.port},{result.protocol},{result.status}\n")
+            with open_writer(filename, format) as writer:
+                writer.write_many(self.results)
             print(f"[+] Resultados salvos em: {filename}")
-        except Exception as e:
+        except (OSError, ValueError) as e:
             print(f"[-] Erro ao salvar arquivo: {e}")
 
 
-def expand_cidr(cidr: str) -> List[str]:
-    """Expande notação CIDR para lista de IPs ou processa lista de IPs separados por vírgula"""
+# Máximo de hosts/portas detalhados nos histogramas (os mais lentos por p99)
+LATENCY_DETAIL_LIMIT = 500
+
+
+class ScanAggregator:
+    """
+    Resumo da varredura atualizado a cada resultado, em uma única passada
+    
+    Mantém contagem por status, portas abertas por host, as top_k primeiras
+    portas de cada status na ordem (host, porta) e histogramas de latência
+    (geral, por status, host e porta). Exibição no CLI, GUI, histórico do
+    Django e API leem daqui, sem percorrer os resultados novamente.
+    """
+    
+    def __init__(self, top_k: int = 10, detail_limit: int = LATENCY_DETAIL_LIMIT):
+        self.top_k = top_k
+        self.detail_limit = detail_limit
+        self.total = 0
+        self.counts: Dict[str, int] = {}
+        self.hosts: Set[str] = set()
+        self.open_ports: Dict[str, Set[Tuple[int, str]]] = {}
+        # status -> lista ordenada de ((host, porta, protocolo), sequência, resultado)
+        self.top: Dict[str, List[Tuple[Tuple[str, int, str], int, ScanResult]]] = {}
+        self.latency = LatencyHistogram()
+        self.latency_by_status: Dict[str, LatencyHistogram] = {}
+        self.latency_by_host: Dict[str, LatencyHistogram] = {}
+        self.latency_by_port: Dict[str, LatencyHistogram] = {}
+    
+    @classmethod
+    def from_results(cls, results, **kwargs) -> 'ScanAggregator':
+        aggregator = cls(**kwargs)
+        for result in results:
+            aggregator.add(result)
+        return aggregator
+    
+    def add(self, result: ScanResult) -> None:
+        status = result.status
+        self.total += 1
+        self.counts[status] = self.counts.get(status, 0) + 1
+        self.hosts.add(result.host)
+        if status == 'open':
+            self.open_ports.setdefault(result.host, set()).add((result.port, result.protocol))
+        
+        key = (result.host, result.port, result.protocol)
+        top = self.top.setdefault(status, [])
+        if len(top) < self.top_k or key < top[-1][0]:
+            bisect.insort(top, (key, self.total, result))
+            if len(top) > self.top_k:
+                top.pop()
+        
+        if result.response_time is None:
+            return
+        self.latency.add(result.response_time)
+        for groups, group in ((self.latency_by_status, status), (self.latency_by_host, result.host),
+                              (self.latency_by_port, f"{result.port}/{result.protocol}")):
+            histogram = groups.get(group)
+            if histogram is None:
+                histogram = groups[group] = LatencyHistogram()
+            histogram.add(result.response_time)
+    
+    def first(self, status: str) -> List[ScanResult]:
+        """As primeiras top_k portas do status na ordem (host, porta)"""
+        return [result for _, _, result in self.top.get(status, [])]
+    
+    @property
+    def hosts_with_open(self) -> int:
+        return len(self.open_ports)
+    
+    def latency_summary(self) -> Dict:
+        """Histogramas geral e por status, e os hosts/portas mais lentos por p99"""
+        def slowest(groups: Dict[str, LatencyHistogram]) -> Dict[str, Dict]:
+            ranked = sorted(groups.items(), key=lambda item: item[1].percentile(0.99), reverse=True)
+            return {key: histogram.stats() for key, histogram in ranked[:self.detail_limit]}
+        
+        return {
+            'overall': self.latency.to_dict(),
+            'by_status': {status: histogram.to_dict() for status, histogram in self.latency_by_status.items()},
+            'by_host': slowest(self.latency_by_host),
+            'by_port': slowest(self.latency_by_port),
+        }
+    
+    def to_dict(self, latency: bool = True) -> Dict:
+        """Resumo serializável em JSON (API e histórico)"""
+        data = {
+            'total': self.total,
+            'by_status': dict(self.counts),
+            'hosts': len(self.hosts),
+            'hosts_with_open': self.hosts_with_open,
+            'open_ports': {host: sorted(port for port, _ in ports)
+                           for host, ports in sorted(self.open_ports.items())},
+        }
+        if latency:
+            data['latency'] = self.latency_summary()
+        return data
+
+
+def latency_histograms(results: List[ScanResult], detail_limit: int = LATENCY_DETAIL_LIMIT) -> Dict:
+    """
+    Agrega a latência das sondas: histograma geral e por status, e resumo
+    por host e por porta (limitado aos detail_limit mais lentos)
+    """
+    return ScanAggregator.from_results(results, detail_limit=detail_limit).latency_summary()
+
+
+def expand_cidr(cidr: str, exclude: Optional[ExclusionList] = None) -> List[str]:
+    """
+    Expande notação CIDR para lista de IPs ou processa lista de IPs separados por vírgula.
+    As faixas de exclude (ExclusionList) são subtraídas das redes antes da expansão.
+    """
     # Se contém vírgula, trata como lista de IPs
     if ',' in cidr:
         ips = []
@@ -200,21 +1150,27 @@ def expand_cidr(cidr: str) -> List[str]:
                 # Verifica se é CIDR
                 if '/' in ip_part:
                     network = ipaddress.ip_network(ip_part, strict=False)
-                    ips.extend([str(ip) for ip in network.hosts()])
+                    ips.extend(exclude.hosts(network) if exclude else [str(ip) for ip in network.hosts()])
                 else:
                     # Valida IP único
                     ipaddress.ip_address(ip_part)
-                    ips.append(ip_part)
+                    if not exclude or ip_part not in exclude:
+                        ips.append(ip_part)
             except ValueError:
                 # Se não é IP válido, adiciona como hostname
-                ips.append(ip_part)
+                if not exclude or ip_part not in exclude:
+                    ips.append(ip_part)
         return ips
     
     # Processa CIDR único ou IP único
     try:
         network = ipaddress.ip_network(cidr, strict=False)
+        if exclude:
+            return list(exclude.hosts(network))
         return [str(ip) for ip in network.hosts()]
     except ValueError:
+        if exclude and cidr in exclude:
+            return []
         return [cidr]  # Retorna o IP original se não for CIDR válido
 
 
@@ -238,11 +1194,39 @@ def get_common_ports() -> Dict[str, List[int]]:
     return {
         'tcp_common': [21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 443, 993, 995, 1723, 3306, 3389, 5432, 5900, 8080],
         'udp_common': [53, 67, 68, 69, 123, 161, 162, 514, 1194, 4500],
-        'tcp_top100': list(range(1, 101)),
-        'tcp_top1000': list(range(1, 1001)),
+        'tcp_top100': top_n('tcp', 100),
+        'tcp_top1000': top_n('tcp', 1000),
+        'udp_top100': top_n('udp', 100),
     }
 
 
+def dump_metrics(destination: str) -> None:
+    """Exporta o registro de métricas para a tela ('-') ou para um arquivo"""
+    text = REGISTRY.render()
+    if destination == '-':
+        print("\n" + text, end="")
+        return
+    try:
+        with open(destination, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"[+] Métricas salvas em: {destination}")
+    except OSError as e:
+        print(f"[-] Erro ao salvar métricas: {e}")
+
+
+def parse_threads(value: str):
+    """Converte o argumento --threads: número inteiro ou 'auto'"""
+    if value.lower() == 'auto':
+        return 'auto'
+    try:
+        threads = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("use um número inteiro ou 'auto'")
+    if threads < 1:
+        raise argparse.ArgumentTypeError("o número de threads deve ser positivo")
+    return threads
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Ferramenta de Varredura de Portas TCP e UDP",
@@ -253,6 +1237,16 @@ Exemplos de uso:
   python port_scanner.py -t 192.168.1.0/24 -p 1-1000 --tcp --udp
   python port_scanner.py -t 10.0.0.1 --common-ports
   python port_scanner.py -t example.com -p 80-90 --timeout 5 --threads 50
+  python port_scanner.py -t 10.0.0.0/24 -p 1-1000 --max-per-host 8 --randomize
+  python port_scanner.py -t 10.0.0.0/16 --top100 --first-open 1 --time-budget 600
+  python port_scanner.py -t 192.168.0.0/16 --top100 --threads auto -v
+  python port_scanner.py -t 10.0.0.0/24 --top1000 --timeout 0.5 --retries 2
+  python port_scanner.py -t 10.0.0.0/24 --top100 --trace scan_trace.json --trace-sample 0.05
+  python port_scanner.py -t 10.0.0.0/16 --top100 --profile-memory
+  python port_scanner.py -t 10.0.0.0/8 -p 1-1000 --dry-run
+  python port_scanner.py -t 10.0.0.0/20 --top1000 --auto
+  python port_scanner.py -t 10.0.0.0/24 --top100 --tcp --udp --udp-threads 300 --udp-timeout 1 --udp-rate 500
+  python port_scanner.py -t 10.0.0.0/16 --top100 -o resultados.ndjson.gz
         """
     )
     
@@ -270,14 +1264,68 @@ Exemplos de uso:
                        help='Escanear top 100 portas TCP')
     parser.add_argument('--top1000', action='store_true',
                        help='Escanear top 1000 portas TCP')
+    parser.add_argument('--exclude', action='append', metavar='ALVOS',
+                       help='IPs, CIDRs ou faixas (a-b) que nunca serão sondados, separados por vírgula')
+    parser.add_argument('--exclude-file', action='append', metavar='ARQUIVO',
+                       help='Arquivo com exclusões (uma ou mais por linha, # para comentários)')
     parser.add_argument('--timeout', type=float, default=3,
                        help='Timeout por conexão em segundos (padrão: 3)')
-    parser.add_argument('--threads', type=int, default=100,
-                       help='Número máximo de threads (padrão: 100)')
+    parser.add_argument('--threads', type=parse_threads, default=100,
+                       help="Número máximo de threads ou 'auto' para ajuste AIMD (padrão: 100)")
+    parser.add_argument('--tcp-threads', type=int, metavar='N',
+                       help='Threads do pool TCP (padrão: --threads)')
+    parser.add_argument('--udp-threads', type=int, metavar='N',
+                       help='Threads do pool UDP (padrão: --threads)')
+    parser.add_argument('--tcp-timeout', type=float, metavar='SEGUNDOS',
+                       help='Timeout das sondas TCP (padrão: --timeout)')
+    parser.add_argument('--udp-timeout', type=float, metavar='SEGUNDOS',
+                       help='Timeout das sondas UDP (padrão: --timeout)')
+    parser.add_argument('--tcp-rate', type=float, metavar='SONDAS/S',
+                       help='Limite de sondas TCP por segundo')
+    parser.add_argument('--udp-rate', type=float, metavar='SONDAS/S',
+                       help='Limite de sondas UDP por segundo')
+    parser.add_argument('--retries', type=int, default=0,
+                       help='Retransmissões para sondas sem resposta (padrão: 0)')
+    parser.add_argument('--retry-backoff', type=float, default=2.0,
+                       help='Multiplicador do timeout a cada retransmissão (padrão: 2.0)')
+    parser.add_argument('--max-per-host', type=int,
+                       help='Máximo de sondas simultâneas por host (padrão: sem limite)')
+    parser.add_argument('--randomize', action='store_true',
+                       help='Embaralha a ordem das sondas (permutação host x porta)')
+    parser.add_argument('--seed', type=int,
+                       help='Semente para --randomize (ordem reproduzível)')
+    parser.add_argument('--max-open-per-host', '--first-open', type=int, metavar='N',
+                       help='Para de sondar um host após N portas abertas')
+    parser.add_argument('--max-open', type=int, metavar='N',
+                       help='Encerra a varredura após N portas abertas no total')
+    parser.add_argument('--time-budget', type=float, metavar='SEGUNDOS',
+                       help='Encerra a varredura após o tempo informado')
+    parser.add_argument('--metrics', nargs='?', const='-', metavar='ARQUIVO',
+                       help='Exporta métricas (formato Prometheus) ao final; sem ARQUIVO, imprime na tela')
+    parser.add_argument('--trace', metavar='ARQUIVO',
+                       help='Grava a linha do tempo da varredura (Chrome trace / Perfetto JSON)')
+    parser.add_argument('--trace-sample', type=float, default=0.1, metavar='TAXA',
+                       help='Fração das sondas com spans no trace (padrão: 0.1)')
+    parser.add_argument('--profile-memory', action='store_true',
+                       help='Mede o pico de memória e os maiores alocadores de cada fase (tracemalloc)')
+    parser.add_argument('--auto', action='store_true',
+                       help='Pré-varredura por amostragem que ajusta descoberta, timeout, threads e ordem das portas')
+    parser.add_argument('--memory-limit', type=float, default=DEFAULT_MEMORY_LIMIT_MB, metavar='MB',
+                       help='Memória para resultados antes de despejar em disco; 0 = sem limite (padrão: 256)')
+    parser.add_argument('--daemon', nargs='?', const='', metavar='SOCKET',
+                       help='Executa a varredura no daemon (scanner_daemon.py); sem SOCKET, usa '
+                            '$PORTSCANNER_SOCKET ou /tmp/portscanner.sock')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Apenas estima sondas e duração, sem varrer')
     parser.add_argument('-o', '--output',
-                       help='Arquivo para salvar resultados (CSV)')
+                       help='Arquivo para salvar resultados; formato pela extensão '
+                            '(.csv, .ndjson, .json, .xml, .txt, com .gz/.zst opcional)')
+    parser.add_argument('--format', choices=sorted(WRITERS),
+                       help='Formato de saída, ignorando a extensão de -o')
     parser.add_argument('--verbose', '-v', action='store_true',
                        help='Saída detalhada')
+    parser.add_argument('--all', action='store_true',
+                       help='Lista todas as portas fechadas e filtradas no relatório final')
     
     args = parser.parse_args()
     
@@ -289,37 +1337,16 @@ Exemplos de uso:
     if not args.tcp and not args.udp:
         args.tcp = True  # TCP por padrão
     
-    # Expande targets
-    print("[+] Expandindo lista de targets...")
-    targets = expand_cidr(args.target)
-    print(f"[+] Targets encontrados: {len(targets)}")
-    
-    if args.verbose:
-        print(f"[+] Targets: {', '.join(targets[:10])}")
-        if len(targets) > 10:
-            print(f"    ... e mais {len(targets) - 10} targets")
-    
-    # Define portas para escanear
-    common_ports = get_common_ports()
-    ports = []
+    try:
+        exclude = ExclusionList.load(args.exclude or (), args.exclude_file or ())
+    except (OSError, ValueError) as e:
+        print(f"[-] Erro na lista de exclusão: {e}")
+        sys.exit(1)
+    if exclude:
+        print(f"[+] Exclusões: {exclude.describe()}")
     
-    if args.ports:
-        ports.extend(expand_port_range(args.ports))
-    if args.common_ports:
-        if args.tcp:
-            ports.extend(common_ports['tcp_common'])
-        if args.udp:
-            ports.extend(common_ports['udp_common'])
-    if args.top100:
-        ports.extend(common_ports['tcp_top100'])
-    if args.top1000:
-        ports.extend(common_ports['tcp_top1000'])
-    
-    ports = sorted(list(set(ports)))
-    print(f"[+] Portas para escanear: {len(ports)}")
-    
-    if args.verbose:
-        print(f"[+] Range de portas: {min(ports)}-{max(ports)}")
+    tracer = Tracer(sample_rate=args.trace_sample) if args.trace else None
+    profiler = MemoryProfiler().start() if args.profile_memory else NULL_PROFILER
     
     # Define protocolos
     protocols = []
@@ -328,21 +1355,146 @@ Exemplos de uso:
     if args.udp:
         protocols.append('UDP')
     
+    # Define portas para escanear
+    with profiler.phase('expand_ports'):
+        common_ports = get_common_ports()
+        ports = []
+        
+        if args.ports:
+            ports.extend(expand_port_range(args.ports))
+        if args.common_ports:
+            if args.tcp:
+                ports.extend(common_ports['tcp_common'])
+            if args.udp:
+                ports.extend(common_ports['udp_common'])
+        if args.top100:
+            ports.extend(common_ports['tcp_top100'])
+        if args.top1000:
+            ports.extend(common_ports['tcp_top1000'])
+        
+        # Ordena da porta mais provável de estar aberta para a menos provável
+        ports = order_by_frequency(ports, [p.lower() for p in protocols])
+    print(f"[+] Portas para escanear: {len(ports)}")
+    
+    if args.verbose:
+        print(f"[+] Range de portas: {min(ports)}-{max(ports)}")
+    
+    # Estimativa calculada sem expandir os targets
+    protocol_settings = {
+        'TCP': {'threads': args.tcp_threads, 'timeout': args.tcp_timeout, 'rate': args.tcp_rate},
+        'UDP': {'threads': args.udp_threads, 'timeout': args.udp_timeout, 'rate': args.udp_rate},
+    }
+    plan = estimate(count_targets(args.target, exclude), len(ports), protocols, args.timeout,
+                    args.threads, retries=args.retries, backoff=args.retry_backoff,
+                    per_host_limit=args.max_per_host, time_budget=args.time_budget,
+                    protocol_settings=protocol_settings)
+    if args.dry_run:
+        print_plan(plan)
+        return
+    for warning in plan.warnings:
+        print(f"[!] {warning}")
+    
+    # No modo daemon a expansão dos targets acontece no daemon
+    targets = None
+    if args.daemon is None:
+        print("[+] Expandindo lista de targets...")
+        with (tracer or NULL_TRACER).span('expand_targets'), profiler.phase('expand_targets'):
+            targets = expand_cidr(args.target, exclude)
+        print(f"[+] Targets encontrados: {len(targets)}")
+        
+        if args.verbose:
+            print(f"[+] Targets: {', '.join(targets[:10])}")
+            if len(targets) > 10:
+                print(f"    ... e mais {len(targets) - 10} targets")
+    elif args.auto:
+        print("[!] --auto não é suportado com --daemon; ignorando")
+        args.auto = False
+    
+    # Ajusta a estratégia a partir de uma amostra do espaço de targets
+    if args.auto:
+        print("[+] Pré-varredura por amostragem...")
+        sample = presample(PortScanner(timeout=args.timeout, max_threads=args.threads),
+                           args.target, ports, protocols, seed=args.seed, exclude=exclude)
+        auto_plan = choose_plan(sample, args.timeout, args.threads, ports)
+        print_auto_plan(auto_plan)
+        args.timeout, args.threads, ports = auto_plan.timeout, auto_plan.threads, auto_plan.ports
+        if auto_plan.discovery:
+            print("[+] Descoberta de hosts...")
+            targets = discover_hosts(PortScanner(timeout=args.timeout, max_threads=args.threads),
+                                     targets, auto_plan.discovery_ports)
+            print(f"[+] Hosts ativos: {len(targets)}")
+    
     # Inicia varredura
-    scanner = PortScanner(timeout=args.timeout, max_threads=args.threads)
+    options = dict(timeout=args.timeout, max_threads=args.threads,
+                   per_host_limit=args.max_per_host,
+                   randomize=args.randomize, seed=args.seed,
+                   max_open_per_host=args.max_open_per_host,
+                   max_open=args.max_open, time_budget=args.time_budget,
+                   retries=args.retries, retry_backoff=args.retry_backoff,
+                   tracer=tracer, protocol_settings=protocol_settings,
+                   memory_limit_mb=args.memory_limit or None, exclude=exclude)
+    if args.daemon is None:
+        scanner = PortScanner(**options)
+    else:
+        # Importado aqui: scanner_daemon depende deste módulo
+        from scanner_daemon import DEFAULT_SOCKET, RemoteScanner
+        scanner = RemoteScanner(args.daemon or DEFAULT_SOCKET, **options)
+    
+    # Resultados são gravados à medida que as sondas terminam
+    writer = None
+    if args.output:
+        metadata = {'target': args.target, 'protocols': ','.join(protocols), 'ports': len(ports),
+                    'hosts': plan.hosts if targets is None else len(targets), 'started_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        try:
+            writer = open_writer(args.output, args.format, metadata)
+        except (OSError, ValueError) as e:
+            print(f"[-] Erro ao abrir arquivo de saída: {e}")
+            sys.exit(1)
     
     start_time = time.time()
-    results = scanner.scan_range(targets, ports, protocols)
+    try:
+        with profiler.phase('scan'):
+            callback = writer.write if writer else None
+            if targets is None:
+                results = scanner.scan_target(args.target, ports, protocols, result_callback=callback,
+                                              exclude=exclude)
+            else:
+                results = scanner.scan_range(targets, ports, protocols, result_callback=callback)
+    finally:
+        if writer:
+            with profiler.phase('save_results'):
+                writer.close()
     end_time = time.time()
+    if writer:
+        print(f"[+] Resultados salvos em: {args.output} ({writer.count} linhas, {writer.format})")
     
     # Exibe resultados
-    scanner.display_results()
+    with profiler.phase('display_results'):
+        scanner.display_results(show_all=args.all)
     
-    print(f"\n[+] Varredura concluída em {end_time - start_time:.2f} segundos")
+    if scanner.stop_reason == 'interrupted':
+        print(f"\n[!] Varredura interrompida pelo usuário após {end_time - start_time:.2f} segundos")
+    else:
+        print(f"\n[+] Varredura concluída em {end_time - start_time:.2f} segundos")
     
-    # Salva resultados se solicitado
-    if args.output:
-        scanner.save_results(args.output)
+    if args.verbose and scanner.controller:
+        print("[+] Evolução da concorrência (tempo: janela):")
+        for elapsed, window in scanner.controller.history:
+            print(f"    {elapsed:8.2f}s: {window}")
+    
+    if profiler.enabled:
+        profiler.report()
+        profiler.stop()
+    
+    if args.metrics:
+        dump_metrics(args.metrics)
+    
+    if tracer:
+        try:
+            tracer.write(args.trace)
+            print(f"[+] Trace salvo em: {args.trace} ({len(tracer.events)} eventos)")
+        except OSError as e:
+            print(f"[-] Erro ao salvar trace: {e}")
 
 
 if __name__ == "__main__":
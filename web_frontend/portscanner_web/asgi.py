@@ -9,3 +9,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portscanner_web.settings')
 
 application = get_asgi_application()
+
+# Só o processo servidor retoma jobs órfãos (não migrate, shell, testes...)
+from scanner.scanner_executor import enable_watchdog  # noqa: E402
+
+enable_watchdog()
@@ -23,10 +23,11 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    # Antes de staticfiles: o runserver do scanner (com watchdog) tem precedência
+    'scanner',
     'django.contrib.staticfiles',
     'rest_framework',
     'corsheaders',
-    'scanner',
 ]
 
 MIDDLEWARE = [
@@ -121,3 +122,44 @@ REST_FRAMEWORK = {
 
 # Caminho para o scanner original
 SCANNER_MODULE_PATH = os.path.join(os.path.dirname(BASE_DIR), 'port_scanner.py')
+
+# Rastreamento opcional das varreduras (Chrome trace / Perfetto JSON)
+# Defina SCANNER_TRACE_DIR para gravar um arquivo scan_<job_id>.json por job
+SCANNER_TRACE_DIR = os.environ.get('SCANNER_TRACE_DIR')
+SCANNER_TRACE_SAMPLE_RATE = float(os.environ.get('SCANNER_TRACE_SAMPLE_RATE', '0.01'))
+
+# Limites da estimativa de custo (/api/scans/estimate/): acima deles a
+# resposta inclui avisos
+SCANNER_ESTIMATE_LIMITS = {
+    'max_probes': int(os.environ.get('SCANNER_MAX_PROBES', '10000000')),
+    'max_duration': int(os.environ.get('SCANNER_MAX_DURATION', str(4 * 3600))),
+}
+
+# Perfil de memória por fase (tracemalloc); o resumo fica em ScanHistory.memory_profile.
+# Tem custo alto de CPU/memória: use apenas para diagnóstico
+SCANNER_PROFILE_MEMORY = os.environ.get('SCANNER_PROFILE_MEMORY', '').lower() in ('1', 'true', 'yes')
+
+# Memória (MB) dos resultados de cada job antes de despejá-los em segmentos
+# temporários no disco; 0 desativa o limite
+SCANNER_RESULT_MEMORY_MB = float(os.environ.get('SCANNER_RESULT_MEMORY_MB', '256'))
+
+# Socket do daemon de varredura (scanner_daemon.py); quando definido, os jobs
+# são executados no daemon, que mantém pools e cache de DNS aquecidos
+SCANNER_DAEMON_SOCKET = os.environ.get('SCANNER_DAEMON_SOCKET')
+
+# Exclusões aplicadas a todos os jobs (faixas que nunca devem ser sondadas),
+# somadas às do campo exclude de cada job
+SCANNER_EXCLUDE_FILE = os.environ.get('SCANNER_EXCLUDE_FILE')
+
+# Heartbeat dos jobs em execução e watchdog que retoma jobs órfãos (processo
+# reiniciado ou morto). Seguro com vários workers: a posse é tomada por
+# UPDATE condicional no banco. O watchdog só roda nos processos servidores
+# (wsgi.py, asgi.py e runserver); SCANNER_WATCHDOG=0 o desativa neles
+SCANNER_HEARTBEAT_SECONDS = float(os.environ.get('SCANNER_HEARTBEAT_SECONDS', '10'))
+SCANNER_STALE_AFTER_SECONDS = float(os.environ.get('SCANNER_STALE_AFTER_SECONDS', '60'))
+SCANNER_WATCHDOG_INTERVAL = float(os.environ.get('SCANNER_WATCHDOG_INTERVAL', '30'))
+SCANNER_WATCHDOG = os.environ.get('SCANNER_WATCHDOG', '1').lower() in ('1', 'true', 'yes')
+# Tentativas por job antes de marcá-lo como falho
+SCANNER_MAX_ATTEMPTS = int(os.environ.get('SCANNER_MAX_ATTEMPTS', '3'))
+# Acima deste número de resultados gravados, o job é refeito do início em vez de retomado
+SCANNER_RESUME_LIMIT = int(os.environ.get('SCANNER_RESUME_LIMIT', '1000000'))
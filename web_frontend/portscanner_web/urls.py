@@ -3,9 +3,11 @@ URL Configuration for portscanner_web project.
 """
 from django.contrib import admin
 from django.urls import path, include
+from scanner import views as scanner_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', scanner_views.metrics, name='metrics'),
     path('api/', include('scanner.urls')),
     path('', include('scanner.urls_web')),
 ]
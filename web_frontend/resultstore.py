@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Armazenamento dos resultados com despejo em disco
+
+ResultStore se comporta como a lista de resultados (append, len,
+iteração), mas ao ultrapassar o limite de memória ordena o buffer por
+status e (host, porta) e o grava em um segmento temporário. Ordenação,
+agrupamento por status e as "primeiras N" portas fechadas/filtradas são
+calculados por merge externo (heapq.merge) sobre os segmentos, lendo
+apenas o necessário de cada um.
+"""
+
+import heapq
+import itertools
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Limite padrão do buffer em memória
+DEFAULT_MEMORY_LIMIT_MB = 256
+
+# Memória aproximada de um ScanResult no buffer (objeto, dict e float)
+RESULT_BYTES = 200
+
+
+def result_key(result):
+    """Ordem de exibição: host, porta e protocolo"""
+    return result.host, result.port, result.protocol
+
+
+class _Segment:
+    """Arquivo com os resultados despejados, agrupados por status e ordenados"""
+
+    __slots__ = ('path', 'groups')
+
+    def __init__(self, path: str, results: List):
+        self.path = path
+        # status -> (offset, quantidade)
+        self.groups: Dict[str, tuple] = {}
+        results.sort(key=lambda r: (r.status,) + result_key(r))
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            for status, group in itertools.groupby(results, key=lambda r: r.status):
+                offset = f.tell()
+                lines = [f"{r.host}\t{r.port}\t{r.protocol}\t{r.status}\t"
+                         f"{'' if r.response_time is None else repr(r.response_time)}\n" for r in group]
+                f.write(''.join(lines))
+                self.groups[status] = (offset, len(lines))
+
+    def read(self, status: str, result_type) -> Iterator:
+        offset, count = self.groups.get(status, (0, 0))
+        if not count:
+            return
+        with open(self.path, 'r', encoding='utf-8', newline='\n') as f:
+            f.seek(offset)
+            for line in itertools.islice(f, count):
+                host, port, protocol, status, response_time = line.rstrip('\n').split('\t')
+                yield result_type(host, int(port), protocol, status,
+                                  float(response_time) if response_time else None)
+
+
+class ResultStore:
+    """
+    Resultados da varredura com limite de memória
+
+    memory_limit_mb=None desativa o despejo (tudo em memória). Os segmentos
+    ficam em um diretório temporário removido por close() ou quando o
+    store é coletado.
+    """
+
+    def __init__(self, memory_limit_mb: Optional[float] = DEFAULT_MEMORY_LIMIT_MB,
+                 directory: Optional[str] = None, result_type=None):
+        self.memory_limit_mb = memory_limit_mb
+        self.max_buffered = (max(1, int(memory_limit_mb * 2**20 / RESULT_BYTES))
+                             if memory_limit_mb else None)
+        self.directory = directory
+        self.result_type = result_type
+        self.buffer: List = []
+        self.segments: List[_Segment] = []
+        self.counts: Dict[str, int] = {}
+        self.total = 0
+        self._tempdir = None
+        self._finalizer = None
+
+    def append(self, result) -> None:
+        if self.result_type is None:
+            self.result_type = type(result)
+        self.buffer.append(result)
+        self.counts[result.status] = self.counts.get(result.status, 0) + 1
+        self.total += 1
+        if self.max_buffered and len(self.buffer) >= self.max_buffered:
+            self.spill()
+
+    def extend(self, results: Iterable) -> None:
+        for result in results:
+            self.append(result)
+
+    def spill(self) -> None:
+        """Grava o buffer em um novo segmento e o esvazia"""
+        if not self.buffer:
+            return
+        if self._tempdir is None:
+            self._tempdir = tempfile.mkdtemp(prefix='scan_results_', dir=self.directory)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._tempdir, True)
+        path = os.path.join(self._tempdir, f"segment_{len(self.segments):05d}.tsv")
+        self.segments.append(_Segment(path, self.buffer))
+        self.buffer = []
+
+    @property
+    def spilled(self) -> int:
+        """Resultados gravados em disco"""
+        return self.total - len(self.buffer)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __bool__(self) -> bool:
+        return self.total > 0
+
+    def __getitem__(self, index):
+        """Acesso por posição, na ordem de __iter__ (compatível com a lista antiga)"""
+        if not self.segments:
+            return self.buffer[index]
+        if isinstance(index, int) and index >= 0:
+            for result in itertools.islice(self, index, None):
+                return result
+            raise IndexError('índice fora do intervalo')
+        return list(self)[index]
+
+    def __iter__(self) -> Iterator:
+        """Todos os resultados, sem ordem definida (segmentos e depois o buffer)"""
+        for segment in self.segments:
+            for status in segment.groups:
+                yield from segment.read(status, self.result_type)
+        yield from list(self.buffer)
+
+    def _streams(self, status: Optional[str]) -> List[Iterator]:
+        statuses = [status] if status else list(self.counts)
+        return [segment.read(name, self.result_type) for segment in self.segments for name in statuses]
+
+    def sorted(self, status: Optional[str] = None) -> Iterator:
+        """Resultados ordenados por (host, porta), opcionalmente de um status"""
+        buffered = sorted((r for r in self.buffer if status is None or r.status == status), key=result_key)
+        return heapq.merge(*self._streams(status), buffered, key=result_key)
+
+    def first(self, status: str, limit: int) -> List:
+        """As primeiras `limit` portas de um status na ordem (host, porta)"""
+        buffered = heapq.nsmallest(limit, (r for r in self.buffer if r.status == status), key=result_key)
+        return list(itertools.islice(heapq.merge(*self._streams(status), buffered, key=result_key), limit))
+
+    def close(self) -> None:
+        """Descarta os resultados e remove os segmentos do disco"""
+        self.buffer = []
+        self.segments = []
+        self.counts = {}
+        self.total = 0
+        if self._finalizer:
+            self._finalizer()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Formato binário compacto para resultados de varredura (.pscan)
+
+Layout do arquivo (inteiros little-endian):
+
+  cabeçalho    magic, versão, tamanhos e offsets das seções
+  metadados    JSON do job (target, protocolos, contagem por status...)
+  registros    blocos de RECORD_SIZE bytes, agrupados por host
+  índice       uma entrada de INDEX_SIZE bytes por host, ordenada pelo
+               endereço empacotado: IP, primeiro registro e quantidade
+  nomes        hostnames que não são IP
+
+Cada registro guarda o número do host no índice, porta, protocolo, status
+e o tempo de resposta em microssegundos. O writer grava os registros na
+ordem de chegada em um arquivo temporário e, ao fechar, distribui cada um
+na posição do seu host (counting sort), usando memória proporcional ao
+número de hosts. O leitor mapeia o arquivo com mmap: busca por host é uma
+busca binária no índice e o filtro por status percorre o bloco de
+registros com struct.iter_unpack, sem copiar o arquivo.
+
+Exemplos:
+  python scanfile.py info resultados.pscan
+  python scanfile.py query resultados.pscan --host 10.0.0.5 --status open
+  python scanfile.py to-csv resultados.pscan resultados.csv
+  python scanfile.py from-csv resultados.csv resultados.pscan
+"""
+
+import argparse
+import bisect
+import csv
+import ipaddress
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+MAGIC = b'PSCN'
+VERSION = 1
+
+# magic, versão, tamanho do registro, tamanho da entrada do índice,
+# tamanho dos metadados, registros, hosts, offsets de registros/índice/nomes
+HEADER = struct.Struct('<4sHHHxxIQIxxxxQQQ')
+
+# host, porta, protocolo, status, tempo de resposta (µs)
+RECORD = struct.Struct('<IHBBI')
+RECORD_SIZE = RECORD.size
+
+# endereço (IPv4 mapeado em IPv6), primeiro registro, quantidade,
+# offset e tamanho do nome, família (4, 6 ou 0 para hostname)
+INDEX = struct.Struct('<16sQIIHBx')
+INDEX_SIZE = INDEX.size
+
+PROTOCOLS = ('TCP', 'UDP')
+STATUSES = ('open', 'closed', 'filtered', 'open|filtered')
+PROTOCOL_CODES = {name: code for code, name in enumerate(PROTOCOLS)}
+STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+
+# Tempo de resposta ausente
+NO_RESPONSE_TIME = 0xFFFFFFFF
+
+# Registros acumulados antes de cada escrita / lidos por vez ao reordenar
+BATCH_RECORDS = 65536
+
+_IPV4_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+
+class Record(NamedTuple):
+    """Resultado lido do arquivo (mesmos campos de ScanResult)"""
+    host: str
+    port: int
+    protocol: str
+    status: str
+    response_time: Optional[float] = None
+
+
+def pack_host(host: str):
+    """Chave de ordenação do host: (endereço de 16 bytes, nome, família)"""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return bytes(16), host, 0
+    if address.version == 4:
+        return _IPV4_PREFIX + address.packed, '', 4
+    return address.packed, '', 6
+
+
+def _unpack_host(packed: bytes, family: int, name: str) -> str:
+    if family == 4:
+        return str(ipaddress.IPv4Address(packed[12:]))
+    if family == 6:
+        return str(ipaddress.IPv6Address(packed))
+    return name
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class BinaryWriter:
+    """
+    Writer em streaming do formato .pscan (mesma interface dos writers de
+    texto: write, write_many, close e count)
+    """
+
+    format = 'pscan'
+
+    def __init__(self, filename: str, metadata: Optional[Dict] = None):
+        self.filename = filename
+        self.metadata = metadata or {}
+        self.part = filename + '.part'
+        self.stream = open(self.part, 'wb')
+        self.buffer = bytearray()
+        self.hosts: Dict[str, int] = {}
+        self.host_counts: List[int] = []
+        self.status_counts = [0] * len(STATUSES)
+        self.count = 0
+        self.closed = False
+
+    def write(self, result) -> None:
+        host_id = self.hosts.get(result.host)
+        if host_id is None:
+            host_id = self.hosts[result.host] = len(self.host_counts)
+            self.host_counts.append(0)
+        self.host_counts[host_id] += 1
+        status = STATUS_CODES[result.status]
+        self.status_counts[status] += 1
+        if result.response_time is None:
+            response_time = NO_RESPONSE_TIME
+        else:
+            response_time = min(int(result.response_time * 1000), NO_RESPONSE_TIME - 1)
+        self.buffer += RECORD.pack(host_id, result.port, PROTOCOL_CODES[result.protocol.upper()],
+                                   status, response_time)
+        self.count += 1
+        if len(self.buffer) >= BATCH_RECORDS * RECORD_SIZE:
+            self.stream.write(self.buffer)
+            self.buffer = bytearray()
+
+    def write_many(self, results) -> None:
+        for result in results:
+            self.write(result)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.stream.write(self.buffer)
+            self.buffer = bytearray()
+            self.stream.close()
+            self._finalize()
+        finally:
+            self.stream.close()
+            if os.path.exists(self.part):
+                os.remove(self.part)
+
+    def _finalize(self) -> None:
+        """Monta o arquivo final com os registros agrupados por host"""
+        keys = sorted((pack_host(host) + (host_id,) for host, host_id in self.hosts.items()))
+        position = [0] * len(keys)
+        names = bytearray()
+        index = bytearray()
+        first = 0
+        for number, (packed, name, family, host_id) in enumerate(keys):
+            encoded = name.encode('utf-8')
+            index += INDEX.pack(packed, first, self.host_counts[host_id], len(names), len(encoded), family)
+            names += encoded
+            position[host_id] = (number, first)
+            first += self.host_counts[host_id]
+
+        metadata = dict(self.metadata)
+        metadata['counts'] = {status: count for status, count in zip(STATUSES, self.status_counts) if count}
+        encoded_metadata = json.dumps(metadata).encode('utf-8')
+        records_offset = _align(HEADER.size + len(encoded_metadata))
+        index_offset = records_offset + self.count * RECORD_SIZE
+        names_offset = index_offset + len(index)
+        size = names_offset + len(names)
+
+        with open(self.filename, 'w+b') as f:
+            f.truncate(size)
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, INDEX_SIZE, len(encoded_metadata),
+                                self.count, len(keys), records_offset, index_offset, names_offset))
+            f.write(encoded_metadata)
+            f.seek(index_offset)
+            f.write(index)
+            f.write(names)
+            f.flush()
+            if not self.count:
+                return
+            # Counting sort: cada registro vai para o próximo slot do seu host
+            cursor = [0] * len(keys)
+            for host_id, (number, start) in enumerate(position):
+                cursor[host_id] = records_offset + start * RECORD_SIZE
+            with mmap.mmap(f.fileno(), size) as view, open(self.part, 'rb') as part:
+                while True:
+                    chunk = part.read(BATCH_RECORDS * RECORD_SIZE)
+                    if not chunk:
+                        break
+                    for host_id, port, protocol, status, response_time in RECORD.iter_unpack(chunk):
+                        RECORD.pack_into(view, cursor[host_id], position[host_id][0], port,
+                                         protocol, status, response_time)
+                        cursor[host_id] += RECORD_SIZE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ScanFile:
+    """
+    Leitor do formato .pscan via mmap
+
+    len(), iteração, hosts(), host(nome), filter(status) e counts. Os
+    registros são decodificados sob demanda, direto das páginas mapeadas.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # arquivo vazio
+            self._file.close()
+            raise ValueError(f"{filename}: arquivo .pscan inválido")
+        (magic, version, record_size, index_size, metadata_size, self.record_count, self.host_count,
+         self.records_offset, self.index_offset, self.names_offset) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or record_size != RECORD_SIZE or index_size != INDEX_SIZE:
+            self.close()
+            raise ValueError(f"{filename}: arquivo .pscan inválido")
+        if version > VERSION:
+            self.close()
+            raise ValueError(f"{filename}: versão {version} não suportada")
+        self.metadata = json.loads(self._map[HEADER.size:HEADER.size + metadata_size])
+        self.counts = self.metadata.get('counts', {})
+        self._hosts = [self._index_entry(number) for number in range(self.host_count)]
+        self._keys = [(entry[0], entry[4]) for entry in self._hosts]
+
+    def _index_entry(self, number: int):
+        packed, first, count, name_offset, name_size, family = INDEX.unpack_from(
+            self._map, self.index_offset + number * INDEX_SIZE)
+        start = self.names_offset + name_offset
+        name = self._map[start:start + name_size].decode('utf-8')
+        return packed, first, count, _unpack_host(packed, family, name), name
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def hosts(self) -> List[str]:
+        """Hosts na ordem do índice"""
+        return [entry[3] for entry in self._hosts]
+
+    def _records(self, first: int, count: int, status: Optional[int] = None) -> Iterator[Record]:
+        start = self.records_offset + first * RECORD_SIZE
+        view = memoryview(self._map)[start:start + count * RECORD_SIZE]
+        try:
+            for host, port, protocol, code, response_time in RECORD.iter_unpack(view):
+                if status is not None and code != status:
+                    continue
+                yield Record(self._hosts[host][3], port, PROTOCOLS[protocol], STATUSES[code],
+                             None if response_time == NO_RESPONSE_TIME else response_time / 1000)
+        finally:
+            view.release()
+
+    def __iter__(self) -> Iterator[Record]:
+        return self._records(0, self.record_count)
+
+    def host(self, host: str) -> List[Record]:
+        """Resultados de um host (busca binária no índice)"""
+        key = pack_host(host)[:2]
+        number = bisect.bisect_left(self._keys, key)
+        if number == len(self._keys) or self._keys[number] != key:
+            return []
+        _, first, count, _, _ = self._hosts[number]
+        return list(self._records(first, count))
+
+    def filter(self, status: str) -> Iterator[Record]:
+        """Percorre apenas os registros com o status informado"""
+        if status not in STATUS_CODES:
+            raise ValueError(f"status desconhecido: {status}")
+        if not self.counts.get(status):
+            return iter(())
+        return self._records(0, self.record_count, STATUS_CODES[status])
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def read_csv(filename: str) -> Iterator[Record]:
+    """Lê o CSV gravado pelo scanner (colunas Host,Port,Protocol,Status[,ResponseTime])"""
+    with open(filename, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            response_time = row.get('ResponseTime')
+            yield Record(row['Host'], int(row['Port']), row['Protocol'], row['Status'],
+                         float(response_time) if response_time else None)
+
+
+def main(argv=None):
+    from writers import open_writer
+
+    parser = argparse.ArgumentParser(description="Conversão e consulta de arquivos .pscan")
+    commands = parser.add_subparsers(dest='command', required=True)
+    info = commands.add_parser('info', help='Mostra metadados, contagens e hosts')
+    info.add_argument('file')
+    query = commands.add_parser('query', help='Lista resultados por host e/ou status')
+    query.add_argument('file')
+    query.add_argument('--host', help='Apenas este host')
+    query.add_argument('--status', choices=STATUSES, help='Apenas este status')
+    to_csv = commands.add_parser('to-csv', help='Converte .pscan para CSV (ou outro formato pela extensão)')
+    to_csv.add_argument('file')
+    to_csv.add_argument('output')
+    from_csv = commands.add_parser('from-csv', help='Converte um CSV do scanner para .pscan')
+    from_csv.add_argument('file')
+    from_csv.add_argument('output')
+    args = parser.parse_args(argv)
+
+    if args.command == 'from-csv':
+        with BinaryWriter(args.output, {'source': os.path.basename(args.file)}) as writer:
+            writer.write_many(read_csv(args.file))
+        print(f"[+] {writer.count} resultados convertidos para {args.output}")
+        return 0
+
+    with ScanFile(args.file) as scan:
+        if args.command == 'info':
+            print(f"[+] {args.file}: {len(scan)} resultados em {scan.host_count} host(s)")
+            for name, value in scan.metadata.items():
+                print(f"    {name}: {value}")
+        elif args.command == 'query':
+            if args.host:
+                records = (r for r in scan.host(args.host) if not args.status or r.status == args.status)
+            elif args.status:
+                records = scan.filter(args.status)
+            else:
+                records = iter(scan)
+            for record in records:
+                print(f"{record.host}:{record.port}/{record.protocol} {record.status.upper()}")
+        else:
+            with open_writer(args.output, metadata=scan.metadata) as writer:
+                writer.write_many(scan)
+            print(f"[+] {writer.count} resultados convertidos para {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
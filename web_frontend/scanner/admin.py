@@ -14,7 +14,11 @@ class ScanJobAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Configuração do Scan', {
-            'fields': ('target', 'ports', 'protocols', 'timeout', 'threads')
+            'fields': ('target', 'exclude', 'ports', 'protocols', 'timeout', 'threads', 'retries', 'auto_plan')
+        }),
+        ('Parada Antecipada', {
+            'fields': ('max_open_per_host', 'max_open', 'time_budget'),
+            'classes': ('collapse',)
         }),
         ('Status', {
             'fields': ('status', 'error_message')
@@ -61,6 +65,6 @@ class ScanHistoryAdmin(admin.ModelAdmin):
             'fields': ('open_ports', 'closed_ports', 'filtered_ports')
         }),
         ('Resumo', {
-            'fields': ('summary',)
+            'fields': ('summary', 'memory_profile')
         })
     )
@@ -0,0 +1,310 @@
+"""
+Management command para teste de carga da API de varreduras
+
+Sobe o servidor de testes do Django (LiveServerThread) sobre um banco
+SQLite descartável, troca o PortScanner por um backend falso (sem rede) e
+simula N operadores que criam jobs, consultam status_detail e paginam os
+resultados. Ao final reporta percentis de latência por endpoint, esperas
+de lock no banco e contagem de threads.
+
+Exemplo:
+  python manage.py loadtest_api --operators 20 --jobs-per-operator 3
+"""
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.testcases import LiveServerThread, _StaticFilesHandler
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+# Adiciona o diretório pai ao path para importar o port_scanner
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
+
+from port_scanner import LatencyHistogram, ScanResult as PortScanResult
+from scanner import scanner_executor
+
+# Statements de escrita cuja duração acima deste limite conta como espera de lock
+LOCK_WAIT_THRESHOLD_MS = 50
+
+
+class FakePortScanner:
+    """Backend de varredura sem rede: gera resultados sintéticos com atraso"""
+
+    probe_delay = 0.001
+
+    def __init__(self, timeout=3, max_threads=50, **kwargs):
+        self.timeout = timeout
+        self.max_threads = max_threads
+        self.stop_reason = None
+        self.results = []
+
+    def scan_host_port(self, host, port, protocol, attempt=0):
+        time.sleep(self.probe_delay)
+        status = 'open' if port % 10 == 0 else 'closed'
+        result = PortScanResult(host, port, protocol, status, self.probe_delay * 1000)
+        self.results.append(result)
+        return result
+
+    def scan_range(self, hosts, ports, protocols=None, progress_callback=None,
+                   result_callback=None, skip=None):
+        protocols = protocols or ['TCP']
+        total = len(hosts) * len(ports) * len(protocols)
+        scanned = 0
+        for host in hosts:
+            for port in ports:
+                for protocol in protocols:
+                    if skip and (host, port, protocol) in skip:
+                        continue
+                    result = self.scan_host_port(host, port, protocol)
+                    if result_callback:
+                        result_callback(result)
+                    scanned += 1
+                    if progress_callback:
+                        progress_callback(scanned, total)
+        return self.results
+
+
+class DatabaseMonitor:
+    """Mede statements de escrita e erros de lock em todas as conexões"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.write_ms = LatencyHistogram()
+        self.lock_waits = 0
+        self.lock_errors = 0
+
+    def install(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        is_write = sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE')
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except Exception as e:
+            if 'locked' in str(e):
+                with self.lock:
+                    self.lock_errors += 1
+            raise
+        finally:
+            if is_write:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with self.lock:
+                    self.write_ms.add(elapsed_ms)
+                    if elapsed_ms >= LOCK_WAIT_THRESHOLD_MS:
+                        self.lock_waits += 1
+
+
+class ThreadSampler(threading.Thread):
+    """Amostra o número de threads do processo e de varreduras ativas"""
+
+    def __init__(self, interval=0.1):
+        super().__init__(name='loadtest-sampler', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.peak_threads = 0
+        self.peak_running_scans = 0
+        self.samples = []
+
+    def run(self):
+        while not self.stopped.is_set():
+            threads = threading.active_count()
+            running = len(scanner_executor.running_scans)
+            self.samples.append(threads)
+            self.peak_threads = max(self.peak_threads, threads)
+            self.peak_running_scans = max(self.peak_running_scans, running)
+            self.stopped.wait(self.interval)
+
+
+class Operator(threading.Thread):
+    """Usuário simulado: cria jobs, acompanha o status e pagina resultados"""
+
+    def __init__(self, index, base_url, options, latencies, errors, lock):
+        super().__init__(name=f'operator-{index}', daemon=True)
+        self.index = index
+        self.base_url = base_url
+        self.options = options
+        self.latencies = latencies
+        self.errors = errors
+        self.lock = lock
+        self.random = random.Random(index)
+
+    def request(self, endpoint, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data,
+                                     headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                body = json.loads(response.read() or b'null')
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            with self.lock:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            if self.options['verbosity'] > 1:
+                print(f"[!] {self.name} {endpoint}: {e}")
+            return None
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.latencies.setdefault(endpoint, LatencyHistogram()).add(elapsed_ms)
+        return body
+
+    def run(self):
+        for job_number in range(self.options['jobs_per_operator']):
+            network = f"10.{self.index % 256}.{job_number % 256}.0/{self.options['prefix']}"
+            created = self.request('create', '/api/scans/', {
+                'target': network,
+                'ports': f"1-{self.options['ports']}",
+                'tcp': True,
+                'timeout': 1,
+                'threads': 50,
+            })
+            if not created or 'job_id' not in created:
+                continue
+            job_id = created['job_id']
+
+            deadline = time.time() + self.options['job_timeout']
+            while time.time() < deadline:
+                detail = self.request('status_detail', f'/api/scans/{job_id}/status_detail/')
+                if detail and detail.get('status') in ('completed', 'failed', 'cancelled'):
+                    break
+                time.sleep(self.options['poll_interval'] * (0.5 + self.random.random()))
+
+            url = f'/api/scans/{job_id}/results/?page_size={self.options["page_size"]}'
+            while url:
+                page = self.request('results', url)
+                if not page or not page.get('next'):
+                    break
+                url = page['next'].replace(self.base_url, '')
+
+
+class Command(BaseCommand):
+    help = 'Teste de carga da API com servidor de testes e backend de varredura falso'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operators', type=int, default=10, help='Operadores simultâneos')
+        parser.add_argument('--jobs-per-operator', type=int, default=2, help='Jobs criados por operador')
+        parser.add_argument('--prefix', type=int, default=28, help='Prefixo CIDR de cada job (padrão: /28)')
+        parser.add_argument('--ports', type=int, default=100, help='Portas por host (padrão: 1-100)')
+        parser.add_argument('--probe-delay', type=float, default=0.001,
+                            help='Duração simulada de cada sonda em segundos')
+        parser.add_argument('--poll-interval', type=float, default=0.5, help='Intervalo médio de polling')
+        parser.add_argument('--page-size', type=int, default=50, help='Tamanho da página de resultados')
+        parser.add_argument('--job-timeout', type=float, default=120, help='Tempo máximo por job')
+        parser.add_argument('--output', type=str, help='Grava o relatório em JSON')
+
+    def handle(self, *args, **options):
+        FakePortScanner.probe_delay = options['probe_delay']
+        monitor = DatabaseMonitor()
+        sampler = ThreadSampler()
+        server = LiveServerThread('localhost', _StaticFilesHandler)
+        server.daemon = True
+
+        # Banco SQLite em arquivo: compartilhado entre threads com lock real
+        db_file = tempfile.NamedTemporaryFile(prefix='loadtest_', suffix='.sqlite3', delete=False).name
+        settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = db_file
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        connection_created.connect(monitor.install)
+
+        try:
+            with mock.patch.object(scanner_executor, 'PortScanner', FakePortScanner):
+                server.start()
+                server.is_ready.wait()
+                if server.error:
+                    raise server.error
+                base_url = f'http://{server.host}:{server.port}'
+                self.stdout.write(f"[+] Servidor de testes em {base_url}")
+
+                report = self._run(base_url, options, monitor, sampler)
+        finally:
+            connection_created.disconnect(monitor.install)
+            if server.is_alive():
+                server.terminate()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if os.path.exists(db_file):
+                os.remove(db_file)
+
+        self._print_report(report)
+        if options.get('output'):
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"[+] Relatório salvo em: {options['output']}")
+
+    def _run(self, base_url, options, monitor, sampler):
+        latencies = {}
+        errors = {}
+        lock = threading.Lock()
+        operators = [Operator(i, base_url, options, latencies, errors, lock)
+                     for i in range(options['operators'])]
+
+        self.stdout.write(f"[+] {len(operators)} operadores x {options['jobs_per_operator']} jobs")
+        sampler.start()
+        start = time.perf_counter()
+        for operator in operators:
+            operator.start()
+        for operator in operators:
+            operator.join()
+
+        # Aguarda as varreduras ainda em andamento gravarem seus resultados
+        for entry in list(scanner_executor.running_scans.values()):
+            entry['thread'].join(timeout=options['job_timeout'])
+        elapsed = time.perf_counter() - start
+        sampler.stopped.set()
+        sampler.join()
+
+        requests_total = sum(histogram.count for histogram in latencies.values())
+        return {
+            'operators': options['operators'],
+            'jobs_per_operator': options['jobs_per_operator'],
+            'elapsed_s': elapsed,
+            'requests': requests_total,
+            'requests_per_s': requests_total / elapsed if elapsed else 0.0,
+            'latency_ms': {endpoint: histogram.stats() for endpoint, histogram in sorted(latencies.items())},
+            'errors': errors,
+            'database': {
+                'write_ms': monitor.write_ms.stats(),
+                'lock_waits': monitor.lock_waits,
+                'lock_wait_threshold_ms': LOCK_WAIT_THRESHOLD_MS,
+                'lock_errors': monitor.lock_errors,
+                'sqlite_version': sqlite3.sqlite_version,
+            },
+            'threads': {
+                'peak': sampler.peak_threads,
+                'peak_running_scans': sampler.peak_running_scans,
+                'final': threading.active_count(),
+            },
+        }
+
+    def _print_report(self, report):
+        self.stdout.write("\n" + "=" * 60)
+        self.stdout.write("RELATÓRIO DO TESTE DE CARGA")
+        self.stdout.write("=" * 60)
+        self.stdout.write(f"Requisições: {report['requests']} em {report['elapsed_s']:.1f}s "
+                          f"({report['requests_per_s']:.1f} req/s)")
+        for endpoint, stats in report['latency_ms'].items():
+            self.stdout.write(f"  {endpoint:<14} n={stats['count']:<6} p50 {stats['p50_ms']:.1f}ms | "
+                              f"p90 {stats['p90_ms']:.1f}ms | p99 {stats['p99_ms']:.1f}ms | max {stats['max_ms']:.1f}ms")
+        if report['errors']:
+            self.stdout.write(f"Erros: {report['errors']}")
+        db = report['database']
+        self.stdout.write(f"Banco: escritas p99 {db['write_ms'].get('p99_ms', 0):.1f}ms | "
+                          f"esperas >= {db['lock_wait_threshold_ms']}ms: {db['lock_waits']} | "
+                          f"'database is locked': {db['lock_errors']}")
+        threads = report['threads']
+        self.stdout.write(f"Threads: pico {threads['peak']} | varreduras simultâneas {threads['peak_running_scans']}")
+
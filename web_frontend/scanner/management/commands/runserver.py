@@ -0,0 +1,16 @@
+"""
+runserver com o watchdog de jobs órfãos
+
+Igual ao runserver do staticfiles, mas inicia o watchdog no processo que
+serve as requisições (o filho do autoreloader), nunca no processo pai.
+"""
+from django.contrib.staticfiles.management.commands.runserver import Command as StaticfilesRunserverCommand
+
+from scanner.scanner_executor import enable_watchdog
+
+
+class Command(StaticfilesRunserverCommand):
+
+    def inner_run(self, *args, **options):
+        enable_watchdog()
+        super().inner_run(*args, **options)
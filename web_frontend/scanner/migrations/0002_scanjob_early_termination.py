@@ -0,0 +1,28 @@
+# Generated by Django 4.2.24 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanjob',
+            name='max_open_per_host',
+            field=models.IntegerField(blank=True, help_text='Para de sondar o host após N portas abertas', null=True),
+        ),
+        migrations.AddField(
+            model_name='scanjob',
+            name='max_open',
+            field=models.IntegerField(blank=True, help_text='Encerra a varredura após N portas abertas', null=True),
+        ),
+        migrations.AddField(
+            model_name='scanjob',
+            name='time_budget',
+            field=models.IntegerField(blank=True, help_text='Tempo máximo de varredura em segundos', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0002_scanjob_early_termination'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanjob',
+            name='retries',
+            field=models.IntegerField(default=0, help_text='Retransmissões para sondas sem resposta'),
+        ),
+    ]
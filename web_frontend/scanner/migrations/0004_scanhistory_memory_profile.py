@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0003_scanjob_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanhistory',
+            name='memory_profile',
+            field=models.JSONField(blank=True, help_text='Pico de memória e maiores alocadores por fase (tracemalloc)', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0004_scanhistory_memory_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanjob',
+            name='auto_plan',
+            field=models.BooleanField(default=False, help_text='Pré-varredura por amostragem ajusta descoberta, timeout, threads e ordem das portas'),
+        ),
+    ]
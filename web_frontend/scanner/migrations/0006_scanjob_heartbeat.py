@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0005_scanjob_auto_plan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanjob',
+            name='attempts',
+            field=models.IntegerField(default=0, help_text='Execuções iniciadas (inclui retomadas)'),
+        ),
+        migrations.AddField(
+            model_name='scanjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Último heartbeat do executor', null=True),
+        ),
+        migrations.AddField(
+            model_name='scanjob',
+            name='worker_id',
+            field=models.CharField(blank=True, help_text='Processo (host:pid) executando o job', max_length=100),
+        ),
+    ]
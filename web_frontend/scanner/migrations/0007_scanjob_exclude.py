@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0006_scanjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanjob',
+            name='exclude',
+            field=models.TextField(blank=True, help_text='IPs, CIDRs ou faixas (a-b) que nunca serão sondados'),
+        ),
+    ]
@@ -16,11 +16,19 @@ class ScanJob(models.Model):
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     target = models.TextField(help_text="IP, CIDR ou hostname")
+    exclude = models.TextField(blank=True, help_text="IPs, CIDRs ou faixas (a-b) que nunca serão sondados")
     ports = models.TextField(help_text="Lista de portas ou ranges")
     protocols = models.CharField(max_length=10, default='TCP', help_text="TCP, UDP ou ambos")
     timeout = models.IntegerField(default=3, help_text="Timeout em segundos")
     threads = models.IntegerField(default=50, help_text="Número de threads")
     
+    max_open_per_host = models.IntegerField(null=True, blank=True, help_text="Para de sondar o host após N portas abertas")
+    max_open = models.IntegerField(null=True, blank=True, help_text="Encerra a varredura após N portas abertas")
+    time_budget = models.IntegerField(null=True, blank=True, help_text="Tempo máximo de varredura em segundos")
+    retries = models.IntegerField(default=0, help_text="Retransmissões para sondas sem resposta")
+    auto_plan = models.BooleanField(default=False,
+                                    help_text="Pré-varredura por amostragem ajusta descoberta, timeout, threads e ordem das portas")
+    
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(default=timezone.now)
     started_at = models.DateTimeField(null=True, blank=True)
@@ -32,6 +40,12 @@ class ScanJob(models.Model):
     
     error_message = models.TextField(blank=True, help_text="Mensagem de erro se falhar")
     
+    # Posse do job: o executor renova heartbeat_at periodicamente; jobs
+    # 'running' sem heartbeat recente são retomados pelo watchdog
+    worker_id = models.CharField(max_length=100, blank=True, help_text="Processo (host:pid) executando o job")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Último heartbeat do executor")
+    attempts = models.IntegerField(default=0, help_text="Execuções iniciadas (inclui retomadas)")
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Job de Varredura'
@@ -75,6 +89,8 @@ class ScanHistory(models.Model):
     
     job = models.OneToOneField(ScanJob, on_delete=models.CASCADE)
     summary = models.JSONField(help_text="Resumo da varredura em JSON")
+    memory_profile = models.JSONField(null=True, blank=True,
+                                      help_text="Pico de memória e maiores alocadores por fase (tracemalloc)")
     execution_time = models.FloatField(help_text="Tempo total de execução em segundos")
     
     open_ports = models.IntegerField(default=0)
@@ -1,32 +1,46 @@
 import sys
 import os
+import socket
 import threading
 import time
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Count, Q
 from django.utils import timezone
 
 # Adiciona o diretório pai ao path para importar o port_scanner
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from metrics import REGISTRY
+from tracing import Tracer, NULL_TRACER
+from memprofile import MemoryProfiler, NULL_PROFILER
+from planner import presample, choose_plan, discover_hosts
+from exclusions import ExclusionList
+
 try:
-    from port_scanner import PortScanner, expand_cidr, expand_port_range, get_common_ports
+    from port_scanner import PortScanner, ScanAggregator, expand_cidr, expand_port_range, get_common_ports
+    from port_db import order_by_frequency
+    from scanner_daemon import RemoteScanner
 except ImportError:
     # Fallback se não conseguir importar
     print("Aviso: Não foi possível importar port_scanner. Usando implementação mock.")
     
     class PortScanner:
-        def __init__(self, timeout=3, max_threads=50):
+        def __init__(self, timeout=3, max_threads=50, **kwargs):
             self.timeout = timeout
             self.max_threads = max_threads
+            self.stop_reason = None
             self.results = []
         
-        def scan_range(self, hosts, ports, protocols):
+        def scan_range(self, hosts, ports, protocols, progress_callback=None,
+                       result_callback=None, skip=None):
             # Mock implementation para desenvolvimento
             time.sleep(2)
             return []
     
-    def expand_cidr(cidr):
+    def expand_cidr(cidr, exclude=None):
         return [cidr]
     
     def expand_port_range(ports):
@@ -34,109 +48,297 @@ except ImportError:
     
     def get_common_ports():
         return {'tcp_common': [80, 443, 22]}
+    
+    def order_by_frequency(ports, protocols=('tcp',)):
+        return sorted(set(ports))
+    
+    class ScanAggregator:
+        def __init__(self):
+            self.total = 0
+            self.counts = {}
+            self.open_ports = {}
+        
+        @classmethod
+        def from_results(cls, results):
+            aggregator = cls()
+            for result in results:
+                aggregator.total += 1
+                aggregator.counts[result.status] = aggregator.counts.get(result.status, 0) + 1
+                if result.status == 'open':
+                    aggregator.open_ports.setdefault(result.host, set()).add((result.port, result.protocol))
+            return aggregator
+        
+        @property
+        def hosts_with_open(self):
+            return len(self.open_ports)
+        
+        def latency_summary(self):
+            return {}
+        
+        def to_dict(self, latency=True):
+            return {'total': self.total, 'by_status': dict(self.counts), 'hosts_with_open': self.hosts_with_open}
+    
+    RemoteScanner = None
 
 from .models import ScanJob, ScanResult, ScanHistory
 
+# Métricas do backend Django (exportadas em /metrics junto com as do scanner)
+JOBS_RUNNING = REGISTRY.gauge('portscanner_jobs_running', 'Jobs de varredura em execução neste processo')
+JOBS_FINISHED = REGISTRY.counter('portscanner_jobs_finished_total', 'Jobs finalizados por status')
+JOB_PROGRESS = REGISTRY.gauge('portscanner_job_progress_ratio', 'Progresso (0-1) de cada job em execução')
+DB_WRITE_SECONDS = REGISTRY.histogram('portscanner_db_write_seconds', 'Latência das escritas no banco por operação')
+JOBS_RECOVERED = REGISTRY.counter('portscanner_jobs_recovered_total', 'Jobs órfãos retomados ou descartados pelo watchdog')
+
+# Identifica este processo como dono dos jobs que executa
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobHeartbeat(threading.Thread):
+    """Renova periodicamente a posse do job e grava os resultados pendentes"""
+    
+    def __init__(self, executor, interval):
+        super().__init__(name=f"heartbeat-{executor.job_id}", daemon=True)
+        self.executor = executor
+        self.interval = interval
+        self.finished = threading.Event()
+    
+    def run(self):
+        try:
+            while not self.finished.wait(self.interval):
+                try:
+                    self.executor.beat()
+                except DatabaseError as e:
+                    print(f"Erro no heartbeat do job {self.executor.job_id}: {e}")
+        finally:
+            connection.close()
+    
+    def stop(self):
+        self.finished.set()
+        self.join()
+
 
 class ScanExecutor:
     """Classe responsável por executar varreduras de porta"""
     
-    def __init__(self, job_id):
+    def __init__(self, job_id, profile_memory=None):
         self.job_id = job_id
         self.job = None
         self.should_stop = False
+        # Outro worker assumiu o job (heartbeat perdido): não grava o desfecho
+        self.lost = False
+        self.scanner = None
+        self.heartbeat = None
+        # Resultados ainda não gravados, enviados ao banco a cada heartbeat
+        self.pending_results = []
+        self.results_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.tracer = self._create_tracer()
+        if profile_memory is None:
+            profile_memory = getattr(settings, 'SCANNER_PROFILE_MEMORY', False)
+        self.profiler = MemoryProfiler() if profile_memory else NULL_PROFILER
+        self.history = None
+        self.auto_plan = None
+        self.exclusions = None
+        # Resumo da varredura em andamento (status_detail lê daqui)
+        self.aggregator = None
+        # Contagens gravadas antes da retomada, somadas ao resumo em andamento
+        self.resumed_summary = None
+        
+    def _create_tracer(self):
+        """Ativa o rastreamento quando SCANNER_TRACE_DIR está configurado"""
+        if getattr(settings, 'SCANNER_TRACE_DIR', None):
+            return Tracer(sample_rate=getattr(settings, 'SCANNER_TRACE_SAMPLE_RATE', 0.01))
+        return NULL_TRACER
+    
+    def _trace_file(self):
+        return os.path.join(settings.SCANNER_TRACE_DIR, f"scan_{self.job_id}.json")
         
     def execute(self):
         """Executa a varredura"""
+        try:
+            with self.tracer.span('execute', job_id=str(self.job_id)):
+                self.profiler.start()
+                try:
+                    self._execute()
+                finally:
+                    self._store_memory_profile()
+        finally:
+            if self.tracer.enabled:
+                try:
+                    os.makedirs(settings.SCANNER_TRACE_DIR, exist_ok=True)
+                    self.tracer.write(self._trace_file())
+                except OSError as e:
+                    print(f"Erro ao gravar trace: {e}")
+    
+    def _execute(self):
+        """Fases da varredura: parâmetros, scan, resultados e histórico"""
+        JOBS_RUNNING.inc()
         try:
             self.job = ScanJob.objects.get(id=self.job_id)
+            # Job 'running' aqui foi assumido pelo watchdog: retoma a execução
+            resuming = self.job.status == 'running'
             self.job.status = 'running'
-            self.job.started_at = timezone.now()
+            if not resuming:
+                self.job.started_at = timezone.now()
+            self.job.worker_id = WORKER_ID
+            self.job.heartbeat_at = timezone.now()
+            self.job.attempts += 1
             self.job.save()
+            self.heartbeat = JobHeartbeat(self, getattr(settings, 'SCANNER_HEARTBEAT_SECONDS', 10))
+            self.heartbeat.start()
             
-            # Processa parâmetros
-            targets = self._process_targets()
+            # Processa parâmetros; arquivo de exclusão ilegível faz o job falhar
+            self.exclusions = load_exclusions(self.job.exclude)
+            with self.tracer.span('expand_targets'), self.profiler.phase('expand_targets'):
+                targets = self._process_targets()
             ports = self._process_ports()
             protocols = self._process_protocols()
+            timeout, threads = self.job.timeout, self.job.threads
+            
+            if self.job.auto_plan:
+                with self.tracer.span('auto_plan'), self.profiler.phase('auto_plan'):
+                    targets, ports, timeout, threads = self._plan_scan(targets, ports, protocols)
             
             # Calcula total de verificações
             total_checks = len(targets) * len(ports) * len(protocols)
             self.job.total_ports = total_checks
-            self.job.save()
+            self.job.save(update_fields=['total_ports'])
+            skip = self._completed_probes() if resuming else None
+            resumed = len(skip) if skip else 0
+            if resumed:
+                self.resumed_summary = self._resumed_summary()
             
             # Executa varredura
-            scanner = PortScanner(
-                timeout=self.job.timeout,
-                max_threads=self.job.threads
+            options = dict(
+                timeout=timeout,
+                max_threads=threads,
+                max_open_per_host=self.job.max_open_per_host,
+                max_open=self.job.max_open,
+                time_budget=self.job.time_budget,
+                retries=self.job.retries,
+                tracer=self.tracer,
+                memory_limit_mb=getattr(settings, 'SCANNER_RESULT_MEMORY_MB', 256) or None,
+                exclude=self.exclusions or None,
             )
+            daemon_socket = getattr(settings, 'SCANNER_DAEMON_SOCKET', None)
+            if daemon_socket and RemoteScanner:
+                # Sondas executadas no daemon, com pools e cache de DNS aquecidos
+                scanner = RemoteScanner(daemon_socket, **options)
+            else:
+                scanner = PortScanner(**options)
             
-            # Hook para progresso
-            original_scan_host_port = scanner.scan_host_port
-            scanned_count = [0]  # Use list para closure
-            
-            def scan_with_progress(*args, **kwargs):
-                if self.should_stop:
-                    return
-                
-                result = original_scan_host_port(*args, **kwargs)
-                scanned_count[0] += 1
-                
-                # Atualiza progresso a cada 10 scans
-                if scanned_count[0] % 10 == 0 or scanned_count[0] >= total_checks:
-                    progress = min(100, int((scanned_count[0] / total_checks) * 100))
-                    ScanJob.objects.filter(id=self.job_id).update(
-                        progress=progress,
-                        scanned_ports=scanned_count[0]
-                    )
-                
-                return result
+            # stop() cancela o scanner; cobre também um stop anterior à criação
+            self.scanner = scanner
+            if self.should_stop:
+                self._cancel_scanner()
             
-            scanner.scan_host_port = scan_with_progress
+            def update_progress(scanned, total):
+                # Atualiza progresso a cada 10 sondas finalizadas
+                scanned += resumed
+                JOB_PROGRESS.set(scanned / total_checks, job_id=self.job_id)
+                if scanned % 10 == 0 or scanned >= total_checks:
+                    progress = min(100, int((scanned / total_checks) * 100))
+                    write_start = time.perf_counter()
+                    with self.tracer.span('progress_update', 'db', scanned=scanned):
+                        ScanJob.objects.filter(id=self.job_id).update(
+                            progress=progress,
+                            scanned_ports=scanned
+                        )
+                    DB_WRITE_SECONDS.observe(time.perf_counter() - write_start, operation='progress')
             
             # Executa varredura
+            self.aggregator = getattr(scanner, 'aggregator', None)
             start_time = time.time()
-            results = scanner.scan_range(targets, ports, protocols)
+            try:
+                with self.profiler.phase('scan'):
+                    results = scanner.scan_range(targets, ports, protocols,
+                                                 progress_callback=update_progress,
+                                                 result_callback=self._queue_result, skip=skip)
+            finally:
+                self._stop_heartbeat()
             execution_time = time.time() - start_time
+            # Backends sem agregador (ex: loadtest) são resumidos em uma passada
+            self.aggregator = getattr(scanner, 'aggregator', None) or ScanAggregator.from_results(results)
             
-            if not self.should_stop:
-                # Salva resultados
-                self._save_results(results)
-                
-                # Cria histórico
-                self._create_history(results, execution_time)
-                
-                # Atualiza job
+            # Grava o restante dos resultados (job cancelado: os parciais também)
+            with self.tracer.span('save_results', results=len(results)), \
+                    self.profiler.phase('save_results'):
+                self._flush_results()
+            if self.lost:
+                print(f"Job {self.job_id} assumido por outro worker; execução local descartada")
+                return
+            if resumed:
+                # O resumo inclui os resultados gravados pelas execuções anteriores
+                for previous in self._previous_results(skip):
+                    self.aggregator.add(previous)
+            
+            # Cria histórico
+            with self.tracer.span('create_history'), self.profiler.phase('create_history'):
+                self.history = self._create_history(self.aggregator, len(targets), execution_time,
+                                                    scanner.stop_reason)
+            
+            # Atualiza job; status final gravado por outro processo (ex: failed) é mantido
+            if self.should_stop:
+                self.job.status = 'cancelled'
+            else:
                 self.job.status = 'completed'
-                self.job.completed_at = timezone.now()
                 self.job.progress = 100
-                self.job.save()
+            self.job.completed_at = timezone.now()
+            ScanJob.objects.filter(id=self.job_id, status__in=('running', 'cancelled')).update(
+                status=self.job.status, progress=self.job.progress, completed_at=self.job.completed_at)
+            
+            # Remove os segmentos despejados em disco, se houver
+            if hasattr(results, 'close'):
+                results.close()
             
         except Exception as e:
-            # Em caso de erro
+            # Em caso de erro (o heartbeat para antes de gravar o status)
+            self._stop_heartbeat()
             if self.job:
                 self.job.status = 'failed'
                 self.job.error_message = str(e)
                 self.job.completed_at = timezone.now()
                 self.job.save()
             print(f"Erro na varredura: {e}")
+        finally:
+            self._stop_heartbeat()
+            JOBS_RUNNING.dec()
+            JOB_PROGRESS.remove(job_id=self.job_id)
+            running_scans.pop(self.job_id, None)
+            if self.job:
+                JOBS_FINISHED.inc(status=self.job.status)
+    
+    def _plan_scan(self, targets, ports, protocols):
+        """Pré-varredura por amostragem e, se indicada, descoberta de hosts"""
+        sample = presample(PortScanner(timeout=self.job.timeout, max_threads=self.job.threads),
+                           self.job.target, ports, protocols, exclude=self.exclusions)
+        self.auto_plan = choose_plan(sample, self.job.timeout, self.job.threads, ports)
+        plan = self.auto_plan
+        if plan.discovery:
+            targets = discover_hosts(PortScanner(timeout=plan.timeout, max_threads=plan.threads),
+                                     targets, plan.discovery_ports)
+        return targets, plan.ports, plan.timeout, plan.threads
     
     def _process_targets(self):
-        """Processa string de targets"""
-        return expand_cidr(self.job.target)
+        """Processa string de targets, sem as faixas excluídas"""
+        return expand_cidr(self.job.target, self.exclusions)
     
     def _process_ports(self):
         """Processa string de portas"""
         ports_str = self.job.ports.strip()
+        common = get_common_ports()
         
         if ports_str.lower() == 'common':
-            common = get_common_ports()
-            return common.get('tcp_common', [80, 443])
+            ports = common.get('tcp_common', [80, 443])
         elif ports_str.lower() == 'top100':
-            return list(range(1, 101))
+            ports = common.get('tcp_top100', list(range(1, 101)))
         elif ports_str.lower() == 'top1000':
-            return list(range(1, 1001))
+            ports = common.get('tcp_top1000', list(range(1, 1001)))
         else:
-            return expand_port_range(ports_str)
+            ports = expand_port_range(ports_str)
+        
+        # Portas mais prováveis primeiro
+        return order_by_frequency(ports, [p.lower() for p in self._process_protocols()])
     
     def _process_protocols(self):
         """Processa protocolos"""
@@ -147,6 +349,58 @@ class ScanExecutor:
             protocols.append('UDP')
         return protocols or ['TCP']
     
+    def _completed_probes(self):
+        """Sondas já gravadas por uma execução anterior do job, para não repeti-las"""
+        saved = ScanResult.objects.filter(job=self.job)
+        count = saved.count()
+        if not count or count > getattr(settings, 'SCANNER_RESUME_LIMIT', 1000000):
+            # Sem checkpoint (ou grande demais para manter em memória): recomeça
+            return None
+        print(f"Retomando job {self.job_id}: {count} resultado(s) já gravado(s)")
+        return set(saved.values_list('host', 'port', 'protocol'))
+    
+    def _resumed_summary(self):
+        """Contagens por status e hosts com portas abertas já gravados (agregados no banco)"""
+        saved = ScanResult.objects.filter(job=self.job).order_by()
+        by_status = dict(saved.values_list('status').annotate(count=Count('id')))
+        open_hosts = set(saved.filter(status='open').values_list('host', flat=True).distinct())
+        return {'total': sum(by_status.values()), 'by_status': by_status, 'open_hosts': open_hosts}
+    
+    def _previous_results(self, skip):
+        """Resultados gravados antes da retomada, no formato do scanner"""
+        saved = ScanResult.objects.filter(job=self.job).only(
+            'host', 'port', 'protocol', 'status', 'response_time')
+        for row in saved.iterator():
+            if (row.host, row.port, row.protocol) in skip:
+                yield row
+    
+    def _queue_result(self, result):
+        """Callback do scanner: o resultado é gravado no próximo heartbeat"""
+        with self.results_lock:
+            self.pending_results.append(result)
+    
+    def _flush_results(self):
+        """Grava os resultados pendentes (checkpoint para uma eventual retomada)"""
+        with self.flush_lock:
+            with self.results_lock:
+                results, self.pending_results = self.pending_results, []
+            if results and not self.lost:
+                self._save_results(results)
+    
+    def beat(self):
+        """Grava o checkpoint e renova o heartbeat; detecta cancelamento ou perda do job"""
+        self._flush_results()
+        owned = ScanJob.objects.filter(id=self.job_id, status='running', worker_id=WORKER_ID)
+        if owned.update(heartbeat_at=timezone.now()):
+            return
+        status = ScanJob.objects.filter(id=self.job_id).values_list('status', flat=True).first()
+        if status in (None, 'running', 'pending'):
+            # Job removido ou assumido por outro worker: descarta o que ainda não foi gravado
+            self.lost = True
+        # Cancelado/encerrado por outro processo ou perdido: interrompe a varredura
+        self.should_stop = True
+        self._cancel_scanner()
+    
     def _save_results(self, results):
         """Salva resultados no banco"""
         batch_size = 100
@@ -159,29 +413,28 @@ class ScanExecutor:
                 port=result.port,
                 protocol=result.protocol,
                 status=result.status,
+                response_time=getattr(result, 'response_time', None),
             ))
             
             # Salva em batches para performance
             if len(scan_results) >= batch_size:
-                ScanResult.objects.bulk_create(scan_results, ignore_conflicts=True)
+                self._bulk_create(scan_results)
                 scan_results = []
         
         # Salva batch final
         if scan_results:
+            self._bulk_create(scan_results)
+    
+    def _bulk_create(self, scan_results):
+        """Grava um batch de resultados medindo a latência da escrita"""
+        write_start = time.perf_counter()
+        with self.tracer.span('bulk_create', 'db', rows=len(scan_results)):
             ScanResult.objects.bulk_create(scan_results, ignore_conflicts=True)
+        DB_WRITE_SECONDS.observe(time.perf_counter() - write_start, operation='bulk_create')
     
-    def _create_history(self, results, execution_time):
-        """Cria registro de histórico"""
-        # Conta resultados por status
-        status_counts = {}
-        hosts_with_open_ports = set()
-        
-        for result in results:
-            status = result.status
-            status_counts[status] = status_counts.get(status, 0) + 1
-            
-            if status == 'open':
-                hosts_with_open_ports.add(result.host)
+    def _create_history(self, aggregator, hosts_scanned, execution_time, stop_reason=None):
+        """Cria registro de histórico a partir do resumo da varredura"""
+        status_counts = dict(aggregator.counts)
         
         # Cria resumo
         summary = {
@@ -191,30 +444,73 @@ class ScanExecutor:
             'execution_settings': {
                 'timeout': self.job.timeout,
                 'threads': self.job.threads,
+                'max_open_per_host': self.job.max_open_per_host,
+                'max_open': self.job.max_open,
+                'time_budget': self.job.time_budget,
+                'retries': self.job.retries,
             },
+            'stop_reason': stop_reason,
+            'plan': self.auto_plan.to_dict() if self.auto_plan else None,
             'results_by_status': status_counts,
+            'latency': aggregator.latency_summary(),
+            'trace_file': self._trace_file() if self.tracer.enabled else None,
             'execution_time': execution_time,
         }
         
         # Salva histórico
-        ScanHistory.objects.create(
+        return ScanHistory.objects.create(
             job=self.job,
             summary=summary,
             execution_time=execution_time,
             open_ports=status_counts.get('open', 0),
             closed_ports=status_counts.get('closed', 0),
             filtered_ports=status_counts.get('filtered', 0),
-            hosts_scanned=len(expand_cidr(self.job.target)),
-            hosts_active=len(hosts_with_open_ports),
+            hosts_scanned=hosts_scanned,
+            hosts_active=aggregator.hosts_with_open,
         )
     
+    def _store_memory_profile(self):
+        """Grava o perfil de memória das fases no histórico do job"""
+        if not self.profiler.enabled:
+            return
+        self.profiler.stop()
+        summary = self.profiler.summary()
+        print(f"Perfil de memória do job {self.job_id}: pico {summary['peak_mb']:.2f} MB")
+        if self.history:
+            self.history.memory_profile = summary
+            self.history.save(update_fields=['memory_profile'])
+    
+    def _stop_heartbeat(self):
+        heartbeat, self.heartbeat = self.heartbeat, None
+        if heartbeat is not None:
+            heartbeat.stop()
+    
+    def _cancel_scanner(self):
+        scanner = self.scanner
+        if scanner is not None and hasattr(scanner, 'cancel'):
+            scanner.cancel()
+    
     def stop(self):
-        """Para a varredura"""
+        """Para a varredura: sondas pendentes são descartadas e as em andamento abortadas"""
         self.should_stop = True
+        self._cancel_scanner()
         if self.job:
             self.job.status = 'cancelled'
             self.job.completed_at = timezone.now()
-            self.job.save()
+            self.job.save(update_fields=['status', 'completed_at'])
+
+
+class ExclusionConfigError(Exception):
+    """Lista de exclusão ilegível ou inválida (ex: SCANNER_EXCLUDE_FILE)"""
+
+
+def load_exclusions(job_exclude=''):
+    """Exclusões do job somadas às globais (SCANNER_EXCLUDE_FILE)"""
+    exclude_file = getattr(settings, 'SCANNER_EXCLUDE_FILE', None)
+    try:
+        return ExclusionList.load([job_exclude] if job_exclude else [], [exclude_file] if exclude_file else [])
+    except (OSError, ValueError) as e:
+        raise ExclusionConfigError(f"Lista de exclusão inválida: {e}") from e
 
 
 # Dicionário global para controlar threads de varredura
@@ -245,9 +541,126 @@ def stop_scan(job_id):
         running_scans[job_id]['executor'].stop()
         del running_scans[job_id]
         return True
-    return False
+    # Job executado por outro worker: ele percebe o cancelamento no próximo heartbeat
+    return bool(ScanJob.objects.filter(id=job_id, status='running').update(
+        status='cancelled', completed_at=timezone.now()))
+
+
+def _stale_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'SCANNER_STALE_AFTER_SECONDS', 60))
 
 
 def get_scan_status(job_id):
-    """Obtém status da varredura"""
-    return job_id in running_scans
+    """Obtém status da varredura (neste processo ou em outro worker com heartbeat recente)"""
+    if job_id in running_scans:
+        return True
+    return ScanJob.objects.filter(id=job_id, status='running',
+                                  heartbeat_at__gte=_stale_cutoff()).exists()
+
+
+def reconcile_jobs():
+    """
+    Retoma jobs órfãos: 'running' sem heartbeat recente (worker morto) ou
+    'pending' antigos que nenhum worker iniciou. O job é assumido com um
+    update condicional, então apenas um worker o retoma; após
+    SCANNER_MAX_ATTEMPTS execuções ele é marcado como 'failed'.
+    """
+    cutoff = _stale_cutoff()
+    max_attempts = getattr(settings, 'SCANNER_MAX_ATTEMPTS', 3)
+    stale = ScanJob.objects.filter(
+        Q(status='running') & (Q(heartbeat_at__lt=cutoff) |
+                               Q(heartbeat_at__isnull=True, started_at__lt=cutoff)) |
+        Q(status='pending', created_at__lt=cutoff))
+    recovered = []
+    for job in stale.only('id', 'status', 'heartbeat_at', 'attempts', 'worker_id'):
+        job_id = str(job.id)
+        if job_id in running_scans:
+            continue
+        if job.attempts >= max_attempts:
+            claimed = ScanJob.objects.filter(id=job.id, status=job.status, heartbeat_at=job.heartbeat_at).update(
+                status='failed', completed_at=timezone.now(),
+                error_message=f"Job abandonado após {job.attempts} tentativa(s) (último worker: {job.worker_id or '-'})")
+            if claimed:
+                JOBS_RECOVERED.inc(action='failed')
+            continue
+        # Renova o heartbeat ao assumir: outro watchdog não pega o mesmo job
+        claimed = ScanJob.objects.filter(id=job.id, status=job.status, heartbeat_at=job.heartbeat_at).update(
+            worker_id=WORKER_ID, heartbeat_at=timezone.now())
+        if claimed and start_scan(job_id):
+            JOBS_RECOVERED.inc(action='resumed')
+            recovered.append(job_id)
+    if recovered:
+        print(f"Watchdog: {len(recovered)} job(s) órfão(s) retomado(s): {recovered}")
+    return recovered
+
+
+class JobWatchdog(threading.Thread):
+    """Executa reconcile_jobs periodicamente, após um atraso inicial"""
+    
+    def __init__(self, interval, delay):
+        super().__init__(name='scan-watchdog', daemon=True)
+        self.interval = interval
+        self.delay = delay
+        self.finished = threading.Event()
+    
+    def run(self):
+        wait = self.delay
+        while not self.finished.wait(wait):
+            try:
+                close_old_connections()
+                reconcile_jobs()
+            except DatabaseError as e:
+                print(f"Watchdog: erro ao reconciliar jobs: {e}")
+            finally:
+                connection.close()
+            wait = self.interval
+    
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+def start_watchdog(interval=None, delay=5):
+    """Inicia o watchdog de jobs órfãos em uma thread daemon"""
+    watchdog = JobWatchdog(interval or getattr(settings, 'SCANNER_WATCHDOG_INTERVAL', 30), delay)
+    watchdog.start()
+    return watchdog
+
+
+_serving_watchdog = None
+_serving_lock = threading.Lock()
+
+
+def enable_watchdog():
+    """
+    Inicia o watchdog no processo que serve requisições, uma vez por processo.
+    Chamado apenas pelos pontos de entrada do servidor (wsgi.py, asgi.py e
+    runserver): migrate, shell, testes e scripts nunca retomam jobs.
+    Desative com SCANNER_WATCHDOG=0.
+    """
+    global _serving_watchdog
+    if not getattr(settings, 'SCANNER_WATCHDOG', True):
+        return None
+    with _serving_lock:
+        if _serving_watchdog is None:
+            _serving_watchdog = start_watchdog()
+        return _serving_watchdog
+
+
+def get_live_summary(job_id):
+    """Resumo incremental de uma varredura em execução neste processo (ou None)"""
+    entry = running_scans.get(job_id)
+    aggregator = entry['executor'].aggregator if entry else None
+    if aggregator is None:
+        return None
+    # Cópias atômicas: as threads da varredura continuam atualizando o agregador
+    total, by_status, open_hosts = aggregator.total, dict(aggregator.counts), aggregator.open_ports.copy()
+    # Job retomado: soma o que foi gravado antes, para as contagens não regredirem
+    resumed = entry['executor'].resumed_summary
+    if resumed:
+        total += resumed['total']
+        for status_name, count in resumed['by_status'].items():
+            by_status[status_name] = by_status.get(status_name, 0) + count
+        return {'total': total, 'by_status': by_status,
+                'hosts_with_open': len(resumed['open_hosts'].union(open_hosts))}
+    return {'total': total, 'by_status': by_status, 'hosts_with_open': len(open_hosts)}
@@ -1,5 +1,35 @@
 from rest_framework import serializers
 from .models import ScanJob, ScanResult, ScanHistory
+from exclusions import ExclusionList
+from planner import count_ports
+
+# Listas predefinidas aceitas no lugar de uma especificação de portas
+PORT_PRESETS = ('common', 'top100', 'top1000')
+
+
+def validate_port_spec(value):
+    """Valida a especificação de portas (ex: 22,80-90) ou o nome de uma lista predefinida"""
+    value = value.strip()
+    if value.lower() in PORT_PRESETS:
+        return value
+    try:
+        if not count_ports(value):
+            raise ValueError(value)
+        bounds = [int(port) for port in value.replace('-', ',').split(',') if port.strip()]
+    except ValueError:
+        raise serializers.ValidationError(f"Especificação de portas inválida: {value}")
+    if min(bounds) < 1 or max(bounds) > 65535:
+        raise serializers.ValidationError("Portas devem estar entre 1 e 65535")
+    return value
+
+
+def validate_exclude(value):
+    """Valida a lista de exclusão (IPs, CIDRs, faixas a-b ou hostnames)"""
+    try:
+        ExclusionList.load([value])
+    except ValueError as e:
+        raise serializers.ValidationError(str(e))
+    return value.strip()
 
 
 class ScanJobSerializer(serializers.ModelSerializer):
@@ -8,8 +38,8 @@ class ScanJobSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScanJob
         fields = [
-            'id', 'target', 'ports', 'protocols', 'timeout', 'threads',
-            'status', 'created_at', 'started_at', 'completed_at',
+            'id', 'target', 'exclude', 'ports', 'protocols', 'timeout', 'threads',
+            'max_open_per_host', 'max_open', 'time_budget', 'retries', 'auto_plan', 'status', 'created_at', 'started_at', 'completed_at',
             'progress', 'total_ports', 'scanned_ports', 'error_message'
         ]
         read_only_fields = [
@@ -23,11 +53,14 @@ class ScanJobSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Target não pode estar vazio")
         return value.strip()
 
+    def validate_exclude(self, value):
+        return validate_exclude(value)
+
     def validate_ports(self, value):
         """Valida o campo ports"""
         if not value or len(value.strip()) == 0:
             raise serializers.ValidationError("Portas não podem estar vazias")
-        return value.strip()
+        return validate_port_spec(value)
 
     def validate_timeout(self, value):
         """Valida timeout"""
@@ -35,6 +68,12 @@ class ScanJobSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Timeout deve ser entre 1 e 60 segundos")
         return value
 
+    def validate_retries(self, value):
+        """Valida número de retransmissões"""
+        if value < 0 or value > 10:
+            raise serializers.ValidationError("Retransmissões devem ser entre 0 e 10")
+        return value
+
     def validate_threads(self, value):
         """Valida número de threads"""
         if value < 1 or value > 500:
@@ -61,7 +100,7 @@ class ScanHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = ScanHistory
         fields = [
-            'id', 'job', 'summary', 'execution_time',
+            'id', 'job', 'summary', 'memory_profile', 'execution_time',
             'open_ports', 'closed_ports', 'filtered_ports',
             'hosts_scanned', 'hosts_active'
         ]
@@ -71,7 +110,8 @@ class ScanJobCreateSerializer(serializers.Serializer):
     """Serializer simplificado para criar jobs"""
     
     target = serializers.CharField(max_length=500)
-    ports = serializers.CharField(max_length=500, required=False, default="80,443")
+    exclude = serializers.CharField(required=False, allow_blank=True, default='', validators=[validate_exclude])
+    ports = serializers.CharField(max_length=500, required=False, default="80,443", validators=[validate_port_spec])
     use_common_ports = serializers.BooleanField(default=False)
     use_top100 = serializers.BooleanField(default=False)
     use_top1000 = serializers.BooleanField(default=False)
@@ -81,6 +121,13 @@ class ScanJobCreateSerializer(serializers.Serializer):
     
     timeout = serializers.IntegerField(default=3, min_value=1, max_value=60)
     threads = serializers.IntegerField(default=50, min_value=1, max_value=500)
+    retries = serializers.IntegerField(default=0, min_value=0, max_value=10)
+    auto_plan = serializers.BooleanField(default=False)
+    
+    # Parada antecipada (opcional)
+    max_open_per_host = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    max_open = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    time_budget = serializers.IntegerField(required=False, allow_null=True, min_value=1)
     
     def validate(self, data):
         """Validação geral"""
@@ -0,0 +1,227 @@
+"""
+Testes do backend Django do scanner (execute com: python manage.py test scanner)
+"""
+import io
+import json
+import threading
+import urllib.error
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import scanner_executor
+from .management.commands import loadtest_api, runserver
+from .management.commands.loadtest_api import FakePortScanner
+from .models import ScanHistory, ScanJob, ScanResult
+from .scanner_executor import WORKER_ID, ScanExecutor
+
+
+@override_settings(SCANNER_HEARTBEAT_SECONDS=0.05, SCANNER_STALE_AFTER_SECONDS=60,
+                   SCANNER_MAX_ATTEMPTS=3, SCANNER_DAEMON_SOCKET=None, SCANNER_EXCLUDE_FILE=None)
+class JobRecoveryTests(TransactionTestCase):
+    """Heartbeat, perda de posse, retomada e watchdog dos jobs"""
+
+    def _job(self, **fields):
+        fields.setdefault('target', '10.0.0.1')
+        fields.setdefault('ports', '1-20')
+        return ScanJob.objects.create(**fields)
+
+    def _heartbeat_alive(self, job):
+        return any(t.name == f"heartbeat-{job.id}" and t.is_alive() for t in threading.enumerate())
+
+    def test_heartbeat_stops_when_setup_fails(self):
+        """Erro antes da varredura marca o job como falho e encerra o heartbeat"""
+        job = self._job()
+        with override_settings(SCANNER_EXCLUDE_FILE='/nonexistent/exclude.txt'):
+            ScanExecutor(str(job.id)).execute()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertFalse(self._heartbeat_alive(job))
+
+    def test_beat_checkpoints_and_detects_takeover(self):
+        """beat() grava os resultados pendentes; job de outro worker é perdido, job encerrado só para"""
+        job = self._job(status='running', worker_id=WORKER_ID, heartbeat_at=timezone.now() - timedelta(minutes=1))
+        executor = ScanExecutor(str(job.id))
+        executor.job = job
+        executor._queue_result(FakePortScanner().scan_host_port('10.0.0.1', 10, 'TCP'))
+        executor.beat()
+        job.refresh_from_db()
+        self.assertEqual(ScanResult.objects.filter(job=job).count(), 1)
+        self.assertGreater(job.heartbeat_at, timezone.now() - timedelta(seconds=5))
+        self.assertFalse(executor.should_stop)
+
+        ScanJob.objects.filter(id=job.id).update(worker_id='other:1')
+        executor.beat()
+        self.assertTrue(executor.lost)
+        self.assertTrue(executor.should_stop)
+
+        failed = ScanExecutor(str(job.id))
+        ScanJob.objects.filter(id=job.id).update(status='failed')
+        failed.beat()
+        self.assertTrue(failed.should_stop)
+        self.assertFalse(failed.lost)
+
+    def test_reconcile_claims_stale_jobs(self):
+        """Jobs sem heartbeat são retomados uma vez; tentativas esgotadas viram 'failed'"""
+        old = timezone.now() - timedelta(minutes=5)
+        stale = self._job(status='running', heartbeat_at=old, attempts=1, worker_id='dead:1')
+        exhausted = self._job(status='running', heartbeat_at=old, attempts=3)
+        fresh = self._job(status='running', heartbeat_at=timezone.now(), attempts=1, worker_id='alive:1')
+
+        with mock.patch.object(scanner_executor, 'start_scan', return_value=True) as start:
+            self.assertEqual(scanner_executor.reconcile_jobs(), [str(stale.id)])
+            # Já assumido (heartbeat renovado): uma segunda passada não o retoma
+            self.assertEqual(scanner_executor.reconcile_jobs(), [])
+        start.assert_called_once_with(str(stale.id))
+
+        stale.refresh_from_db()
+        exhausted.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.worker_id, WORKER_ID)
+        self.assertEqual(exhausted.status, 'failed')
+        self.assertIn('3 tentativa', exhausted.error_message)
+        self.assertEqual((fresh.status, fresh.worker_id), ('running', 'alive:1'))
+
+    def test_resume_skips_saved_probes(self):
+        """Job retomado não repete as sondas gravadas e o histórico soma as duas execuções"""
+        old = timezone.now() - timedelta(minutes=5)
+        job = self._job(status='running', started_at=old, heartbeat_at=old, attempts=1)
+        ScanResult.objects.bulk_create([ScanResult(job=job, host='10.0.0.1', port=port, protocol='TCP',
+                                                   status='closed') for port in range(1, 6)])
+        scanners = []
+
+        def fake_scanner(**options):
+            scanners.append(FakePortScanner(**options))
+            return scanners[-1]
+
+        executor = ScanExecutor(str(job.id))
+        with mock.patch.object(scanner_executor, 'PortScanner', side_effect=fake_scanner):
+            executor.execute()
+
+        job.refresh_from_db()
+        self.assertEqual(executor.resumed_summary['by_status'], {'closed': 5})
+        self.assertEqual((job.status, job.attempts, job.progress), ('completed', 2, 100))
+        self.assertEqual(job.started_at, old)
+        self.assertEqual(len(scanners[0].results), 15)
+        self.assertEqual(ScanResult.objects.filter(job=job).count(), 20)
+        self.assertEqual(sum(ScanHistory.objects.get(job=job).summary['results_by_status'].values()), 20)
+
+    def test_live_summary_includes_results_saved_before_resume(self):
+        """Durante a retomada, o resumo ao vivo soma os resultados gravados antes da queda"""
+        job = self._job(status='running')
+        ScanResult.objects.bulk_create([
+            ScanResult(job=job, host='10.0.0.1', port=port, protocol='TCP', status='open' if port == 1 else 'closed')
+            for port in range(1, 4)])
+        executor = ScanExecutor(str(job.id))
+        executor.job = job
+        executor.resumed_summary = executor._resumed_summary()
+        executor.aggregator = scanner_executor.ScanAggregator.from_results(
+            [FakePortScanner().scan_host_port(host, 10, 'TCP') for host in ('10.0.0.1', '10.0.0.2')])
+
+        with mock.patch.dict(scanner_executor.running_scans, {str(job.id): {'executor': executor}}):
+            summary = scanner_executor.get_live_summary(str(job.id))
+        self.assertEqual(summary, {'total': 5, 'by_status': {'open': 3, 'closed': 2}, 'hosts_with_open': 2})
+
+    def test_watchdog_runs_reconcile_until_stopped(self):
+        """O watchdog chama reconcile_jobs periodicamente e para com stop()"""
+        calls = threading.Semaphore(0)
+        with mock.patch.object(scanner_executor, 'reconcile_jobs', side_effect=calls.release):
+            watchdog = scanner_executor.start_watchdog(interval=0.01, delay=0)
+            try:
+                for _ in range(3):
+                    self.assertTrue(calls.acquire(timeout=2))
+            finally:
+                watchdog.stop()
+        self.assertFalse(watchdog.is_alive())
+
+    def test_watchdog_only_in_server_entrypoints(self):
+        """Carregar o Django (testes, migrate, shell) não inicia o watchdog; runserver e wsgi.py sim"""
+        self.assertFalse(any(t.name == 'scan-watchdog' for t in threading.enumerate()))
+
+        with mock.patch.object(scanner_executor, 'start_watchdog') as start, \
+                mock.patch.object(scanner_executor, '_serving_watchdog', None):
+            with override_settings(SCANNER_WATCHDOG=False):
+                self.assertIsNone(scanner_executor.enable_watchdog())
+            scanner_executor.enable_watchdog()
+            scanner_executor.enable_watchdog()
+            start.assert_called_once_with()
+
+            with mock.patch.object(runserver.StaticfilesRunserverCommand, 'inner_run') as inner_run:
+                runserver.Command().inner_run(use_reloader=False)
+            inner_run.assert_called_once()
+            start.assert_called_once_with()
+
+
+class ScanApiValidationTests(TestCase):
+    """Erros de entrada da API viram 400 com mensagem, nunca 500"""
+
+    def test_malformed_port_spec(self):
+        for ports in ('abc', '80-', '1-2-3', '0-10', '70000'):
+            for url in ('/api/scans/', '/api/scans/estimate/'):
+                response = self.client.post(url, {'target': '127.0.0.1', 'ports': ports},
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 400, (url, ports))
+                self.assertIn('ports', response.json())
+        self.assertFalse(ScanJob.objects.exists())
+
+        response = self.client.post('/api/scans/estimate/', {'target': '10.0.0.0/24', 'ports': '22,80-89'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['probes'], 254 * 11)
+
+    @override_settings(SCANNER_EXCLUDE_FILE='/nonexistent/exclude.txt')
+    def test_unreadable_exclude_file(self):
+        """SCANNER_EXCLUDE_FILE ilegível vira erro JSON (503), sem criar o job"""
+        for url in ('/api/scans/', '/api/scans/estimate/'):
+            response = self.client.post(url, {'target': '127.0.0.1', 'ports': '80'},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 503, url)
+            self.assertIn('exclusão', response.json()['error'])
+        self.assertFalse(ScanJob.objects.exists())
+
+
+class LoadtestCommandTests(TestCase):
+    """Argumentos e relatório do loadtest_api contra um cliente HTTP falso"""
+
+    def _urlopen(self, request, timeout=None):
+        """Responde como a API: job criado, concluído no primeiro poll e uma página de resultados"""
+        path = request.full_url.split('8000', 1)[1]
+        if path.startswith('/api/scans/') and path.endswith('/results/?page_size=5'):
+            if 'job-1' in path:
+                raise urllib.error.URLError('recusada')
+            body = {'next': None, 'results': []}
+        elif path.endswith('/status_detail/'):
+            body = {'status': 'completed'}
+        else:
+            body = {'job_id': f"job-{json.loads(request.data)['target'].split('.')[1]}"}
+        return mock.MagicMock(**{'__enter__.return_value.read.return_value': json.dumps(body).encode()})
+
+    def test_arguments_and_summary(self):
+        """Opções do parser alimentam _run; contagens, erros e percentis por endpoint"""
+        command = loadtest_api.Command(stdout=io.StringIO())
+        options = vars(command.create_parser('manage.py', 'loadtest_api').parse_args(
+            ['--operators', '3', '--jobs-per-operator', '2', '--page-size', '5', '--poll-interval', '0']))
+        self.assertEqual((options['operators'], options['jobs_per_operator'], options['prefix']), (3, 2, 28))
+        self.assertEqual(options['job_timeout'], 120)
+
+        with mock.patch.object(loadtest_api.urllib.request, 'urlopen', side_effect=self._urlopen):
+            report = command._run('http://localhost:8000', options, loadtest_api.DatabaseMonitor(),
+                                  loadtest_api.ThreadSampler(interval=0.01))
+
+        # 3 operadores x 2 jobs x (create + status_detail + results)
+        self.assertEqual(report['requests'], 18)
+        self.assertEqual(set(report['latency_ms']), {'create', 'status_detail', 'results'})
+        self.assertEqual(report['errors'], {'results': 2})
+        for stats in report['latency_ms'].values():
+            self.assertEqual(stats['count'], 6)
+            self.assertLessEqual(stats['min_ms'], stats['p50_ms'])
+            self.assertLessEqual(stats['p50_ms'], stats['p90_ms'])
+            self.assertLessEqual(stats['p90_ms'], stats['p99_ms'])
+            self.assertLessEqual(stats['p99_ms'], stats['max_ms'])
+
+        command._print_report(report)
+        output = command.stdout.getvalue()
+        self.assertIn('Requisições: 18', output)
+        self.assertIn("Erros: {'results': 2}", output)
@@ -2,6 +2,7 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -15,7 +16,60 @@ from .serializers import (
     ScanJobSerializer, ScanResultSerializer, ScanHistorySerializer,
     ScanJobCreateSerializer, ScanStatusSerializer
 )
-from .scanner_executor import start_scan, stop_scan, get_scan_status
+from .scanner_executor import (
+    start_scan, stop_scan, get_scan_status, get_live_summary, get_common_ports,
+    load_exclusions, ExclusionConfigError
+)
+from metrics import REGISTRY, CONTENT_TYPE
+from planner import ScanStats, count_ports, count_targets, estimate
+
+
+# Quantidade de varreduras recentes usadas como base estatística da estimativa
+ESTIMATE_HISTORY_SIZE = 50
+
+
+def _ports_spec(data):
+    """Especificação de portas do job a partir dos dados validados"""
+    if data.get('use_common_ports'):
+        return 'common'
+    if data.get('use_top100'):
+        return 'top100'
+    if data.get('use_top1000'):
+        return 'top1000'
+    return data.get('ports', '80,443')
+
+
+def _protocols(data):
+    """Lista de protocolos selecionados"""
+    protocols = []
+    if data.get('tcp'):
+        protocols.append('TCP')
+    if data.get('udp'):
+        protocols.append('UDP')
+    return protocols
+
+
+def estimate_scan(data):
+    """Estima o custo do job usando o histórico recente como modelo de rede"""
+    common = get_common_ports()
+    presets = {
+        'common': len(common.get('tcp_common', [])),
+        'top100': len(common.get('tcp_top100', [])),
+        'top1000': len(common.get('tcp_top1000', [])),
+    }
+    summaries = ScanHistory.objects.order_by('-id').values_list(
+        'summary', flat=True)[:ESTIMATE_HISTORY_SIZE]
+    return estimate(
+        count_targets(data['target'], load_exclusions(data.get('exclude', ''))),
+        count_ports(_ports_spec(data), presets),
+        _protocols(data),
+        timeout=data.get('timeout', 3),
+        threads=data.get('threads', 50),
+        stats=ScanStats.from_summaries(summaries),
+        retries=data.get('retries', 0),
+        time_budget=data.get('time_budget'),
+        limits=getattr(settings, 'SCANNER_ESTIMATE_LIMITS', None),
+    )
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -44,39 +98,37 @@ class ScanJobViewSet(viewsets.ModelViewSet):
             # Processa dados
             data = serializer.validated_data
             
-            # Determina portas
-            if data.get('use_common_ports'):
-                ports = 'common'
-            elif data.get('use_top100'):
-                ports = 'top100'
-            elif data.get('use_top1000'):
-                ports = 'top1000'
-            else:
-                ports = data.get('ports', '80,443')
-            
-            # Determina protocolos
-            protocols = []
-            if data.get('tcp'):
-                protocols.append('TCP')
-            if data.get('udp'):
-                protocols.append('UDP')
-            
-            protocols_str = ','.join(protocols)
+            # Determina portas e protocolos
+            ports = _ports_spec(data)
+            protocols_str = ','.join(_protocols(data))
+            try:
+                plan = estimate_scan(data)
+            except ExclusionConfigError as e:
+                # Sem a lista de exclusão global nenhuma varredura é iniciada
+                return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
             # Cria job
             job = ScanJob.objects.create(
                 target=data['target'],
+                exclude=data.get('exclude', ''),
                 ports=ports,
                 protocols=protocols_str,
                 timeout=data.get('timeout', 3),
                 threads=data.get('threads', 50),
+                retries=data.get('retries', 0),
+                auto_plan=data.get('auto_plan', False),
+                max_open_per_host=data.get('max_open_per_host'),
+                max_open=data.get('max_open'),
+                time_budget=data.get('time_budget'),
             )
             
             # Inicia varredura
             if start_scan(str(job.id)):
                 return Response({
                     'job_id': str(job.id),
-                    'message': 'Varredura iniciada com sucesso'
+                    'message': 'Varredura iniciada com sucesso',
+                    'estimated_seconds': round(plan.estimated_seconds, 1),
+                    'warnings': plan.warnings,
                 }, status=status.HTTP_201_CREATED)
             else:
                 job.status = 'failed'
@@ -88,6 +140,17 @@ class ScanJobViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def estimate(self, request):
+        """Estima sondas e duração de um job sem criá-lo"""
+        serializer = ScanJobCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(estimate_scan(serializer.validated_data).to_dict())
+        except ExclusionConfigError as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
     @action(detail=True, methods=['post'])
     def stop(self, request, pk=None):
         """Para uma varredura em execução"""
@@ -112,11 +175,24 @@ class ScanJobViewSet(viewsets.ModelViewSet):
         
         is_running = get_scan_status(str(job.id))
         
-        # Conta resultados
-        results_count = job.results.count()
-        open_count = job.results.filter(status='open').count()
-        closed_count = job.results.filter(status='closed').count()
-        filtered_count = job.results.filter(status='filtered').count()
+        # Contagens do resumo incremental (em execução) ou do histórico;
+        # consultas ao banco só para jobs sem histórico
+        summary = get_live_summary(str(job.id))
+        if summary is None:
+            history = ScanHistory.objects.filter(job=job).only('summary').first()
+            if history and 'results_by_status' in history.summary:
+                by_status = history.summary['results_by_status']
+                summary = {'total': sum(by_status.values()), 'by_status': by_status}
+        if summary is None:
+            summary = {
+                'total': job.results.count(),
+                'by_status': {status_name: job.results.filter(status=status_name).count()
+                              for status_name in ('open', 'closed', 'filtered')},
+            }
+        results_count = summary['total']
+        open_count = summary['by_status'].get('open', 0)
+        closed_count = summary['by_status'].get('closed', 0)
+        filtered_count = summary['by_status'].get('filtered', 0)
         
         return Response({
             'job_id': str(job.id),
@@ -236,6 +312,12 @@ def scan_statistics(request):
     })
 
 
+@require_http_methods(["GET"])
+def metrics(request):
+    """Métricas do scanner e do backend no formato texto do Prometheus"""
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def quick_scan(request):
@@ -105,7 +105,8 @@ def simple_scan(request):
             'success': True,
             'results': scan_results,
             'total_results': len(scan_results),
-            'open_ports': len([r for r in scan_results if r['status'] == 'open'])
+            'open_ports': scanner.aggregator.counts.get('open', 0),
+            'summary': scanner.aggregator.to_dict(latency=False),
         })
         
     except Exception as e:
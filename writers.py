@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Gravação dos resultados da varredura em arquivo
+Writers em streaming (CSV, NDJSON, JSON, XML e texto) que recebem cada
+resultado assim que a sonda termina, acumulam as linhas em lotes e gravam
+com buffers grandes, opcionalmente comprimindo com gzip ou zstd. A memória
+usada é constante: nada é ordenado nem mantido após a gravação do lote.
+"""
+
+import gzip
+import io
+import json
+import os
+from typing import Dict, Iterable, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+
+from scanfile import BinaryWriter
+
+try:
+    import zstandard
+except ImportError:  # compressão zstd é opcional
+    zstandard = None
+
+# Buffer de escrita do arquivo (e do compressor)
+BUFFER_SIZE = 1 << 20
+
+# Linhas acumuladas antes de cada escrita
+BATCH_ROWS = 4096
+
+# Nível padrão de cada compressor
+COMPRESSION_LEVELS = {
+    'gzip': 6,
+    'zstd': 3,
+}
+
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+
+
+class ResultWriter:
+    """
+    Writer em streaming: cabeçalho, uma linha por resultado e rodapé
+
+    As subclasses implementam _header, _row e _footer retornando texto.
+    write() pode ser usado diretamente como result_callback de scan_range.
+    """
+
+    format = None
+
+    def __init__(self, stream, metadata: Optional[Dict] = None, batch_rows: int = BATCH_ROWS):
+        self.stream = stream
+        self.metadata = metadata or {}
+        self.batch_rows = batch_rows
+        self.batch = []
+        self.count = 0
+        self.closed = False
+        self.stream.write(self._header())
+
+    def _header(self) -> str:
+        return ''
+
+    def _row(self, result) -> str:
+        raise NotImplementedError
+
+    def _footer(self) -> str:
+        return ''
+
+    def write(self, result) -> None:
+        self.batch.append(self._row(result))
+        self.count += 1
+        if len(self.batch) >= self.batch_rows:
+            self.flush()
+
+    def write_many(self, results: Iterable) -> None:
+        for result in results:
+            self.write(result)
+
+    def flush(self) -> None:
+        if self.batch:
+            self.stream.write(''.join(self.batch))
+            self.batch = []
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.flush()
+            self.stream.write(self._footer())
+        finally:
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class CSVWriter(ResultWriter):
+    format = 'csv'
+
+    def _header(self) -> str:
+        return "Host,Port,Protocol,Status,ResponseTime\n"
+
+    def _row(self, result) -> str:
+        response_time = '' if result.response_time is None else f"{result.response_time:.3f}"
+        return f"{result.host},{result.port},{result.protocol},{result.status},{response_time}\n"
+
+
+def _result_dict(result) -> Dict:
+    return {
+        'host': result.host,
+        'port': result.port,
+        'protocol': result.protocol,
+        'status': result.status,
+        'response_time_ms': None if result.response_time is None else round(result.response_time, 3),
+    }
+
+
+class NDJSONWriter(ResultWriter):
+    """Um objeto JSON por linha (sem cabeçalho, ideal para pipelines)"""
+
+    format = 'ndjson'
+
+    def _row(self, result) -> str:
+        return json.dumps(_result_dict(result)) + "\n"
+
+
+class JSONWriter(ResultWriter):
+    """Documento {"scan": metadados, "results": [...]} gravado incrementalmente"""
+
+    format = 'json'
+
+    def _header(self) -> str:
+        return f'{{"scan": {json.dumps(self.metadata)},\n "results": [\n'
+
+    def _row(self, result) -> str:
+        separator = '  ' if self.count == 0 else ' ,'
+        return separator + json.dumps(_result_dict(result)) + "\n"
+
+    def _footer(self) -> str:
+        return f' ],\n "total": {self.count}}}\n'
+
+
+class XMLWriter(ResultWriter):
+    format = 'xml'
+
+    def _header(self) -> str:
+        attributes = ''.join(f" {name}={quoteattr(str(value))}" for name, value in self.metadata.items())
+        return f'<?xml version="1.0" encoding="UTF-8"?>\n<scan{attributes}>\n'
+
+    def _row(self, result) -> str:
+        response_time = '' if result.response_time is None else f' response_time_ms="{result.response_time:.3f}"'
+        return (f'  <port host={quoteattr(result.host)} number="{result.port}" '
+                f'protocol="{result.protocol}" status="{result.status}"{response_time}/>\n')
+
+    def _footer(self) -> str:
+        return f'  <total>{self.count}</total>\n</scan>\n'
+
+
+class TextWriter(ResultWriter):
+    """Formato legível: uma porta por linha"""
+
+    format = 'txt'
+
+    def _header(self) -> str:
+        return ''.join(f"# {name}: {value}\n" for name, value in self.metadata.items())
+
+    def _row(self, result) -> str:
+        response_time = '' if result.response_time is None else f" ({result.response_time:.1f}ms)"
+        return f"{result.host}:{result.port}/{result.protocol} {result.status.upper()}{response_time}\n"
+
+    def _footer(self) -> str:
+        return f"# total: {self.count}\n"
+
+
+WRITERS = {writer.format: writer for writer in (CSVWriter, NDJSONWriter, JSONWriter, XMLWriter, TextWriter,
+                                               BinaryWriter)}
+
+# Extensões reconhecidas em -o (além de .gz / .zst para compressão)
+FORMAT_EXTENSIONS = {
+    '.pscan': 'pscan',
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.json': 'json',
+    '.xml': 'xml',
+    '.txt': 'txt',
+}
+
+
+def detect_format(filename: str) -> Tuple[str, Optional[str]]:
+    """
+    Formato e compressão a partir da extensão (ex: scan.ndjson.gz ->
+    ('ndjson', 'gzip')). Extensões desconhecidas gravam CSV.
+    """
+    base, extension = os.path.splitext(filename.lower())
+    compression = COMPRESSION_EXTENSIONS.get(extension)
+    if compression:
+        extension = os.path.splitext(base)[1]
+    return FORMAT_EXTENSIONS.get(extension, 'csv'), compression
+
+
+def open_stream(filename: str, compression: Optional[str] = None, level: Optional[int] = None):
+    """Abre o arquivo de saída em modo texto com buffer grande e compressão opcional"""
+    if compression is None:
+        return open(filename, 'w', encoding='utf-8', newline='', buffering=BUFFER_SIZE)
+
+    level = COMPRESSION_LEVELS[compression] if level is None else level
+    if compression == 'gzip':
+        raw = gzip.GzipFile(filename, 'wb', compresslevel=level)
+    elif compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("compressão zstd requer o pacote 'zstandard' (pip install zstandard)")
+        raw = zstandard.ZstdCompressor(level=level).stream_writer(open(filename, 'wb'))
+    else:
+        raise ValueError(f"compressão desconhecida: {compression}")
+    return io.TextIOWrapper(io.BufferedWriter(raw, BUFFER_SIZE), encoding='utf-8', newline='')
+
+
+def open_writer(filename: str, format: Optional[str] = None, metadata: Optional[Dict] = None,
+                level: Optional[int] = None) -> ResultWriter:
+    """
+    Cria o writer para o arquivo. O formato vem da extensão, a menos que
+    seja informado; a compressão sempre vem da extensão (.gz / .zst).
+    """
+    detected, compression = detect_format(filename)
+    format = format or detected
+    if format not in WRITERS:
+        raise ValueError(f"formato desconhecido: {format} (use {', '.join(sorted(WRITERS))})")
+    if format == BinaryWriter.format:
+        # Formato binário é lido via mmap: não é comprimido
+        if compression:
+            raise ValueError("o formato .pscan não suporta compressão")
+        return BinaryWriter(filename, metadata)
+    return WRITERS[format](open_stream(filename, compression, level), metadata)